@@ -6,9 +6,13 @@ import pytest
 from flask.app import Flask
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
+from spiffworkflow_backend.services.bpmn_process_definition_cache_service import BpmnProcessDefinitionCacheService
+from spiffworkflow_backend.services.permission_matcher_cache_service import PermissionMatcherCacheService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.service_account_service import ServiceAccountService
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 
@@ -54,6 +58,12 @@ def with_db_and_bpmn_file_cleanup() -> None:
         db.session.execute(table.delete())
     db.session.commit()
 
+    # definition ids can get reused after wiping the tables so do not let cached definitions leak between tests
+    BpmnProcessDefinitionCacheService.clear()
+    PermissionMatcherCacheService.clear()
+    ServiceAccountService.clear_api_key_cache()
+    JsonDataModel.clear_known_hashes()
+
     try:
         yield
     finally:
@@ -13,6 +13,7 @@ from flask_mail import Mail  # type: ignore
 import spiffworkflow_backend.load_database_models  # noqa: F401
 from spiffworkflow_backend.background_processing.apscheduler import start_apscheduler_if_appropriate
 from spiffworkflow_backend.background_processing.celery import init_celery_if_appropriate
+from spiffworkflow_backend.background_processing.message_correlation_notifier import MessageCorrelationNotifier
 from spiffworkflow_backend.config import setup_config
 from spiffworkflow_backend.exceptions.api_error import api_error_blueprint
 from spiffworkflow_backend.helpers.api_version import V1_API_PATH_PREFIX
@@ -22,6 +23,8 @@ from spiffworkflow_backend.routes.authentication_controller import _set_new_acce
 from spiffworkflow_backend.routes.authentication_controller import omni_auth
 from spiffworkflow_backend.routes.openid_blueprint.openid_blueprint import openid_blueprint
 from spiffworkflow_backend.routes.user_blueprint import user_blueprint
+from spiffworkflow_backend.services.authentication_service import AuthenticationService
+from spiffworkflow_backend.services.message_service import correlate_notified_message_names
 from spiffworkflow_backend.services.monitoring_service import configure_sentry
 from spiffworkflow_backend.services.monitoring_service import setup_prometheus_metrics
 
@@ -105,6 +108,10 @@ def create_app() -> flask.app.Flask:
     # This is particularly helpful for forms that are generated from json schemas.
     app.json.sort_keys = False
 
+    if app.config["SPIFFWORKFLOW_BACKEND_OPEN_ID_CONFIG_PREFETCH_ENABLED"]:
+        AuthenticationService.prefetch_open_id_configs_in_background(app)
+
+    MessageCorrelationNotifier.register_message_correlator(correlate_notified_message_names)
     start_apscheduler_if_appropriate(app)
     init_celery_if_appropriate(app)
 
@@ -58,7 +58,6 @@ def _add_jobs_for_non_celery_based_configuration(app: flask.app.Flask, scheduler
     ]
     # TODO: add job to release locks to simplify other queries
     # TODO: add job to delete completed entires
-    # TODO: add job to run old/low priority instances so they do not get drowned out
 
     # we should be able to remove these once we switch over to future tasks for non-celery configuration
     scheduler.add_job(
@@ -83,12 +82,17 @@ def _add_jobs_that_should_run_regardless_of_celery_config(app: flask.app.Flask,
         "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_NOT_STARTED_POLLING_INTERVAL_IN_SECONDS"
     ]
 
-    # TODO: see if we can queue with celery instead on celery based configuration
-    # NOTE: pass in additional_processing_identifier if we move to celery
+    message_correlation_polling_interval_in_seconds = app.config[
+        "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_CORRELATION_POLLING_INTERVAL_IN_SECONDS"
+    ]
+    if app.config["SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_EVENT_DRIVEN_ENABLED"]:
+        message_correlation_polling_interval_in_seconds = app.config[
+            "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_CORRELATION_EVENT_DRIVEN_POLLING_INTERVAL_IN_SECONDS"
+        ]
     scheduler.add_job(
         BackgroundProcessingService(app).process_message_instances_with_app_context,
         "interval",
-        seconds=10,
+        seconds=int(message_correlation_polling_interval_in_seconds),
     )
 
     # when you create a process instance via the API and do not use the run API method, this would pick up the instance.
@@ -102,3 +106,15 @@ def _add_jobs_that_should_run_regardless_of_celery_config(app: flask.app.Flask,
         "interval",
         seconds=app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"],
     )
+    if app.config["SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED"]:
+        scheduler.add_job(
+            BackgroundProcessingService(app).remove_locks_of_dead_workers,
+            "interval",
+            seconds=int(app.config["SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_INTERVAL_IN_SECONDS"]),
+        )
+    if app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION"] != "none":
+        scheduler.add_job(
+            BackgroundProcessingService(app).compress_json_data_records,
+            "interval",
+            seconds=int(app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_INTERVAL_IN_SECONDS"]),
+        )
@@ -1,16 +1,9 @@
-import time
-
 import flask
-from sqlalchemy import and_
 
-from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
-    queue_future_task_if_appropriate,
-)
-from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.background_processing.future_task_dispatcher import FutureTaskDispatcher
+from spiffworkflow_backend.data_migrations.json_data_compression_migrator import JsonDataCompressionMigrator
 from spiffworkflow_backend.models.future_task import FutureTaskModel
-from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
-from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.services.message_service import MessageService
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
@@ -19,6 +12,8 @@ from spiffworkflow_backend.services.process_instance_service import ProcessInsta
 class BackgroundProcessingService:
     """Used to facilitate doing work outside of an HTTP request/response."""
 
+    json_data_compression_finished = False
+
     def __init__(self, app: flask.app.Flask):
         self.app = app
 
@@ -57,47 +52,48 @@ class BackgroundProcessingService:
         with self.app.app_context():
             ProcessInstanceLockService.remove_stale_locks()
 
+    def remove_locks_of_dead_workers(self) -> None:
+        """Unlocks what was locked by processes that stopped recording heartbeats without waiting for the locks to go stale."""
+        with self.app.app_context():
+            ProcessInstanceLockService.remove_locks_of_dead_workers()
+
+    def compress_json_data_records(self) -> None:
+        """Compresses json_data rows that were written before compression was turned on.
+
+        Rows written after that get compressed when they are inserted so this stops once it has made it through the table.
+        """
+        if self.__class__.json_data_compression_finished:
+            return
+        with self.app.app_context():
+            JsonDataCompressionMigrator.compress_existing_records(
+                batch_size=int(self.app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_BATCH_SIZE"]),
+                pause_between_batches_in_seconds=float(
+                    self.app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_PAUSE_BETWEEN_BATCHES_IN_SECONDS"]
+                ),
+            )
+            self.__class__.json_data_compression_finished = True
+
     def process_future_tasks(self) -> None:
         """Timer related tasks go in the future_task table.
 
         Celery is not great at scheduling things in the distant future. So this function periodically checks the future_task
         table and puts tasks into the queue that are imminently ready to run. Imminently is configurable and defaults to those
-        that are 5 minutes away or less.
+        that are 5 minutes away or less. Each task only gets queued once for the time it is supposed to run at.
         """
 
         with self.app.app_context():
             future_task_lookahead_in_seconds = self.app.config[
                 "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_LOOKAHEAD_IN_SECONDS"
             ]
-            self.__class__.do_process_future_tasks(future_task_lookahead_in_seconds)
+            self.__class__.do_process_future_tasks(
+                future_task_lookahead_in_seconds,
+                use_time_wheel=self.app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_TIME_WHEEL_ENABLED"],
+            )
 
     @classmethod
-    def do_process_future_tasks(cls, future_task_lookahead_in_seconds: int) -> None:
-        future_tasks = cls.imminent_future_tasks(future_task_lookahead_in_seconds)
-        for future_task in future_tasks:
-            process_instance = (
-                ProcessInstanceModel.query.join(TaskModel, TaskModel.process_instance_id == ProcessInstanceModel.id)
-                .filter(TaskModel.guid == future_task.guid)
-                .first()
-            )
-            if process_instance.allowed_to_run():
-                queue_future_task_if_appropriate(
-                    process_instance, eta_in_seconds=future_task.run_at_in_seconds, task_guid=future_task.guid
-                )
-            else:
-                # if we are not allowed to run the process instance, we should not keep processing the future task
-                future_task.archived_for_process_instance_status = True
-                db.session.add(future_task)
-                db.session.commit()
+    def do_process_future_tasks(cls, future_task_lookahead_in_seconds: int, use_time_wheel: bool = False) -> None:
+        FutureTaskDispatcher.dispatch_imminent_future_tasks(future_task_lookahead_in_seconds, use_time_wheel=use_time_wheel)
 
     @classmethod
     def imminent_future_tasks(cls, future_task_lookahead_in_seconds: int) -> list[FutureTaskModel]:
-        lookahead = time.time() + future_task_lookahead_in_seconds
-        future_tasks: list[FutureTaskModel] = FutureTaskModel.query.filter(
-            and_(
-                FutureTaskModel.completed == False,  # noqa: E712
-                FutureTaskModel.archived_for_process_instance_status == False,  # noqa: E712
-                FutureTaskModel.run_at_in_seconds < lookahead,
-            )
-        ).all()
-        return future_tasks
+        return FutureTaskDispatcher.imminent_future_tasks(future_task_lookahead_in_seconds)
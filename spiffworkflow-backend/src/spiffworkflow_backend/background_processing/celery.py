@@ -2,6 +2,8 @@ import flask.wrappers
 from celery import Celery
 from celery import Task
 
+from spiffworkflow_backend.models.process_instance_queue import PROCESS_INSTANCE_PRIORITY_DEFAULT
+
 
 def init_celery_if_appropriate(app: flask.app.Flask) -> None:
     if app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"]:
@@ -23,6 +25,9 @@ def celery_init_app(app: flask.app.Flask) -> Celery:
         "result_serializer": "json",
         "accept_content": ["json"],
         "enable_utc": True,
+        # have redis honor the priority of process instance tasks. 0 is the most urgent, like the queue priority.
+        "broker_transport_options": {"queue_order_strategy": "priority", "priority_steps": list(range(10))},
+        "task_default_priority": PROCESS_INSTANCE_PRIORITY_DEFAULT,
     }
 
     celery_app = Celery(app.name)
@@ -0,0 +1,16 @@
+from billiard import current_process  # type: ignore
+from celery import shared_task
+
+from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
+from spiffworkflow_backend.services.message_service import MessageService
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+
+ten_minutes = 60 * 10
+
+
+@shared_task(ignore_result=False, time_limit=ten_minutes)
+def celery_task_message_instances_correlate(message_names: list[str] | None = None) -> dict:
+    proc_index = current_process().index
+    ProcessInstanceLockService.set_thread_local_locking_context("celery:messages", additional_processing_identifier=proc_index)
+    MessageService.correlate_all_message_instances(message_names=message_names, additional_processing_identifier=proc_index)
+    return {"ok": True, "message_names": message_names}
@@ -1,12 +1,14 @@
 from billiard import current_process  # type: ignore
+from celery import Task
 from celery import shared_task
 from flask import current_app
 
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
-    queue_future_task_if_appropriate,
+    queue_process_instance_if_appropriate,
 )
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import release_run_message
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
-    queue_process_instance_if_appropriate,
+    requeue_process_instance_after_lock_contention,
 )
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.future_task import FutureTaskModel
@@ -26,10 +28,15 @@ class SpiffCeleryWorkerError(Exception):
     pass
 
 
-@shared_task(ignore_result=False, time_limit=ten_minutes)
-def celery_task_process_instance_run(process_instance_id: int, task_guid: str | None = None) -> dict:
+@shared_task(bind=True, ignore_result=False, time_limit=ten_minutes)
+def celery_task_process_instance_run(
+    self: Task, process_instance_id: int, task_guid: str | None = None, lock_contention_attempt: int = 0
+) -> dict:
     proc_index = current_process().index
     ProcessInstanceLockService.set_thread_local_locking_context("celery:worker", additional_processing_identifier=proc_index)
+    if self.request.id is not None:
+        # anything that wants this process instance to run from now on needs to send a new message
+        release_run_message(process_instance_id, self.request.id)
     process_instance = ProcessInstanceModel.query.filter_by(id=process_instance_id).first()
 
     if task_guid is None and ProcessInstanceTmpService.is_enqueued_to_run_in_the_future(process_instance):
@@ -74,8 +81,10 @@ def celery_task_process_instance_run(process_instance_id: int, task_guid: str |
             f"Could not run process instance with worker: {current_app.config['PROCESS_UUID']} - {proc_index}. Error was:"
             f" {str(exception)}"
         )
-        # NOTE: consider exponential backoff
-        queue_future_task_if_appropriate(process_instance, eta_in_seconds=10, task_guid=task_guid)
+        countdown = requeue_process_instance_after_lock_contention(
+            process_instance, task_guid=task_guid, lock_contention_attempt=lock_contention_attempt + 1
+        )
+        current_app.logger.info(f"Requeued process instance {process_instance_id} to run again in {countdown:.1f} seconds")
         return {"ok": False, "process_instance_id": process_instance_id, "task_guid": task_guid, "exception": str(exception)}
     except Exception as exception:
         db.session.rollback()  # in case the above left the database with a bad transaction
@@ -1,12 +1,25 @@
+import random
+import threading
 import time
+import uuid
 
 import celery
 from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import update
 
 from spiffworkflow_backend.background_processing import CELERY_TASK_PROCESS_INSTANCE_RUN
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.helpers.spiff_enum import ProcessInstanceExecutionMode
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+
+# counts of run messages sent to celery, run messages skipped because one was already pending for the process instance,
+# and run messages sent again because the process instance was locked by something else
+_run_message_stats: dict[str, int] = {"sent": 0, "coalesced": 0, "lock_contention_requeues": 0}
+_run_message_stats_lock = threading.Lock()
 
 
 def queue_enabled_for_process_model(process_instance: ProcessInstanceModel) -> bool:
@@ -14,6 +27,21 @@ def queue_enabled_for_process_model(process_instance: ProcessInstanceModel) -> b
     return current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"] is True
 
 
+def celery_priority_for_process_instance(process_instance: ProcessInstanceModel) -> int:
+    """Maps the queue priority of the process instance, aged by how long it has been due, to a celery task priority.
+
+    Both use 0 for the most urgent and 9 for the least urgent work, which is what the redis broker expects.
+    """
+    queue_entry = (
+        db.session.query(ProcessInstanceQueueModel.priority, ProcessInstanceQueueModel.run_at_in_seconds)
+        .filter(ProcessInstanceQueueModel.process_instance_id == process_instance.id)
+        .first()
+    )
+    if queue_entry is None:
+        return ProcessInstanceQueueModel.normalize_priority(None)
+    return ProcessInstanceQueueModel.effective_priority(queue_entry.priority, queue_entry.run_at_in_seconds)
+
+
 def should_queue_process_instance(process_instance: ProcessInstanceModel, execution_mode: str | None = None) -> bool:
     # check if the enum value is valid
     if execution_mode:
@@ -36,8 +64,9 @@ def should_queue_process_instance(process_instance: ProcessInstanceModel, execut
 
 
 def queue_future_task_if_appropriate(
-    process_instance: ProcessInstanceModel, eta_in_seconds: float, task_guid: str | None = None
+    process_instance: ProcessInstanceModel, eta_in_seconds: float, task_guid: str | None = None, priority: int | None = None
 ) -> bool:
+    """Callers that already loaded the queue entry of the process instance can pass in its celery priority."""
     if queue_enabled_for_process_model(process_instance):
         buffer = 1
         countdown = eta_in_seconds - time.time() + buffer
@@ -51,7 +80,14 @@ def queue_future_task_if_appropriate(
         # (maybe due to subsecond stuff, maybe because of clock skew within the cluster of computers running spiff)
         # celery_task_process_instance_run.apply_async(kwargs=args_to_celery, countdown=countdown + 1)  # type: ignore
 
-        async_result = celery.current_app.send_task(CELERY_TASK_PROCESS_INSTANCE_RUN, kwargs=args_to_celery, countdown=countdown)
+        if priority is None:
+            priority = celery_priority_for_process_instance(process_instance)
+        async_result = celery.current_app.send_task(
+            CELERY_TASK_PROCESS_INSTANCE_RUN,
+            kwargs=args_to_celery,
+            countdown=countdown,
+            priority=priority,
+        )
         current_app.logger.info(f"Queueing process instance ({process_instance.id}) for celery ({async_result.task_id})")
         return True
 
@@ -75,7 +111,129 @@ def queue_process_instance_if_appropriate(
     #     )
 
     if should_queue_process_instance(process_instance, execution_mode):
-        async_result = celery.current_app.send_task(CELERY_TASK_PROCESS_INSTANCE_RUN, (process_instance.id, task_guid))
-        current_app.logger.info(f"Queueing process instance ({process_instance.id}) for celery ({async_result.task_id})")
+        _send_run_message(process_instance, task_guid=task_guid)
         return True
     return False
+
+
+def requeue_process_instance_after_lock_contention(
+    process_instance: ProcessInstanceModel, task_guid: str | None, lock_contention_attempt: int
+) -> float:
+    """Runs the process instance again after a backoff that grows with each attempt that found it locked."""
+    countdown = lock_contention_backoff_in_seconds(lock_contention_attempt)
+    _increment_run_message_stat("lock_contention_requeues")
+    _send_run_message(process_instance, task_guid=task_guid, countdown=countdown, lock_contention_attempt=lock_contention_attempt)
+    return countdown
+
+
+def lock_contention_backoff_in_seconds(lock_contention_attempt: int) -> float:
+    """Exponential backoff with equal jitter so workers that collided on the same process instance spread out."""
+    base_in_seconds = float(current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_BASE_IN_SECONDS"])
+    max_in_seconds = float(current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_MAX_IN_SECONDS"])
+    backoff_in_seconds = min(max_in_seconds, base_in_seconds * 2.0 ** min(max(lock_contention_attempt - 1, 0), 32))
+    return backoff_in_seconds / 2 + random.uniform(0, backoff_in_seconds / 2)  # noqa: S311
+
+
+def release_run_message(process_instance_id: int, dedupe_key: str) -> None:
+    """Called when a run message gets picked up so requests to run the process instance after this send a new one."""
+    db.session.execute(
+        update(ProcessInstanceQueueModel)
+        .where(
+            ProcessInstanceQueueModel.process_instance_id == process_instance_id,
+            ProcessInstanceQueueModel.run_message_dedupe_key == dedupe_key,
+        )
+        .values(run_message_dedupe_key=None, run_message_eta_in_seconds=None, run_message_task_guid=None)
+    )
+    db.session.commit()
+
+
+def run_message_stats() -> dict[str, int]:
+    with _run_message_stats_lock:
+        return dict(_run_message_stats)
+
+
+def _send_run_message(
+    process_instance: ProcessInstanceModel,
+    task_guid: str | None = None,
+    countdown: float | None = None,
+    lock_contention_attempt: int = 0,
+) -> None:
+    dedupe_key = _claim_run_message(process_instance.id, round(time.time() + (countdown or 0)), task_guid)
+    if dedupe_key is None:
+        _increment_run_message_stat("coalesced")
+        current_app.logger.debug(f"Process instance ({process_instance.id}) already has a pending run message for celery")
+        return
+
+    args_to_celery: dict = {"process_instance_id": process_instance.id, "task_guid": task_guid}
+    if lock_contention_attempt > 0:
+        args_to_celery["lock_contention_attempt"] = lock_contention_attempt
+    async_result = celery.current_app.send_task(
+        CELERY_TASK_PROCESS_INSTANCE_RUN,
+        kwargs=args_to_celery,
+        countdown=countdown,
+        priority=celery_priority_for_process_instance(process_instance),
+        task_id=dedupe_key,
+    )
+    _increment_run_message_stat("sent")
+    current_app.logger.info(f"Queueing process instance ({process_instance.id}) for celery ({async_result.task_id})")
+
+
+def _claim_run_message(process_instance_id: int, eta_in_seconds: int, task_guid: str | None = None) -> str | None:
+    """Records a new pending run message unless an equivalent one that will run at least as soon is already pending.
+
+    A pending message is equivalent if it is for the same task guid. Any pending message covers a request without a task
+    guid since a message with a task guid runs the process instance as well.
+
+    Returns the dedupe key to use as the celery task id or None if the new message would be redundant.
+    A pending message that should have run more than the coalescing ttl ago is assumed to be lost.
+
+    Only the run message columns of the queue entry change, so the claim does not make the process instance look recently
+    updated to the queue sweeps. The claim is committed with its own connection before the message is sent, so it neither
+    depends on the caller committing nor holds a lock on the queue entry that the worker picking up the message waits on.
+    """
+    dedupe_key = str(uuid.uuid4())
+    if current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_RUN_MESSAGE_COALESCING_ENABLED"] is not True:
+        return dedupe_key
+
+    current_time = round(time.time())
+    ttl_in_seconds = int(current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_RUN_MESSAGE_COALESCING_TTL_IN_SECONDS"])
+    not_covered_by_pending_message = [
+        ProcessInstanceQueueModel.run_message_dedupe_key.is_(None),  # type: ignore
+        ProcessInstanceQueueModel.run_message_eta_in_seconds > eta_in_seconds,  # type: ignore
+        ProcessInstanceQueueModel.run_message_eta_in_seconds < current_time - ttl_in_seconds,  # type: ignore
+    ]
+    if task_guid is not None:
+        not_covered_by_pending_message += [
+            ProcessInstanceQueueModel.run_message_task_guid.is_(None),  # type: ignore
+            ProcessInstanceQueueModel.run_message_task_guid != task_guid,
+        ]
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            update(ProcessInstanceQueueModel)
+            .where(
+                ProcessInstanceQueueModel.process_instance_id == process_instance_id,
+                or_(*not_covered_by_pending_message),
+            )
+            .values(
+                run_message_dedupe_key=dedupe_key,
+                run_message_eta_in_seconds=eta_in_seconds,
+                run_message_task_guid=task_guid,
+            )
+        )
+        claimed = result.rowcount == 1
+        # without a queue entry there is nothing to track the message with so send it like before
+        if not claimed:
+            claimed = (
+                connection.execute(
+                    select(ProcessInstanceQueueModel.id).where(
+                        ProcessInstanceQueueModel.process_instance_id == process_instance_id
+                    )
+                ).first()
+                is None
+            )
+    return dedupe_key if claimed else None
+
+
+def _increment_run_message_stat(name: str) -> None:
+    with _run_message_stats_lock:
+        _run_message_stats[name] += 1
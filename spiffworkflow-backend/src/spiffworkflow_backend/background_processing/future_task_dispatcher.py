@@ -0,0 +1,173 @@
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+import flask
+from flask import current_app
+from sqlalchemy import Select
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import update
+
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
+    queue_future_task_if_appropriate,
+)
+from spiffworkflow_backend.helpers.hierarchical_time_wheel import HierarchicalTimeWheel
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.future_task import FutureTaskModel
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.models.task import TaskModel
+
+
+class FutureTaskDispatcher:
+    """Hands imminent future tasks to celery once for each time they are supposed to run.
+
+    Future tasks are loaded together with their process instances and queue entries in one query, and the ones that
+    got queued are marked with queued_at_in_seconds in one update so later sweeps skip them. If a task is still not
+    completed well after it was queued, for example because the celery message got lost, it is queued again.
+
+    With the time wheel enabled, tasks are held in memory until they are due and then sent without a countdown so timers
+    that are due between two sweeps still fire on time without celery holding on to them.
+    """
+
+    _time_wheel = HierarchicalTimeWheel()
+    _time_wheel_lock = threading.Lock()
+    _time_wheel_thread: threading.Thread | None = None
+
+    @classmethod
+    def dispatch_imminent_future_tasks(cls, lookahead_in_seconds: int, use_time_wheel: bool = False) -> None:
+        now_in_seconds = round(time.time())
+        future_task_rows = db.session.execute(
+            cls._future_tasks_with_process_instances_query().where(
+                cls._imminent_and_not_queued_filter(lookahead_in_seconds, now_in_seconds)
+            )
+        ).all()
+        if len(future_task_rows) == 0:
+            return
+
+        if not use_time_wheel:
+            cls._queue_or_archive(future_task_rows, now_in_seconds)
+            return
+
+        cls._mark_future_tasks([row.guid for row in future_task_rows], {"queued_at_in_seconds": now_in_seconds}, now_in_seconds)
+        db.session.commit()
+        app = current_app._get_current_object()  # type: ignore
+        with cls._time_wheel_lock:
+            for row in future_task_rows:
+                cls._time_wheel.schedule(row.guid, row.run_at_in_seconds, row.run_at_in_seconds, time.time())
+            if cls._time_wheel_thread is None:
+                cls._time_wheel_thread = threading.Thread(
+                    target=cls._run_time_wheel, args=(app,), name="future_task_time_wheel", daemon=True
+                )
+                cls._time_wheel_thread.start()
+
+    @classmethod
+    def imminent_future_tasks(cls, lookahead_in_seconds: int) -> list[FutureTaskModel]:
+        future_tasks: list[FutureTaskModel] = FutureTaskModel.query.filter(
+            FutureTaskModel.completed == False,  # noqa: E712
+            FutureTaskModel.archived_for_process_instance_status == False,  # noqa: E712
+            cls._imminent_and_not_queued_filter(lookahead_in_seconds, round(time.time())),
+        ).all()
+        return future_tasks
+
+    @classmethod
+    def _imminent_and_not_queued_filter(cls, lookahead_in_seconds: int, now_in_seconds: int) -> Any:
+        requeue_after_in_seconds = int(
+            current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_REQUEUE_AFTER_IN_SECONDS"]
+        )
+        return and_(
+            FutureTaskModel.run_at_in_seconds < now_in_seconds + lookahead_in_seconds,
+            or_(
+                FutureTaskModel.queued_at_in_seconds.is_(None),  # type: ignore
+                # anything queued should have run within the lookahead so give it that long plus the requeue time
+                FutureTaskModel.queued_at_in_seconds < now_in_seconds - lookahead_in_seconds - requeue_after_in_seconds,
+            ),
+        )
+
+    @classmethod
+    def _future_tasks_with_process_instances_query(cls) -> Select:
+        return (
+            select(
+                FutureTaskModel.guid,
+                FutureTaskModel.run_at_in_seconds,
+                ProcessInstanceModel,
+                ProcessInstanceQueueModel.priority,
+                ProcessInstanceQueueModel.run_at_in_seconds.label("queue_entry_run_at_in_seconds"),  # type: ignore
+            )
+            .join(TaskModel, TaskModel.guid == FutureTaskModel.guid)
+            .join(ProcessInstanceModel, ProcessInstanceModel.id == TaskModel.process_instance_id)
+            .outerjoin(ProcessInstanceQueueModel, ProcessInstanceQueueModel.process_instance_id == ProcessInstanceModel.id)
+            .where(
+                FutureTaskModel.completed == False,  # noqa: E712
+                FutureTaskModel.archived_for_process_instance_status == False,  # noqa: E712
+            )
+        )
+
+    @classmethod
+    def _queue_or_archive(cls, future_task_rows: Sequence[Any], now_in_seconds: int) -> None:
+        queued_guids = []
+        archived_guids = []
+        for row in future_task_rows:
+            process_instance = row.ProcessInstanceModel
+            # if we are not allowed to run the process instance, we should not keep processing the future task
+            if not process_instance.allowed_to_run():
+                archived_guids.append(row.guid)
+                continue
+            priority = ProcessInstanceQueueModel.effective_priority(row.priority, row.queue_entry_run_at_in_seconds)
+            if queue_future_task_if_appropriate(
+                process_instance, eta_in_seconds=row.run_at_in_seconds, task_guid=row.guid, priority=priority
+            ):
+                queued_guids.append(row.guid)
+
+        cls._mark_future_tasks(queued_guids, {"queued_at_in_seconds": now_in_seconds}, now_in_seconds)
+        cls._mark_future_tasks(archived_guids, {"archived_for_process_instance_status": True}, now_in_seconds)
+        db.session.commit()
+
+    @classmethod
+    def _mark_future_tasks(cls, guids: list[str], values: dict[str, Any], now_in_seconds: int) -> None:
+        if len(guids) == 0:
+            return
+        db.session.execute(
+            update(FutureTaskModel)
+            .where(FutureTaskModel.guid.in_(guids))  # type: ignore
+            .values(**values, updated_at_in_seconds=now_in_seconds)
+        )
+
+    @classmethod
+    def _queue_due_future_tasks(cls, guids: list[str]) -> None:
+        now_in_seconds = round(time.time())
+        future_task_rows = db.session.execute(
+            cls._future_tasks_with_process_instances_query().where(
+                FutureTaskModel.guid.in_(guids),  # type: ignore
+                # the task may have been rescheduled to a later time since it went into the wheel
+                FutureTaskModel.run_at_in_seconds <= now_in_seconds + cls._time_wheel.tick_in_seconds,
+            )
+        ).all()
+        cls._queue_or_archive(future_task_rows, now_in_seconds)
+
+    @classmethod
+    def _run_time_wheel(cls, app: flask.app.Flask) -> None:
+        try:
+            with app.app_context():
+                while True:
+                    time.sleep(cls._time_wheel.seconds_until_next_tick(time.time()))
+                    due_future_tasks = cls._time_wheel.advance(time.time())
+                    if len(due_future_tasks) > 0:
+                        guids = [str(guid) for guid, _run_at_in_seconds in due_future_tasks]
+                        try:
+                            cls._queue_due_future_tasks(guids)
+                        except Exception as exception:
+                            # these stay marked as queued so a later sweep queues them again after the requeue time
+                            db.session.rollback()
+                            app.logger.exception(f"Error queueing future tasks {guids}: {exception}")
+                    with cls._time_wheel_lock:
+                        if len(cls._time_wheel) == 0:
+                            cls._time_wheel_thread = None
+                            return
+        finally:
+            with cls._time_wheel_lock:
+                if cls._time_wheel_thread is threading.current_thread():
+                    cls._time_wheel_thread = None
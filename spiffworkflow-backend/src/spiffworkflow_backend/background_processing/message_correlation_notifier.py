@@ -0,0 +1,108 @@
+import threading
+from collections.abc import Callable
+from collections.abc import Iterable
+from typing import Any
+
+import celery
+import flask
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from spiffworkflow_backend.background_processing import CELERY_TASK_MESSAGE_INSTANCES_CORRELATE
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+
+MESSAGE_NAMES_TO_CORRELATE_SESSION_INFO_KEY = "message_names_to_correlate"
+
+
+class MessageCorrelationNotifier:
+    """Correlates message instances right after they are committed instead of waiting for the next polling sweep.
+
+    With celery a correlation task is queued for the names of the new messages. Otherwise the names are handed to a
+    single thread per process that correlates them in batches until there is nothing left, so at most one correlation
+    runs at a time in each process no matter how many messages are committed.
+
+    The function that does the correlating is registered when the app is created, since the message service imports
+    the workflow execution service which notifies this class.
+    """
+
+    _pending_message_names: set[str] = set()
+    _pending_lock = threading.Lock()
+    _correlation_thread: threading.Thread | None = None
+    _message_correlator: Callable[[list[str]], None] | None = None
+
+    @classmethod
+    def register_message_correlator(cls, message_correlator: Callable[[list[str]], None]) -> None:
+        cls._message_correlator = message_correlator
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return current_app.config["SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_EVENT_DRIVEN_ENABLED"] is True
+
+    @classmethod
+    def notify_after_commit(cls, message_names: Iterable[str]) -> None:
+        """Correlates messages with the given names once the current db session commits."""
+        if not cls.enabled():
+            return
+        db.session.info.setdefault(MESSAGE_NAMES_TO_CORRELATE_SESSION_INFO_KEY, set()).update(message_names)
+
+    @classmethod
+    def notify(cls, message_names: set[str]) -> None:
+        if current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"]:
+            celery.current_app.send_task(CELERY_TASK_MESSAGE_INSTANCES_CORRELATE, (sorted(message_names),))
+            return
+
+        message_correlator = cls._message_correlator
+        if message_correlator is None:
+            # the polling sweep still correlates them
+            current_app.logger.warning(f"No message correlator is registered to correlate messages {sorted(message_names)}")
+            return
+
+        app = current_app._get_current_object()  # type: ignore
+        with cls._pending_lock:
+            cls._pending_message_names.update(message_names)
+            if cls._correlation_thread is None:
+                cls._correlation_thread = threading.Thread(
+                    target=cls._correlate_pending_message_names,
+                    args=(app, message_correlator),
+                    name="message_correlation",
+                    daemon=True,
+                )
+                cls._correlation_thread.start()
+
+    @classmethod
+    def _correlate_pending_message_names(cls, app: flask.app.Flask, message_correlator: Callable[[list[str]], None]) -> None:
+        try:
+            with app.app_context():
+                ProcessInstanceLockService.set_thread_local_locking_context("bg:messages")
+                while True:
+                    with cls._pending_lock:
+                        message_names = cls._pending_message_names
+                        if len(message_names) == 0:
+                            cls._correlation_thread = None
+                            return
+                        cls._pending_message_names = set()
+                    try:
+                        message_correlator(sorted(message_names))
+                    except Exception as exception:
+                        db.session.rollback()
+                        app.logger.exception(f"Error correlating messages {sorted(message_names)}: {exception}")
+        finally:
+            with cls._pending_lock:
+                if cls._correlation_thread is threading.current_thread():
+                    cls._correlation_thread = None
+
+
+@event.listens_for(Session, "after_commit")
+def notify_message_correlation_after_commit(session: Any) -> None:
+    message_names = session.info.pop(MESSAGE_NAMES_TO_CORRELATE_SESSION_INFO_KEY, None)
+    if message_names:
+        MessageCorrelationNotifier.notify(message_names)
+
+
+# after_soft_rollback also fires when the session had not started talking to the db yet
+@event.listens_for(Session, "after_soft_rollback")
+def discard_message_correlation_after_rollback(session: Any, previous_transaction: Any) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(MESSAGE_NAMES_TO_CORRELATE_SESSION_INFO_KEY, None)
@@ -0,0 +1,93 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import flask
+from flask import current_app
+
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+
+
+class ProcessInstanceWorkerPool:
+    """Runs process instances from the background scheduler concurrently in a fixed number of threads.
+
+    Every worker thread gets its own app context, and with it its own db session and locking identity, so
+    instances are locked in the queue exactly like they are when run one at a time.
+    At most max_workers + max_pending instances are accepted at once. When the pool is saturated try_submit returns False
+    and the caller is expected to leave the rest of its instances for the next polling interval.
+    """
+
+    _pools: dict[str, "ProcessInstanceWorkerPool"] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, name: str, max_workers: int, max_pending: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"process_instance_worker_{name}")
+        self.process_instance_ids_in_flight: set[int] = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_name(cls, name: str) -> "ProcessInstanceWorkerPool":
+        """Returns the pool with the given name, creating it from the current config the first time."""
+        with cls._pools_lock:
+            if name not in cls._pools:
+                cls._pools[name] = cls(
+                    name,
+                    max_workers=int(current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_SIZE"]),
+                    max_pending=int(current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_MAX_PENDING"]),
+                )
+            return cls._pools[name]
+
+    def is_saturated(self) -> bool:
+        return self.available_slots() == 0
+
+    def available_slots(self) -> int:
+        with self.lock:
+            return max(0, self.max_workers + self.max_pending - len(self.process_instance_ids_in_flight))
+
+    def is_in_flight(self, process_instance_id: int) -> bool:
+        with self.lock:
+            return process_instance_id in self.process_instance_ids_in_flight
+
+    def try_submit(
+        self,
+        app: flask.app.Flask,
+        process_instance_id: int,
+        locking_domain: str,
+        function: Callable[[int], None],
+    ) -> bool:
+        """Queues function(process_instance_id) to run in a worker thread.
+
+        Returns False if the pool is saturated. An instance that is already queued or running is not queued again.
+        """
+        with self.lock:
+            if process_instance_id in self.process_instance_ids_in_flight:
+                return True
+            if len(self.process_instance_ids_in_flight) >= self.max_workers + self.max_pending:
+                return False
+            self.process_instance_ids_in_flight.add(process_instance_id)
+        try:
+            self.executor.submit(self._run, app, process_instance_id, locking_domain, function)
+        except Exception:
+            self._finish(process_instance_id)
+            raise
+        return True
+
+    def _run(self, app: flask.app.Flask, process_instance_id: int, locking_domain: str, function: Callable[[int], None]) -> None:
+        try:
+            with app.app_context():
+                ProcessInstanceLockService.set_thread_local_locking_context(locking_domain)
+                try:
+                    function(process_instance_id)
+                except Exception as exception:
+                    app.logger.exception(
+                        f"Worker pool {self.name}: Error running process_instance {process_instance_id}: {exception}"
+                    )
+        finally:
+            self._finish(process_instance_id)
+
+    def _finish(self, process_instance_id: int) -> None:
+        with self.lock:
+            self.process_instance_ids_in_flight.discard(process_instance_id)
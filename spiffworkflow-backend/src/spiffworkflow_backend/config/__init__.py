@@ -5,6 +5,7 @@ import logging
 import os
 import threading
 import uuid
+import weakref
 from urllib.parse import urlparse
 
 from flask.app import Flask
@@ -16,6 +17,19 @@ HTTP_REQUEST_TIMEOUT_SECONDS = 15
 CONNECTOR_PROXY_COMMAND_TIMEOUT = 45
 SUPPORTED_ENCRYPTION_LIBS = ["cryptography", "no_op_cipher"]
 
+# apps whose PROCESS_UUID is replaced in processes forked from this one
+_apps_with_process_uuid: weakref.WeakSet[Flask] = weakref.WeakSet()
+
+
+def _set_new_process_uuids_after_fork() -> None:
+    for app in _apps_with_process_uuid:
+        app.config["PROCESS_UUID"] = uuid.uuid4()
+
+
+# processes forked from this one, like celery prefork children and gunicorn workers, get their own uuid
+# so their locks and worker heartbeats can be told apart
+os.register_at_fork(after_in_child=_set_new_process_uuids_after_fork)
+
 
 class ConfigurationError(Exception):
     pass
@@ -215,6 +229,7 @@ def setup_config(app: Flask) -> None:
     app.secret_key = os.environ.get("FLASK_SESSION_SECRET_KEY")
 
     app.config["PROCESS_UUID"] = uuid.uuid4()
+    _apps_with_process_uuid.add(app)
 
     setup_database_configs(app)
     setup_logger_for_app(app, logging)
@@ -54,15 +54,46 @@ config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_ALLOW_OPTIMISTIC_CHE
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_POLLING_INTERVAL_IN_SECONDS", default=10)
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_NOT_STARTED_POLLING_INTERVAL_IN_SECONDS", default=30)
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_USER_INPUT_REQUIRED_POLLING_INTERVAL_IN_SECONDS", default=120)
+# number of process instances each background scheduler job runs at the same time in its own pool of threads.
+# with 1 they run one after another in the scheduler thread. when a pool is running POOL_SIZE instances and has
+# POOL_MAX_PENDING more waiting for a thread, the remaining instances are left in the queue for the next interval.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_SIZE", default=1)
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_MAX_PENDING", default=10)
+# process instances run in order of priority (0 first, 9 last, 2 by default) and how long they have been due.
+# each priority level counts as this many seconds of waiting so low priority instances still run eventually.
+config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_INSTANCE_PRIORITY_AGING_IN_SECONDS", default=300)
+# correlate messages right after they are committed, with a celery task if celery is enabled or else in a thread of the
+# process that committed them. the polling sweep then only runs every EVENT_DRIVEN_POLLING_INTERVAL as a safety net.
+config_from_env("SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_EVENT_DRIVEN_ENABLED", default=False)
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_CORRELATION_POLLING_INTERVAL_IN_SECONDS", default=10)
+config_from_env(
+    "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_CORRELATION_EVENT_DRIVEN_POLLING_INTERVAL_IN_SECONDS", default=300
+)
+# number of ready send messages loaded at a time when correlating messages
+config_from_env("SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_BATCH_SIZE", default=100)
 
 ### background with celery
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", default=False)
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_BROKER_URL", default="redis://localhost")
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_RESULT_BACKEND", default="redis://localhost")
+# when a celery worker finds a process instance locked it runs it again after a jittered backoff that doubles
+# with every attempt, starting from the base and never more than the max.
+config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_BASE_IN_SECONDS", default=2)
+config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_MAX_IN_SECONDS", default=60)
+# keep at most one pending run message per process instance in celery. a pending message is considered lost
+# if it has not been picked up this long after it was supposed to run.
+config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_RUN_MESSAGE_COALESCING_ENABLED", default=True)
+config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_RUN_MESSAGE_COALESCING_TTL_IN_SECONDS", default=600)
 
 # give a little overlap to ensure we do not miss items although the query will handle it either way
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_LOOKAHEAD_IN_SECONDS", default=301)
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_EXECUTION_INTERVAL_IN_SECONDS", default=300)
+# future tasks are only queued once. if one is still not completed this long after it should have run, queue it again
+# in case the celery message got lost along the way.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_REQUEUE_AFTER_IN_SECONDS", default=300)
+# hold imminent future tasks in an in-memory time wheel in the scheduler process and send them to celery when they are due
+# instead of sending them right away with a countdown that celery workers have to hold on to.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_TIME_WHEEL_ENABLED", default=False)
 
 ### frontend
 config_from_env("SPIFFWORKFLOW_BACKEND_URL_FOR_FRONTEND", default="http://localhost:7001")
@@ -100,6 +131,18 @@ config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_TENANT_SPECIFIC_FIELDS")
 config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_VERIFY_IAT", default=True)
 config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_VERIFY_NBF", default=True)
 config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_LEEWAY", default=5)
+# how many verified tokens to remember so their signatures are not checked again on every request. 0 disables it.
+config_from_env("SPIFFWORKFLOW_BACKEND_VERIFIED_TOKEN_CACHE_SIZE", default=10000)
+# verified tokens are forgotten after this long or when they expire, whichever comes first
+config_from_env("SPIFFWORKFLOW_BACKEND_VERIFIED_TOKEN_CACHE_TTL_IN_SECONDS", default=300)
+# openid configs and json web keysets older than this are refreshed in the background while the cached copy keeps being used
+config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_CONFIG_REFRESH_INTERVAL_IN_SECONDS", default=3600)
+# fetch openid configs and json web keysets when the app starts instead of on the first request that needs them
+config_from_env("SPIFFWORKFLOW_BACKEND_OPEN_ID_CONFIG_PREFETCH_ENABLED", default=True)
+# how many service account api keys to remember the users of so requests using them do not query the database. 0 disables it.
+config_from_env("SPIFFWORKFLOW_BACKEND_API_KEY_CACHE_SIZE", default=1000)
+# cached api keys are looked up again after this long so changes from other processes are picked up
+config_from_env("SPIFFWORKFLOW_BACKEND_API_KEY_CACHE_TTL_IN_SECONDS", default=60)
 
 # Open ID server
 # use "http://localhost:7000/openid" for running with simple openid
@@ -203,12 +246,59 @@ config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_INSTANCE_FILE_DATA_FILESYSTEM_PAT
 # timeouts for process instances locks as they are run to avoid stale locks
 config_from_env("SPIFFWORKFLOW_BACKEND_ALLOW_CONFISCATING_LOCK_AFTER_SECONDS", default="600")
 config_from_env("SPIFFWORKFLOW_BACKEND_MAX_INSTANCE_LOCK_DURATION_IN_SECONDS", default="300")
+# stale locks are released with one update for each batch of this many queue entries
+config_from_env("SPIFFWORKFLOW_BACKEND_STALE_LOCK_RELEASE_BATCH_SIZE", default=1000)
+# every process that locks process instances records a heartbeat this often. locks held by a process that has not
+# recorded one for the timeout are released right away instead of after the max instance lock duration.
+config_from_env("SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED", default=True)
+config_from_env("SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_INTERVAL_IN_SECONDS", default=10)
+config_from_env("SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_TIMEOUT_IN_SECONDS", default=35)
 
 ### other
 config_from_env(
     "SPIFFWORKFLOW_BACKEND_SYSTEM_NOTIFICATION_PROCESS_MODEL_MESSAGE_ID",
     default="Message_SystemMessageNotification",
 )
+# number of parsed bpmn process specs to keep in memory per process. set to 0 to disable the cache.
+config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_SPEC_CACHE_SIZE", default=100)
+# number of hydrated bpmn process definitions (specs and task definitions) to keep in memory per process. 0 disables it.
+config_from_env("SPIFFWORKFLOW_BACKEND_BPMN_PROCESS_DEFINITION_CACHE_SIZE", default=100)
+# number of users whose compiled permissions are kept in memory per process so permission checks do not query the database.
+# set to 0 to disable it.
+config_from_env("SPIFFWORKFLOW_BACKEND_PERMISSION_MATCHER_CACHE_SIZE", default=1000)
+# how often each process checks whether another process changed permissions, groups or principals. changes made in the
+# same process are seen right away. set to 0 to check on every permission check.
+config_from_env("SPIFFWORKFLOW_BACKEND_PERMISSION_CACHE_GENERATION_CHECK_INTERVAL_IN_SECONDS", default=5)
+# only save tasks that changed since they were loaded when running engine steps.
+# set to false to go back to saving every unfinished task after each run.
+config_from_env("SPIFFWORKFLOW_BACKEND_TASK_CHANGE_TRACKING_ENABLED", default=True)
+# number of json_data hashes known to exist in the database to keep in memory per process so their data
+# does not get sent to the database again. set to 0 to disable it.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_KNOWN_HASHES_CACHE_SIZE", default=50000)
+# look up which unknown json_data hashes already exist before inserting so only new data gets sent.
+# this costs a select per save so it mostly helps when task data is large.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_EXISTENCE_PROBE_ENABLED", default=False)
+# encoder used to produce the canonical json that json_data hashes are computed from. options: json, orjson.
+# orjson is only used if it is installed. it is faster but produces different hashes than json for the same data,
+# so identical data written before and after switching gets stored twice.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_ENCODER", default="json")
+# store json_data rows as a delta of the top level keys that changed since similar data, like the previous data of
+# the same task, when that is much smaller than the full data. reading a delta row takes one extra query per level
+# of its chain, so chains are capped at DELTA_MAX_CHAIN_LENGTH after which the full data is stored again.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_ENCODING_ENABLED", default=False)
+# json data smaller than this is always stored in full
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MIN_SIZE_IN_BYTES", default="16384")
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MAX_CHAIN_LENGTH", default="10")
+# compress json_data payloads of at least COMPRESSION_MIN_SIZE_IN_BYTES before storing them. options: none, zlib, zstd.
+# zstd is only used if the zstandard package is installed and zlib is used otherwise.
+# compressed rows are decoded transparently, so this can be turned on and off at any time.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION", default="none")
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_SIZE_IN_BYTES", default="4096")
+# when compression is on, the background scheduler also compresses rows that were written uncompressed
+# in batches of this size, with a pause between batches to keep the load on the database down.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_BATCH_SIZE", default="500")
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_PAUSE_BETWEEN_BATCHES_IN_SECONDS", default="1")
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIGRATOR_INTERVAL_IN_SECONDS", default="3600")
 # check all tasks listed as child tasks are saved to the database
 config_from_env("SPIFFWORKFLOW_BACKEND_DEBUG_TASK_CONSISTENCY", default=False)
 
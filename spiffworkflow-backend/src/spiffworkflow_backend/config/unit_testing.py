@@ -16,6 +16,9 @@ SPIFFWORKFLOW_BACKEND_AUTH_CONFIGS = None
 
 SPIFFWORKFLOW_BACKEND_LOG_LEVEL = environ.get("SPIFFWORKFLOW_BACKEND_LOG_LEVEL", default="debug")
 SPIFFWORKFLOW_BACKEND_GIT_COMMIT_ON_SAVE = False
+# the heartbeat thread would write to the test database from outside of the tests
+SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED = False
+SPIFFWORKFLOW_BACKEND_OPEN_ID_CONFIG_PREFETCH_ENABLED = False
 
 SPIFFWORKFLOW_BACKEND_WEBHOOK_PROCESS_MODEL_IDENTIFIER = "test_group/simple_script"
 SPIFFWORKFLOW_BACKEND_GITHUB_WEBHOOK_SECRET = "test_github_webhook_secret"  # noqa: S105
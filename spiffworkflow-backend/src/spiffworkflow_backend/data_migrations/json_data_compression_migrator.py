@@ -0,0 +1,68 @@
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy import null
+from sqlalchemy import select
+from sqlalchemy import update
+
+from spiffworkflow_backend.helpers.canonical_json import encode_canonical_json
+from spiffworkflow_backend.helpers.json_data_compression import JSON_DATA_FORMAT_JSON
+from spiffworkflow_backend.helpers.json_data_compression import compress_json_data
+from spiffworkflow_backend.helpers.json_data_compression import json_data_compression_format
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
+
+
+class JsonDataCompressionMigrator:
+    @classmethod
+    def compress_existing_records(
+        cls,
+        batch_size: int,
+        pause_between_batches_in_seconds: float = 0,
+        max_batches: int | None = None,
+    ) -> int:
+        """Compresses json_data rows that are stored as plain json and returns how many were compressed.
+
+        Rows are walked in order of their hash and each batch is committed on its own so this can be stopped at any time.
+        Rows too small to compress stay as they are, which means they get read again the next time this runs.
+        """
+        if json_data_compression_format() == JSON_DATA_FORMAT_JSON:
+            return 0
+
+        json_data_table = JsonDataModel.__table__
+        update_statement = (
+            update(json_data_table)
+            .where(json_data_table.c.hash == bindparam("b_hash"))
+            .values(data=null(), data_format=bindparam("b_data_format"), compressed_data=bindparam("b_compressed_data"))
+        )
+        compressed_count = 0
+        batch_count = 0
+        last_hash: str | None = None
+        while max_batches is None or batch_count < max_batches:
+            query = select(JsonDataModel.hash, JsonDataModel.data).where(JsonDataModel.data_format == JSON_DATA_FORMAT_JSON)
+            if last_hash is not None:
+                query = query.where(JsonDataModel.hash > last_hash)  # type: ignore
+            rows = db.session.execute(query.order_by(JsonDataModel.hash).limit(batch_size)).all()
+            if len(rows) == 0:
+                break
+
+            updates = []
+            for hash, data in rows:
+                compressed = compress_json_data(encode_canonical_json(data))
+                if compressed is not None:
+                    updates.append({"b_hash": hash, "b_data_format": compressed[0], "b_compressed_data": compressed[1]})
+            if len(updates) > 0:
+                db.session.execute(update_statement, updates)
+            db.session.commit()
+
+            compressed_count += len(updates)
+            batch_count += 1
+            last_hash = rows[-1].hash
+            if len(rows) < batch_size:
+                break
+            if pause_between_batches_in_seconds > 0:
+                time.sleep(pause_between_batches_in_seconds)
+
+        current_app.logger.info(f"Compressed {compressed_count} json_data records in {batch_count} batches")
+        return compressed_count
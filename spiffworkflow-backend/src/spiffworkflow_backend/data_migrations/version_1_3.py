@@ -8,6 +8,7 @@ from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.task import Task
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
+from spiffworkflow_backend.services.bpmn_process_definition_cache_service import BpmnProcessDefinitionCacheService
 from sqlalchemy import or_
 from sqlalchemy.orm.attributes import flag_modified
 
@@ -42,6 +43,9 @@ class VersionOneThree:
         self.update_tasks_where_last_change_is_null()
 
         db.session.commit()
+
+        # task definitions are normally immutable so make sure nothing cached in this process is stale
+        BpmnProcessDefinitionCacheService.clear()
         current_app.logger.debug("end VersionOneThree.run")
 
     def get_relevant_task_definitions(self) -> list[TaskDefinitionModel]:
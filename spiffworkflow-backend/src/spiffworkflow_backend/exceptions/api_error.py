@@ -21,6 +21,7 @@ from SpiffWorkflow.exceptions import WorkflowException
 from SpiffWorkflow.specs.base import TaskSpec  # type: ignore
 from SpiffWorkflow.task import Task  # type: ignore
 from spiffworkflow_backend.exceptions.error import NotAuthorizedError
+from spiffworkflow_backend.exceptions.error import TaskDataSizeExceededError
 from spiffworkflow_backend.exceptions.error import TokenInvalidError
 from spiffworkflow_backend.exceptions.error import TokenNotProvidedError
 from spiffworkflow_backend.exceptions.error import UserNotLoggedInError
@@ -308,6 +309,9 @@ def handle_exception(exception: Exception) -> flask.wrappers.Response:
         api_exception = exception
     elif isinstance(exception, SpiffWorkflowException):
         api_exception = ApiError.from_workflow_exception("unexpected_workflow_exception", "Unexpected Workflow Error", exception)
+    elif isinstance(exception, TaskDataSizeExceededError):
+        # the task service raises this instead of an ApiError since this module depends on the task service
+        api_exception = ApiError(error_code="task_data_size_exceeded", message=str(exception), sentry_link=sentry_link)
     else:
         api_exception = ApiError(
             error_code=error_code,
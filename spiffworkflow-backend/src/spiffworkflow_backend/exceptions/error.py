@@ -63,3 +63,7 @@ class TaskMismatchError(Exception):
 
 class PublishingAttemptWhileLockedError(Exception):
     pass
+
+
+class TaskDataSizeExceededError(Exception):
+    pass
@@ -0,0 +1,33 @@
+import json
+from typing import Any
+
+from flask import current_app
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def canonical_json_encoder() -> str:
+    """Returns the name of the encoder that encode_canonical_json will actually use."""
+    if current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_ENCODER"] == "orjson" and orjson is not None:
+        return "orjson"
+    return "json"
+
+
+def encode_canonical_json(data: Any) -> bytes:
+    """Encodes data as json with sorted keys so the same data always results in the same bytes.
+
+    The bytes are meant to be produced once and then reused for hashing, size accounting, and writing to the database.
+    The stdlib encoder matches what json_data hashes have always been computed from. orjson is much faster but
+    its output is more compact so switching encoders changes the hashes of newly written data.
+    """
+    if canonical_json_encoder() == "orjson":
+        try:
+            encoded: bytes = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+            return encoded
+        except TypeError:
+            # orjson is stricter than the stdlib encoder, for example with integers larger than 64 bits
+            pass
+    return json.dumps(data, sort_keys=True).encode("utf8")
@@ -0,0 +1,99 @@
+import math
+import threading
+from collections.abc import Hashable
+from typing import Any
+
+
+class HierarchicalTimeWheel:
+    """Thread safe, in-memory hierarchical timing wheel.
+
+    Timers are bucketed by the tick they are due in. The first level has one slot per tick and every level above it has
+    slots that are slot_count times wider than the level below, so scheduling, cancelling and firing a timer does not depend
+    on how many timers are waiting. When time reaches a slot on a higher level its timers cascade down to the lower levels,
+    and timers further out than the top level wait in an overflow bucket until the top level wraps around.
+
+    Each timer has a key so scheduling the same key again moves the timer instead of adding a second one.
+    """
+
+    def __init__(self, tick_in_seconds: float = 1.0, slot_count: int = 64, level_count: int = 3) -> None:
+        self.tick_in_seconds = tick_in_seconds
+        self.slot_count = slot_count
+        self.level_count = level_count
+        self._levels: list[list[dict[Hashable, tuple[int, Any]]]] = [[{} for _ in range(slot_count)] for _ in range(level_count)]
+        self._overflow: dict[Hashable, tuple[int, Any]] = {}
+        self._due: dict[Hashable, tuple[int, Any]] = {}
+        # maps each key to the bucket it is currently in so it can be moved or cancelled
+        self._buckets_by_key: dict[Hashable, dict[Hashable, tuple[int, Any]]] = {}
+        self._current_tick = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, key: Hashable, due_at_in_seconds: float, value: Any, now_in_seconds: float) -> None:
+        with self._lock:
+            if len(self._buckets_by_key) == 0:
+                self._current_tick = self._tick_for(now_in_seconds)
+            self._remove(key)
+            self._insert(key, self._tick_for(due_at_in_seconds), value)
+
+    def cancel(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def advance(self, now_in_seconds: float) -> list[tuple[Hashable, Any]]:
+        """Moves the wheel forward to the given time and returns the keys and values of the timers that are now due."""
+        with self._lock:
+            now_tick = self._tick_for(now_in_seconds)
+            if len(self._buckets_by_key) == len(self._due):
+                # nothing is waiting in the wheel so there is nothing to cascade on the way
+                self._current_tick = max(now_tick, self._current_tick)
+            while self._current_tick < now_tick:
+                self._current_tick += 1
+                self._cascade(self._current_tick)
+                self._expire(self._levels[0][self._current_tick % self.slot_count])
+
+            due = [(key, value) for key, (_tick, value) in self._due.items()]
+            for key in self._due:
+                del self._buckets_by_key[key]
+            self._due = {}
+            return due
+
+    def seconds_until_next_tick(self, now_in_seconds: float) -> float:
+        return max(0.0, (self._tick_for(now_in_seconds) + 1) * self.tick_in_seconds - now_in_seconds)
+
+    def __len__(self) -> int:
+        return len(self._buckets_by_key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._buckets_by_key
+
+    def _tick_for(self, time_in_seconds: float) -> int:
+        return math.floor(time_in_seconds / self.tick_in_seconds)
+
+    def _insert(self, key: Hashable, tick: int, value: Any) -> None:
+        ticks_away = tick - self._current_tick
+        bucket = self._due if ticks_away <= 0 else self._overflow
+        for level in range(self.level_count):
+            if 0 < ticks_away < self.slot_count ** (level + 1):
+                bucket = self._levels[level][(tick // self.slot_count**level) % self.slot_count]
+                break
+        bucket[key] = (tick, value)
+        self._buckets_by_key[key] = bucket
+
+    def _remove(self, key: Hashable) -> None:
+        bucket = self._buckets_by_key.pop(key, None)
+        if bucket is not None:
+            del bucket[key]
+
+    def _expire(self, bucket: dict[Hashable, tuple[int, Any]]) -> None:
+        entries = list(bucket.items())
+        bucket.clear()
+        for key, (tick, value) in entries:
+            self._insert(key, tick, value)
+
+    def _cascade(self, tick: int) -> None:
+        # higher levels go first so timers can fall through more than one level in the same tick
+        if tick % self.slot_count**self.level_count == 0:
+            self._expire(self._overflow)
+        for level in reversed(range(1, self.level_count)):
+            slot_width = self.slot_count**level
+            if tick % slot_width == 0:
+                self._expire(self._levels[level][(tick // slot_width) % self.slot_count])
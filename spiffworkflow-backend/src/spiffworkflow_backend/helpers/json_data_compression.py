@@ -0,0 +1,56 @@
+import zlib
+
+from flask import current_app
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# values of JsonDataModel.data_format. json means the data column holds the json and the others mean
+# compressed_data holds the canonical json compressed with that algorithm.
+JSON_DATA_FORMAT_JSON = "json"
+JSON_DATA_FORMAT_ZLIB = "zlib"
+JSON_DATA_FORMAT_ZSTD = "zstd"
+
+
+class JsonDataCompressionError(Exception):
+    pass
+
+
+def json_data_compression_format() -> str:
+    """Returns the format that compress_json_data will actually use for large enough data."""
+    compression = current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION"]
+    if compression == JSON_DATA_FORMAT_ZSTD and zstandard is not None:
+        return JSON_DATA_FORMAT_ZSTD
+    # zlib is always available so use it if zstd was requested but is not installed
+    if compression in [JSON_DATA_FORMAT_ZSTD, JSON_DATA_FORMAT_ZLIB]:
+        return JSON_DATA_FORMAT_ZLIB
+    return JSON_DATA_FORMAT_JSON
+
+
+def compress_json_data(encoded_data: bytes) -> tuple[str, bytes] | None:
+    """Returns the format and compressed bytes if compression is enabled and worth it for this data."""
+    data_format = json_data_compression_format()
+    if data_format == JSON_DATA_FORMAT_JSON:
+        return None
+    if len(encoded_data) < int(current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_SIZE_IN_BYTES"]):
+        return None
+    if data_format == JSON_DATA_FORMAT_ZSTD:
+        compressed_data: bytes = zstandard.ZstdCompressor().compress(encoded_data)
+    else:
+        compressed_data = zlib.compress(encoded_data)
+    if len(compressed_data) >= len(encoded_data):
+        return None
+    return (data_format, compressed_data)
+
+
+def decompress_json_data(data_format: str, compressed_data: bytes) -> bytes:
+    if data_format == JSON_DATA_FORMAT_ZLIB:
+        return zlib.decompress(compressed_data)
+    if data_format == JSON_DATA_FORMAT_ZSTD:
+        if zstandard is None:
+            raise JsonDataCompressionError("Found json data compressed with zstd but the zstandard package is not installed")
+        decompressed_data: bytes = zstandard.ZstdDecompressor().decompress(compressed_data)
+        return decompressed_data
+    raise JsonDataCompressionError(f"Unknown json data format: {data_format}")
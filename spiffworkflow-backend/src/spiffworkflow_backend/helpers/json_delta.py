@@ -0,0 +1,31 @@
+from typing import Any
+
+
+def json_values_identical(a: Any, b: Any) -> bool:
+    """Like == but values that would encode to different json like 1, 1.0, and True are not identical."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(json_values_identical(value, b[key]) for key, value in a.items())
+    if isinstance(a, list | tuple):
+        return len(a) == len(b) and all(json_values_identical(x, y) for x, y in zip(a, b, strict=True))
+    if isinstance(a, float):
+        # handles nan and -0.0
+        return repr(a) == repr(b)
+    return bool(a == b)
+
+
+def compute_delta(base: dict, data: dict) -> dict:
+    """Returns the top level keys of data that are new or differ from base and the keys of base that data does not have."""
+    return {
+        "set": {key: value for key, value in data.items() if key not in base or not json_values_identical(base[key], value)},
+        "unset": [key for key in base.keys() if key not in data],
+    }
+
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    """Applies a delta from compute_delta to base in place and returns it."""
+    for key in delta["unset"]:
+        base.pop(key, None)
+    base.update(delta["set"])
+    return base
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+
+class LruCache:
+    """Thread safe, size bounded, least-recently-used in-memory cache with simple counters.
+
+    The max size is passed in on each set call so callers can read it from app config at runtime.
+    A max size of 0 or less means nothing is stored.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, record_stats: bool = True) -> Any | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            if record_stats:
+                self._stats["hits" if value is not None else "misses"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, max_size: int) -> None:
+        if max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self._stats["hits"] += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
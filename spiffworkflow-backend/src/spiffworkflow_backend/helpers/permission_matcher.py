@@ -0,0 +1,161 @@
+import re
+from collections.abc import Iterable
+
+GRANT_TYPES = ("permit", "deny")
+
+
+class _PermissionTrieNode:
+    __slots__ = ("children", "prefix_grants", "exact_grants")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _PermissionTrieNode] = {}
+        # maps each permission to the grant types of the targets that match every uri starting with this node
+        self.prefix_grants: dict[str, set[str]] = {}
+        # maps each permission to the grant types of the targets that only match the uri ending at this node
+        self.exact_grants: dict[str, set[str]] = {}
+
+
+class PermissionMatcher:
+    """Answers permission checks for a fixed set of permission assignments without going to the database.
+
+    Permission target uris are stored in a prefix trie. A target ending in % matches every uri that starts with the rest of
+    the target as well as the target without its wildcard and trailing delimiter, so /process-groups/hey:% matches both
+    /process-groups/hey:yo and /process-groups/hey. Any other target only matches itself. Targets with a wildcard anywhere
+    else are rare and get checked with a regular expression after the trie.
+
+    A uri is permitted if at least one permit matches it and no deny does.
+    """
+
+    def __init__(self, permission_assignments: Iterable[tuple[str, str, str]]) -> None:
+        """Takes (permission, target_uri, grant_type) tuples where target uris use % as their wildcard."""
+        self._root = _PermissionTrieNode()
+        self._wildcard_patterns: list[tuple[re.Pattern, str, str]] = []
+        self.assignment_count = 0
+        # how many trie nodes the batch checks stepped into, which is what their cost grows with
+        self.trie_nodes_visited = 0
+        for permission, target_uri, grant_type in permission_assignments:
+            if grant_type not in GRANT_TYPES:
+                raise Exception(f"Unknown grant type: {grant_type}")
+            self._add(permission, target_uri, grant_type)
+            self.assignment_count += 1
+
+    def has_permission(self, permission: str, uri: str) -> bool:
+        permitted = False
+        node: _PermissionTrieNode | None = self._root
+        for character in uri:
+            if node is None:
+                break
+            grant_types = node.prefix_grants.get(permission)
+            if grant_types is not None:
+                if "deny" in grant_types:
+                    return False
+                permitted = True
+            node = node.children.get(character)
+
+        if node is not None:
+            for grants in (node.prefix_grants, node.exact_grants):
+                grant_types = grants.get(permission)
+                if grant_types is not None:
+                    if "deny" in grant_types:
+                        return False
+                    permitted = True
+
+        for pattern, pattern_permission, grant_type in self._wildcard_patterns:
+            if pattern_permission == permission and pattern.fullmatch(uri):
+                if grant_type == "deny":
+                    return False
+                permitted = True
+        return permitted
+
+    def has_permissions(self, permissions_and_uris: Iterable[tuple[str, str]]) -> list[bool]:
+        """Checks many (permission, uri) pairs at once and returns the results in the same order.
+
+        The uris are walked in sorted order so the part of the trie walk shared with the previous uri is reused, and each
+        walk checks every permission requested for its uri. A walk stops as soon as all of those permissions are denied.
+        """
+        permissions_and_uris = list(permissions_and_uris)
+        permissions_by_uri: dict[str, set[str]] = {}
+        for permission, uri in permissions_and_uris:
+            permissions_by_uri.setdefault(uri, set()).add(permission)
+
+        # each entry is a node along the current uri and the verdicts of the wildcard targets above it,
+        # where True means permitted and False means denied
+        walk: list[tuple[_PermissionTrieNode, dict[str, bool]]] = [(self._root, {})]
+        previous_uri = ""
+        verdicts_by_uri: dict[str, dict[str, bool]] = {}
+        for uri in sorted(permissions_by_uri):
+            permissions = permissions_by_uri[uri]
+            shared_length = 0
+            for previous_character, character in zip(previous_uri, uri, strict=False):
+                if previous_character != character:
+                    break
+                shared_length += 1
+            del walk[shared_length + 1 :]
+            previous_uri = uri
+
+            node, verdicts = walk[-1]
+            depth = len(walk) - 1
+            while True:
+                if len(node.prefix_grants) > 0:
+                    verdicts = self._apply_grants(verdicts, node.prefix_grants)
+                    if all(verdicts.get(permission) is False for permission in permissions):
+                        break
+                if depth == len(uri):
+                    break
+                child = node.children.get(uri[depth])
+                if child is None:
+                    break
+                node = child
+                depth += 1
+                self.trie_nodes_visited += 1
+                walk.append((node, verdicts))
+
+            if depth == len(uri):
+                verdicts = self._apply_grants(verdicts, node.exact_grants)
+            for pattern, permission, grant_type in self._wildcard_patterns:
+                if permission in permissions and verdicts.get(permission) is not False and pattern.fullmatch(uri):
+                    verdicts = {**verdicts, permission: grant_type == "permit"}
+            verdicts_by_uri[uri] = verdicts
+
+        return [verdicts_by_uri[uri].get(permission) is True for permission, uri in permissions_and_uris]
+
+    @classmethod
+    def _apply_grants(cls, verdicts: dict[str, bool], grants: dict[str, set[str]]) -> dict[str, bool]:
+        if len(grants) == 0:
+            return verdicts
+        verdicts = dict(verdicts)
+        for permission, grant_types in grants.items():
+            if "deny" in grant_types:
+                verdicts[permission] = False
+            elif verdicts.get(permission) is not False:
+                verdicts[permission] = True
+        return verdicts
+
+    def _add(self, permission: str, target_uri: str, grant_type: str) -> None:
+        if "%" not in target_uri:
+            self._node_for(target_uri).exact_grants.setdefault(permission, set()).add(grant_type)
+            return
+
+        target_uri_without_wildcard = target_uri.removesuffix("%")
+        if "%" in target_uri_without_wildcard:
+            pattern = re.compile(".*".join(re.escape(part) for part in target_uri.split("%")), re.DOTALL)
+            self._wildcard_patterns.append((pattern, permission, grant_type))
+            target_uri_without_wildcard = target_uri.replace("/%", "").replace(":%", "")
+            if "%" not in target_uri_without_wildcard:
+                self._node_for(target_uri_without_wildcard).exact_grants.setdefault(permission, set()).add(grant_type)
+            return
+
+        self._node_for(target_uri_without_wildcard).prefix_grants.setdefault(permission, set()).add(grant_type)
+        target_uri_without_delimiter = target_uri_without_wildcard.removesuffix(":").removesuffix("/")
+        if target_uri_without_delimiter != target_uri_without_wildcard:
+            self._node_for(target_uri_without_delimiter).exact_grants.setdefault(permission, set()).add(grant_type)
+
+    def _node_for(self, uri: str) -> _PermissionTrieNode:
+        node = self._root
+        for character in uri:
+            child = node.children.get(character)
+            if child is None:
+                child = _PermissionTrieNode()
+                node.children[character] = child
+            node = child
+        return node
@@ -113,5 +113,6 @@ from spiffworkflow_backend.models.feature_flag import (
     FeatureFlagModel,
 )  # noqa: F401
 from spiffworkflow_backend.models.process_caller_relationship import ProcessCallerRelationshipModel  # noqa: F401
+from spiffworkflow_backend.models.worker_heartbeat import WorkerHeartbeatModel  # noqa: F401
 
 add_listeners()
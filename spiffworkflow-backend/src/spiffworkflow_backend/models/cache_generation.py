@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import Any
 
+from sqlalchemy import func
 from sqlalchemy.orm import validates
 
 from spiffworkflow_backend.helpers.spiff_enum import SpiffEnum
@@ -12,6 +13,9 @@ from spiffworkflow_backend.models.db import db
 class CacheGenerationTable(SpiffEnum):
     reference_cache = "reference_cache"
     feature_flag = "feature_flag"
+    permission_assignment = "permission_assignment"
+    principal = "principal"
+    user_group_assignment = "user_group_assignment"
 
 
 class CacheGenerationModel(SpiffworkflowBaseDBModel):
@@ -31,6 +35,15 @@ class CacheGenerationModel(SpiffworkflowBaseDBModel):
         )
         return cache_generation
 
+    @classmethod
+    def newest_generation_id_for_tables(cls, cache_tables: list[str]) -> int | None:
+        newest_generation_id: int | None = (
+            db.session.query(func.max(CacheGenerationModel.id))
+            .filter(CacheGenerationModel.cache_table.in_(cache_tables))  # type: ignore
+            .scalar()
+        )
+        return newest_generation_id
+
     @validates("cache_table")
     def validate_cache_table(self, key: str, value: Any) -> Any:
         return self.validate_enum_field(key, value, CacheGenerationTable)
@@ -1,11 +1,14 @@
 import time
 from dataclasses import dataclass
+from typing import Any
 
 from flask import current_app
 from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.dialects.postgresql import insert as postgres_insert
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import case
 from sqlalchemy.sql import false
+from sqlalchemy.sql import func
 
 from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
@@ -27,22 +30,33 @@ class FutureTaskModel(SpiffworkflowBaseDBModel):
         index=True,
     )
 
+    # when the task was handed to celery, or to the future task time wheel, for its current run_at_in_seconds.
+    # null means it still needs to be queued.
+    queued_at_in_seconds: int | None = db.Column(db.Integer, nullable=True, index=True)
+
     updated_at_in_seconds: int = db.Column(db.Integer, nullable=False)
 
     @classmethod
-    def insert_or_update(cls, guid: str, run_at_in_seconds: int) -> None:
+    def insert_or_update(cls, guid: str, run_at_in_seconds: int, queued_at_in_seconds: int | None = None) -> None:
+        """Keeps an existing queued_at_in_seconds unless the task has to run at a different time now."""
         task_info = [
             {
                 "guid": guid,
                 "run_at_in_seconds": run_at_in_seconds,
+                "queued_at_in_seconds": queued_at_in_seconds,
                 "updated_at_in_seconds": round(time.time()),
             }
         ]
         on_duplicate_key_stmt = None
         if current_app.config["SPIFFWORKFLOW_BACKEND_DATABASE_TYPE"] == "mysql":
             insert_stmt = mysql_insert(FutureTaskModel).values(task_info)
+            # mysql applies these in order and later ones see the updated values so queued_at has to come first
             on_duplicate_key_stmt = insert_stmt.on_duplicate_key_update(
-                run_at_in_seconds=insert_stmt.inserted.run_at_in_seconds, updated_at_in_seconds=round(time.time())
+                [
+                    ("queued_at_in_seconds", cls._queued_at_on_conflict(insert_stmt.inserted)),
+                    ("run_at_in_seconds", insert_stmt.inserted.run_at_in_seconds),
+                    ("updated_at_in_seconds", round(time.time())),
+                ]
             )
         else:
             insert_stmt = None
@@ -52,6 +66,20 @@ class FutureTaskModel(SpiffworkflowBaseDBModel):
                 insert_stmt = postgres_insert(FutureTaskModel).values(task_info)
             on_duplicate_key_stmt = insert_stmt.on_conflict_do_update(
                 index_elements=["guid"],
-                set_={"run_at_in_seconds": run_at_in_seconds, "updated_at_in_seconds": round(time.time())},
+                set_={
+                    "run_at_in_seconds": run_at_in_seconds,
+                    "queued_at_in_seconds": cls._queued_at_on_conflict(insert_stmt.excluded),
+                    "updated_at_in_seconds": round(time.time()),
+                },
             )
         db.session.execute(on_duplicate_key_stmt)
+
+    @classmethod
+    def _queued_at_on_conflict(cls, new_values: Any) -> Any:
+        return case(
+            (
+                cls.run_at_in_seconds == new_values.run_at_in_seconds,
+                func.coalesce(new_values.queued_at_in_seconds, cls.queued_at_in_seconds),
+            ),
+            else_=new_values.queued_at_in_seconds,
+        )
@@ -1,13 +1,34 @@
 from __future__ import annotations
 
+import copy
 import json
+import threading
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
 from hashlib import sha256
+from typing import Any
 from typing import TypedDict
 
 from flask import current_app
+from sqlalchemy import Text
+from sqlalchemy import bindparam
+from sqlalchemy import null
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import Session
 
+from spiffworkflow_backend.helpers.canonical_json import encode_canonical_json
+from spiffworkflow_backend.helpers.json_data_compression import JSON_DATA_FORMAT_JSON
+from spiffworkflow_backend.helpers.json_data_compression import compress_json_data
+from spiffworkflow_backend.helpers.json_data_compression import decompress_json_data
+from spiffworkflow_backend.helpers.json_data_compression import json_data_compression_format
+from spiffworkflow_backend.helpers.json_delta import apply_delta
+from spiffworkflow_backend.helpers.json_delta import compute_delta
+from spiffworkflow_backend.helpers.lru_cache import LruCache
 from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
 
@@ -21,24 +42,18 @@ class JsonDataDict(TypedDict):
     data: dict
 
 
-# delta algorithm <- just to save it for when we want to try to implement it:
-#   a = {"hey": { "hey2": 2, "hey3": 3, "hey6": 7 }, "hey30": 3, "hey40": 4}
-#   b = {"hey": { "hey2": 4, "hey5": 3 }, "hey20": 2, "hey30": 3}
-#   a_keys = set(a.keys())
-#   b_keys = set(b.keys())
-#   removed = a_keys - b_keys
-#   added_keys = b_keys - a_keys
-#   keys_present_in_both = a_keys & b_keys
-#   changed = {}
-#   for key_in_both in keys_present_in_both:
-#       if a[key_in_both] != b[key_in_both]:
-#           changed[key_in_both] = b[key_in_both]
-#   added = {}
-#   for added_key in added_keys:
-#       added[added_key] = b[added_key]
-#   final_tuple = [added, removed, changed]
+@dataclass
+class JsonDataDelta:
+    encoded_delta: bytes
+    parent_hash: str
+    chain_length: int
 
 
+# a row can optionally store its data as a delta against the row with delta_parent_hash.
+# see helpers/json_delta.py for the format, _encode_deltas for how rows are chosen to be deltas,
+# and find_data_dicts_by_hashes for how they get resolved back to full data.
+# independently of that, large data can be stored compressed in compressed_data instead of in the data column.
+# data_format says which one is used. see helpers/json_data_compression.py.
 # to find the users of this model run:
 #   grep -R '_data_hash: ' src/spiffworkflow_backend/models/
 class JsonDataModel(SpiffworkflowBaseDBModel):
@@ -47,10 +62,32 @@ class JsonDataModel(SpiffworkflowBaseDBModel):
 
     # this is a sha256 hash of spec and serializer_version
     hash: str = db.Column(db.String(255), nullable=False, unique=True, primary_key=True)
-    data: dict = db.Column(db.JSON, nullable=False)
+    data: dict | None = db.Column(db.JSON, nullable=True)
+    data_format: str = db.Column(
+        db.String(20), nullable=False, default=JSON_DATA_FORMAT_JSON, server_default=JSON_DATA_FORMAT_JSON
+    )
+    compressed_data: bytes | None = db.Column(db.LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True)
+    delta_parent_hash: str | None = db.Column(db.String(255), nullable=True)
+    # number of deltas that need to be applied to get from the closest row with full data to this one
+    delta_chain_length: int = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # rows are content addressed and never change once written so there is no need to send the data for a hash
+    # that is known to exist. hashes written in a transaction are kept in the session info until it commits and
+    # only then get added to this per-process cache so a rollback can never leave a hash here without a row.
+    _known_hashes = LruCache()
+    _write_stats_lock = threading.Lock()
+    _write_stats: dict[str, int] = {
+        "records_written": 0,
+        "records_skipped": 0,
+        "bytes_avoided": 0,
+        "delta_records_written": 0,
+        "delta_bytes_avoided": 0,
+    }
+    HASHES_PENDING_COMMIT_KEY = "json_data_hashes_pending_commit"
 
     @classmethod
     def find_object_by_hash(cls, hash: str) -> JsonDataModel:
+        """Returns the row as stored so its data may be a delta or compressed. Use find_data_dict_by_hash to get the data."""
         json_data_model: JsonDataModel | None = JsonDataModel.query.filter_by(hash=hash).first()
         if json_data_model is None:
             raise JsonDataModelNotFoundError(f"Could not find a json data model entry with hash: {hash}")
@@ -58,20 +95,276 @@ class JsonDataModel(SpiffworkflowBaseDBModel):
 
     @classmethod
     def find_data_dict_by_hash(cls, hash: str) -> dict:
-        return cls.find_object_by_hash(hash).data
+        data_dicts = cls.find_data_dicts_by_hashes([hash])
+        if hash not in data_dicts:
+            raise JsonDataModelNotFoundError(f"Could not find a json data model entry with hash: {hash}")
+        return data_dicts[hash]
+
+    @classmethod
+    def find_data_dicts_by_hashes(cls, hashes: Iterable[str]) -> dict[str, dict]:
+        """Returns the full data for each given hash that exists, resolving delta chains with one query per chain level.
+
+        Every returned dict is its own object so callers can modify them.
+        """
+        return {hash: data for hash, (data, _chain_length) in cls._find_data_dicts_and_chain_lengths_by_hashes(hashes).items()}
 
     @classmethod
-    def insert_or_update_json_data_records(cls, json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict]) -> None:
-        list_of_dicts = [*json_data_hash_to_json_data_dict_mapping.values()]
+    def insert_or_update_json_data_records(
+        cls,
+        json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict],
+        json_data_encodings: dict[str, bytes] | None = None,
+        json_data_delta_base_hashes: dict[str, list[str]] | None = None,
+    ) -> None:
+        """Inserts the given records unless their hashes are already known to exist in the database.
+
+        json_data_encodings optionally maps hashes to the canonical json the hash was computed from.
+        It gets sent to the database as is instead of having the JSON column encode the data again.
+
+        json_data_delta_base_hashes optionally maps hashes to hashes of similar data, like the previous data of the
+        same task. If delta encoding is enabled, a record can get stored as a delta against one of them.
+        """
+        json_data_encodings = json_data_encodings or {}
+        unsaved_json_data_dicts = cls._json_data_dicts_not_known_to_exist(
+            json_data_hash_to_json_data_dict_mapping, json_data_encodings
+        )
+        deltas = cls._encode_deltas(unsaved_json_data_dicts, json_data_encodings, json_data_delta_base_hashes or {})
+        list_of_dicts = [
+            cls._insertable_json_data_dict(d, json_data_encodings, deltas.get(d["hash"]))
+            for d in unsaved_json_data_dicts.values()
+        ]
         if len(list_of_dicts) > 0:
             on_duplicate_key_stmt = None
             if current_app.config["SPIFFWORKFLOW_BACKEND_DATABASE_TYPE"] == "mysql":
                 insert_stmt = mysql_insert(JsonDataModel).values(list_of_dicts)
-                on_duplicate_key_stmt = insert_stmt.on_duplicate_key_update(data=insert_stmt.inserted.data)
+                # the data for an existing hash is identical so do not bother rewriting it
+                on_duplicate_key_stmt = insert_stmt.on_duplicate_key_update(hash=insert_stmt.inserted.hash)
             else:
                 insert_stmt = postgres_insert(JsonDataModel).values(list_of_dicts)
                 on_duplicate_key_stmt = insert_stmt.on_conflict_do_nothing(index_elements=["hash"])
             db.session.execute(on_duplicate_key_stmt)
+            cls._add_hashes_pending_commit(unsaved_json_data_dicts.keys())
+            cls._increment_write_stats(records_written=len(list_of_dicts))
+
+    @classmethod
+    def known_hashes_max_size(cls) -> int:
+        return int(current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_KNOWN_HASHES_CACHE_SIZE"])
+
+    @classmethod
+    def clear_known_hashes(cls) -> None:
+        cls._known_hashes.clear()
+
+    @classmethod
+    def write_stats(cls) -> dict[str, int]:
+        with cls._write_stats_lock:
+            return {**cls._write_stats, **{f"known_hashes_{k}": v for k, v in cls._known_hashes.stats().items()}}
+
+    @classmethod
+    def add_committed_hashes(cls, hashes: Iterable[str]) -> None:
+        max_size = cls.known_hashes_max_size()
+        for hash in hashes:
+            cls._known_hashes.set(hash, True, max_size)
+
+    @classmethod
+    def _json_data_dicts_not_known_to_exist(
+        cls, json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict], json_data_encodings: dict[str, bytes]
+    ) -> dict[str, JsonDataDict]:
+        if cls.known_hashes_max_size() <= 0:
+            return json_data_hash_to_json_data_dict_mapping
+
+        hashes_pending_commit: set[str] = db.session.info.get(cls.HASHES_PENDING_COMMIT_KEY, set())
+        unsaved_json_data_dicts = {}
+        for hash, json_data_dict in json_data_hash_to_json_data_dict_mapping.items():
+            if hash not in hashes_pending_commit and cls._known_hashes.get(hash) is None:
+                unsaved_json_data_dicts[hash] = json_data_dict
+
+        if len(unsaved_json_data_dicts) > 0 and current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_EXISTENCE_PROBE_ENABLED"]:
+            existing_hashes = db.session.execute(
+                select(JsonDataModel.hash).where(JsonDataModel.hash.in_(unsaved_json_data_dicts.keys()))  # type: ignore
+            ).scalars()
+            for existing_hash in existing_hashes:
+                del unsaved_json_data_dicts[existing_hash]
+                cls._add_hashes_pending_commit([existing_hash])
+
+        skipped_hashes = json_data_hash_to_json_data_dict_mapping.keys() - unsaved_json_data_dicts.keys()
+        if len(skipped_hashes) > 0:
+            cls._increment_write_stats(
+                records_skipped=len(skipped_hashes),
+                bytes_avoided=sum(len(json_data_encodings.get(hash, b"")) for hash in skipped_hashes),
+            )
+        return unsaved_json_data_dicts
+
+    @classmethod
+    def _insertable_json_data_dict(
+        cls, json_data_dict: JsonDataDict, json_data_encodings: dict[str, bytes], delta: JsonDataDelta | None
+    ) -> dict:
+        if delta is not None:
+            encoded_data: bytes | None = delta.encoded_delta
+        else:
+            encoded_data = json_data_encodings.get(json_data_dict["hash"])
+        insertable_json_data_dict: dict = {
+            "hash": json_data_dict["hash"],
+            "data": json_data_dict["data"],
+            "delta_parent_hash": delta.parent_hash if delta is not None else None,
+            "delta_chain_length": delta.chain_length if delta is not None else 0,
+            "data_format": JSON_DATA_FORMAT_JSON,
+            "compressed_data": None,
+        }
+        if encoded_data is None and json_data_compression_format() != JSON_DATA_FORMAT_JSON:
+            encoded_data = encode_canonical_json(json_data_dict["data"])
+        compressed = compress_json_data(encoded_data) if encoded_data is not None else None
+        if compressed is not None:
+            insertable_json_data_dict["data"] = null()
+            insertable_json_data_dict["data_format"], insertable_json_data_dict["compressed_data"] = compressed
+        elif encoded_data is not None:
+            # a text parameter skips the bind processing of the JSON column so the data is not encoded again
+            insertable_json_data_dict["data"] = bindparam(None, encoded_data.decode("utf8"), type_=Text)
+        return insertable_json_data_dict
+
+    @classmethod
+    def _encode_deltas(
+        cls,
+        json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict],
+        json_data_encodings: dict[str, bytes],
+        json_data_delta_base_hashes: dict[str, list[str]],
+    ) -> dict[str, JsonDataDelta]:
+        """Picks the records that are worth storing as a delta against one of their base hashes.
+
+        Only records whose full encoding is at least the configured minimum size are considered and a delta is only used
+        if it is less than half that size. Once a chain reaches the max length the next record is stored in full.
+        """
+        if not current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_ENCODING_ENABLED"]:
+            return {}
+        min_size = int(current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MIN_SIZE_IN_BYTES"])
+        max_chain_length = int(current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MAX_CHAIN_LENGTH"])
+        base_hashes_by_hash = {
+            hash: [h for h in json_data_delta_base_hashes[hash] if h is not None and h != hash]
+            for hash in json_data_hash_to_json_data_dict_mapping.keys()
+            if hash in json_data_delta_base_hashes and len(json_data_encodings.get(hash, b"")) >= min_size
+        }
+        if max_chain_length <= 0 or not any(base_hashes_by_hash.values()):
+            return {}
+
+        # bases that get written along with these records are used as is and the rest get loaded from the database
+        bases_to_load = {
+            base_hash
+            for base_hashes in base_hashes_by_hash.values()
+            for base_hash in base_hashes
+            if base_hash not in json_data_hash_to_json_data_dict_mapping
+        }
+        loaded_bases = cls._find_data_dicts_and_chain_lengths_by_hashes(bases_to_load)
+
+        deltas: dict[str, JsonDataDelta] = {}
+        chain_lengths: dict[str, int] = {}
+
+        def chain_length_of(hash: str) -> int | None:
+            if hash in loaded_bases:
+                return loaded_bases[hash][1]
+            if hash not in json_data_hash_to_json_data_dict_mapping:
+                return None
+            if hash not in chain_lengths:
+                # mark it as full while deciding to avoid cycles between records in this batch
+                chain_lengths[hash] = 0
+                delta = choose_delta(hash)
+                if delta is not None:
+                    deltas[hash] = delta
+                    chain_lengths[hash] = delta.chain_length
+            return chain_lengths[hash]
+
+        def choose_delta(hash: str) -> JsonDataDelta | None:
+            full_size = len(json_data_encodings[hash])
+            for base_hash in base_hashes_by_hash.get(hash, []):
+                base_chain_length = chain_length_of(base_hash)
+                if base_chain_length is None or base_chain_length >= max_chain_length:
+                    continue
+                if base_hash in loaded_bases:
+                    base_data = loaded_bases[base_hash][0]
+                else:
+                    base_data = json_data_hash_to_json_data_dict_mapping[base_hash]["data"]
+                encoded_delta = encode_canonical_json(
+                    compute_delta(base_data, json_data_hash_to_json_data_dict_mapping[hash]["data"])
+                )
+                if len(encoded_delta) * 2 < full_size:
+                    return JsonDataDelta(encoded_delta=encoded_delta, parent_hash=base_hash, chain_length=base_chain_length + 1)
+            return None
+
+        for hash in base_hashes_by_hash.keys():
+            chain_length_of(hash)
+        if len(deltas) > 0:
+            cls._increment_write_stats(
+                delta_records_written=len(deltas),
+                delta_bytes_avoided=sum(len(json_data_encodings[h]) - len(d.encoded_delta) for h, d in deltas.items()),
+            )
+        return deltas
+
+    @classmethod
+    def _find_data_dicts_and_chain_lengths_by_hashes(cls, hashes: Iterable[str]) -> dict[str, tuple[dict, int]]:
+        requested_hashes = set(hashes)
+        rows: dict[str, tuple[dict, str | None, int]] = {}
+        hashes_to_load = requested_hashes
+        while len(hashes_to_load) > 0:
+            results = db.session.execute(
+                select(
+                    JsonDataModel.hash,
+                    JsonDataModel.data,
+                    JsonDataModel.data_format,
+                    JsonDataModel.compressed_data,
+                    JsonDataModel.delta_parent_hash,
+                    JsonDataModel.delta_chain_length,
+                ).where(
+                    JsonDataModel.hash.in_(hashes_to_load)  # type: ignore
+                )
+            ).all()
+            hashes_to_load = set()
+            for hash, stored_data, data_format, compressed_data, delta_parent_hash, delta_chain_length in results:
+                data = stored_data
+                if data_format != JSON_DATA_FORMAT_JSON:
+                    data = json.loads(decompress_json_data(data_format, compressed_data))
+                rows[hash] = (data, delta_parent_hash, delta_chain_length)
+                if delta_parent_hash is not None and delta_parent_hash not in rows:
+                    hashes_to_load.add(delta_parent_hash)
+
+        # a resolved dict can be modified in place to resolve its child as long as nothing else needs it
+        consumer_counts = Counter(delta_parent_hash for _, delta_parent_hash, _ in rows.values() if delta_parent_hash is not None)
+        for hash in requested_hashes:
+            consumer_counts[hash] += 1
+
+        resolved: dict[str, dict] = {}
+        for hash in requested_hashes:
+            if hash not in rows:
+                continue
+            chain = []
+            current_hash = hash
+            while current_hash not in resolved:
+                if current_hash not in rows:
+                    raise JsonDataModelNotFoundError(f"Could not find the delta parent json data with hash: {current_hash}")
+                data, delta_parent_hash, _ = rows[current_hash]
+                if delta_parent_hash is None:
+                    resolved[current_hash] = data
+                    break
+                if current_hash in chain:
+                    raise JsonDataModelNotFoundError(f"Found a cycle of json data deltas at hash: {current_hash}")
+                chain.append(current_hash)
+                current_hash = delta_parent_hash
+            for child_hash in reversed(chain):
+                delta, delta_parent_hash, _ = rows[child_hash]
+                base = resolved[delta_parent_hash]
+                consumer_counts[delta_parent_hash] -= 1
+                if consumer_counts[delta_parent_hash] > 0:
+                    base = copy.deepcopy(base)
+                resolved[child_hash] = apply_delta(base, delta)
+
+        return {hash: (resolved[hash], rows[hash][2]) for hash in requested_hashes if hash in resolved}
+
+    @classmethod
+    def _add_hashes_pending_commit(cls, hashes: Iterable[str]) -> None:
+        if cls.known_hashes_max_size() > 0:
+            db.session.info.setdefault(cls.HASHES_PENDING_COMMIT_KEY, set()).update(hashes)
+
+    @classmethod
+    def _increment_write_stats(cls, **increments: int) -> None:
+        with cls._write_stats_lock:
+            for stat, increment in increments.items():
+                cls._write_stats[stat] += increment
 
     @classmethod
     def insert_or_update_json_data_dict(cls, json_data_dict: JsonDataDict) -> None:
@@ -85,7 +378,24 @@ class JsonDataModel(SpiffworkflowBaseDBModel):
 
     @classmethod
     def json_data_dict_from_dict(cls, data: dict) -> JsonDataDict:
-        task_data_json = json.dumps(data, sort_keys=True)
-        task_data_hash: str = sha256(task_data_json.encode("utf8")).hexdigest()
+        return cls.json_data_dict_and_encoding_from_dict(data)[0]
+
+    @classmethod
+    def json_data_dict_and_encoding_from_dict(cls, data: dict) -> tuple[JsonDataDict, bytes]:
+        """Returns the json data dict along with the canonical json its hash was computed from."""
+        task_data_json = encode_canonical_json(data)
+        task_data_hash: str = sha256(task_data_json).hexdigest()
         json_data_dict: JsonDataDict = {"hash": task_data_hash, "data": data}
-        return json_data_dict
+        return (json_data_dict, task_data_json)
+
+
+@listens_for(Session, "after_commit")  # type: ignore
+def add_json_data_hashes_pending_commit_to_known_hashes(session: Any) -> None:
+    hashes = session.info.pop(JsonDataModel.HASHES_PENDING_COMMIT_KEY, None)
+    if hashes:
+        JsonDataModel.add_committed_hashes(hashes)
+
+
+@listens_for(Session, "after_rollback")  # type: ignore
+def discard_json_data_hashes_pending_commit(session: Any) -> None:
+    session.info.pop(JsonDataModel.HASHES_PENDING_COMMIT_KEY, None)
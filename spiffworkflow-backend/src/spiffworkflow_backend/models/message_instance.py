@@ -1,5 +1,7 @@
 import enum
+import json
 from dataclasses import dataclass
+from hashlib import sha256
 from typing import TYPE_CHECKING
 from typing import Any
 
@@ -53,6 +55,10 @@ class MessageInstanceModel(SpiffworkflowBaseDBModel):
     user = relationship("UserModel")
     counterpart_id: int = db.Column(db.Integer)  # Not enforcing self-referential foreign key so we can delete messages.
     failure_cause: str = db.Column(db.Text())
+    # Only set on receive messages whose correlation can be matched by value. The fingerprint is a hash of the
+    # correlation shape and the expected values so a send message can find its receiver with an indexed lookup.
+    correlation_fingerprint: str | None = db.Column(db.String(64), nullable=True, index=True)
+    correlation_fingerprint_shape: str | None = db.Column(db.String(64), nullable=True, index=True)
     updated_at_in_seconds: int = db.Column(db.Integer)
     created_at_in_seconds: int = db.Column(db.Integer)
     correlation_rules = relationship("MessageInstanceCorrelationRuleModel", back_populates="message_instance", cascade="delete")
@@ -103,6 +109,93 @@ class MessageInstanceModel(SpiffworkflowBaseDBModel):
                 return True
         return False
 
+    def correlation_shape(self) -> dict | None:
+        """Returns the correlation key and the properties that must match for this receive message to correlate.
+
+        Returns None if the message cannot be matched by fingerprint. That is the case if it has more than one correlation
+        key, since any of them can match, or if no correlation property has an expected value, since then it matches
+        any message with the same name.
+        """
+        if not isinstance(self.correlation_keys, dict) or len(self.correlation_keys) != 1:
+            return None
+        correlation_key_name, expected_values = next(iter(self.correlation_keys.items()))
+        if not isinstance(expected_values, dict):
+            return None
+        properties = sorted(
+            [correlation_rule.name, correlation_rule.retrieval_expression]
+            for correlation_rule in self.correlation_rules
+            if expected_values.get(correlation_rule.name) is not None
+        )
+        if len(properties) == 0:
+            return None
+        return {"correlation_key_name": correlation_key_name, "properties": properties}
+
+    def set_correlation_fingerprint(self) -> None:
+        """Sets the fingerprint columns of a receive message from its correlation keys and rules."""
+        self.correlation_fingerprint = None
+        self.correlation_fingerprint_shape = None
+        shape = self.correlation_shape()
+        if shape is None:
+            return
+        expected_values = self.correlation_keys[shape["correlation_key_name"]]
+        fingerprint = self.correlation_fingerprint_for_values(shape, [expected_values[name] for name, _ in shape["properties"]])
+        if fingerprint is not None:
+            self.correlation_fingerprint = fingerprint
+            self.correlation_fingerprint_shape = self.correlation_shape_hash(shape)
+
+    def correlation_fingerprints_for_shape(
+        self, shape: dict, expression_engine: PythonScriptEngine, evaluated_expressions: dict[str, Any] | None = None
+    ) -> set[str]:
+        """Returns the fingerprints a receive message with the given shape must have to correlate with this send message.
+
+        One comes from evaluating the retrieval expressions against the payload and one from the correlation keys of
+        this message, since receive messages with identical correlation keys correlate as well.
+        Pass the same evaluated_expressions dict for every shape to evaluate each expression only once.
+        """
+        if evaluated_expressions is None:
+            evaluated_expressions = {}
+        values_to_match = []
+        payload_values = []
+        for _, retrieval_expression in shape["properties"]:
+            if retrieval_expression not in evaluated_expressions:
+                try:
+                    evaluated_expressions[retrieval_expression] = expression_engine.environment.evaluate(
+                        retrieval_expression, self.payload
+                    )
+                except Exception:
+                    # same as in payload_matches_expected_values, this message just cannot match by this property
+                    evaluated_expressions[retrieval_expression] = None
+            payload_values.append(evaluated_expressions[retrieval_expression])
+        values_to_match.append(payload_values)
+
+        if isinstance(self.correlation_keys, dict) and list(self.correlation_keys.keys()) == [shape["correlation_key_name"]]:
+            own_values = self.correlation_keys[shape["correlation_key_name"]]
+            if isinstance(own_values, dict):
+                values_to_match.append([own_values.get(name) for name, _ in shape["properties"]])
+
+        fingerprints = set()
+        for values in values_to_match:
+            # receive messages only have fingerprints if all of their expected values are set
+            if None not in values:
+                fingerprint = self.correlation_fingerprint_for_values(shape, values)
+                if fingerprint is not None:
+                    fingerprints.add(fingerprint)
+        return fingerprints
+
+    @classmethod
+    def correlation_shape_hash(cls, shape: dict) -> str:
+        return sha256(json.dumps(shape, sort_keys=True).encode("utf8")).hexdigest()
+
+    @classmethod
+    def correlation_fingerprint_for_values(cls, shape: dict, values: list) -> str | None:
+        # integral floats equal ints in python so make them hash the same as well
+        normalized_values = [int(value) if isinstance(value, float) and value.is_integer() else value for value in values]
+        try:
+            encoded = json.dumps({"shape": shape, "values": normalized_values}, sort_keys=True).encode("utf8")
+        except (TypeError, ValueError):
+            return None
+        return sha256(encoded).hexdigest()
+
     def is_receive(self) -> bool:
         return self.message_type == MessageTypes.receive.value
 
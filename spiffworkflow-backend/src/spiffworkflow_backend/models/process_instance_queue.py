@@ -1,11 +1,20 @@
+import time
 from dataclasses import dataclass
 
+from flask import current_app
+from sqlalchemy import ColumnElement
 from sqlalchemy import ForeignKey
+from sqlalchemy import func
 
 from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 
+# lower priorities run first
+PROCESS_INSTANCE_PRIORITY_HIGHEST = 0
+PROCESS_INSTANCE_PRIORITY_LOWEST = 9
+PROCESS_INSTANCE_PRIORITY_DEFAULT = 2
+
 
 @dataclass
 class ProcessInstanceQueueModel(SpiffworkflowBaseDBModel):
@@ -19,5 +28,41 @@ class ProcessInstanceQueueModel(SpiffworkflowBaseDBModel):
     status: str = db.Column(db.String(50), index=True)
 
     run_at_in_seconds: int = db.Column(db.Integer)
+
+    # celery task id of the pending message that will run this process instance, when it will run and the future task
+    # it is for if any. used to drop requests to run the process instance that an equivalent pending message covers.
+    run_message_dedupe_key: str | None = db.Column(db.String(36), nullable=True)
+    run_message_eta_in_seconds: int | None = db.Column(db.Integer, nullable=True)
+    run_message_task_guid: str | None = db.Column(db.String(36), nullable=True)
+
     updated_at_in_seconds: int = db.Column(db.Integer)
     created_at_in_seconds: int = db.Column(db.Integer)
+
+    @classmethod
+    def normalize_priority(cls, priority: int | None) -> int:
+        if priority is None:
+            return PROCESS_INSTANCE_PRIORITY_DEFAULT
+        return min(max(int(priority), PROCESS_INSTANCE_PRIORITY_HIGHEST), PROCESS_INSTANCE_PRIORITY_LOWEST)
+
+    @classmethod
+    def priority_aging_in_seconds(cls) -> int:
+        return int(current_app.config["SPIFFWORKFLOW_BACKEND_PROCESS_INSTANCE_PRIORITY_AGING_IN_SECONDS"])
+
+    @classmethod
+    def priority_rank(cls) -> ColumnElement[int]:
+        """Orders entries by when they are due with each priority level adding the aging interval to that.
+
+        So an entry that has been due for longer than the aging interval runs before an entry of the next more urgent
+        priority that just became due and low priority work cannot be starved by a steady stream of urgent work.
+        """
+        priority = func.coalesce(cls.priority, PROCESS_INSTANCE_PRIORITY_DEFAULT)
+        return priority * cls.priority_aging_in_seconds() + cls.run_at_in_seconds  # type: ignore
+
+    @classmethod
+    def effective_priority(cls, priority: int | None, run_at_in_seconds: int | None) -> int:
+        """Returns the priority with one level taken off for each aging interval the entry has been due for."""
+        normalized_priority = cls.normalize_priority(priority)
+        if run_at_in_seconds is None:
+            return normalized_priority
+        levels_aged = max(0, round(time.time()) - run_at_in_seconds) // cls.priority_aging_in_seconds()
+        return max(PROCESS_INSTANCE_PRIORITY_HIGHEST, normalized_priority - levels_aged)
@@ -22,6 +22,7 @@ PROCESS_MODEL_SUPPORTED_KEYS_FOR_DISK_SERIALIZATION = [
     "fault_or_suspend_on_exception",
     "exception_notification_addresses",
     "metadata_extraction_paths",
+    "priority",
 ]
 
 
@@ -44,6 +45,9 @@ class ProcessModelInfo:
     exception_notification_addresses: list[str] = field(default_factory=list)
     metadata_extraction_paths: list[dict[str, str]] | None = None
 
+    # queue priority of new process instances. 0 is the most urgent and 9 the least. None means the default.
+    priority: int | None = None
+
     process_group: Any | None = None
     files: list[File] | None = field(default_factory=list[File])
 
@@ -113,6 +117,7 @@ class ProcessModelInfoSchema(Schema):
             required=False,
         )
     )
+    priority = marshmallow.fields.Integer(allow_none=True)
 
     @post_load
     def make_spec(self, data: dict[str, str | bool | int | NotificationType], **_: Any) -> ProcessModelInfo:
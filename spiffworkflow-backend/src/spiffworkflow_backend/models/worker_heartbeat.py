@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
+from spiffworkflow_backend.models.db import db
+
+
+@dataclass
+class WorkerHeartbeatModel(SpiffworkflowBaseDBModel):
+    """One row per running backend process that can lock process instances, like web, scheduler and celery workers."""
+
+    __tablename__ = "worker_heartbeat"
+
+    id: int = db.Column(db.Integer, primary_key=True)
+    # the PROCESS_UUID of the process, which is also part of the locked_by value of every lock it holds
+    worker_identifier: str = db.Column(db.String(36), nullable=False, unique=True)
+    hostname: str = db.Column(db.String(255), nullable=False)
+    pid: int = db.Column(db.Integer, nullable=False)
+    started_at_in_seconds: int = db.Column(db.Integer, nullable=False)
+    last_heartbeat_at_in_seconds: int = db.Column(db.Integer, nullable=False, index=True)
+
+    updated_at_in_seconds: int = db.Column(db.Integer)
+    created_at_in_seconds: int = db.Column(db.Integer)
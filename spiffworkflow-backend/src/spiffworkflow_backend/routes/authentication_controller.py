@@ -19,13 +19,13 @@ from spiffworkflow_backend.exceptions.error import TokenExpiredError
 from spiffworkflow_backend.helpers.api_version import V1_API_PATH_PREFIX
 from spiffworkflow_backend.models.group import SPIFF_NO_AUTH_GROUP
 from spiffworkflow_backend.models.group import GroupModel
-from spiffworkflow_backend.models.service_account import ServiceAccountModel
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.user import SPIFF_NO_AUTH_USER
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.services.authentication_service import AuthenticationService
 from spiffworkflow_backend.services.authorization_service import PUBLIC_AUTHENTICATION_EXCLUSION_LIST
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
+from spiffworkflow_backend.services.service_account_service import ServiceAccountService
 from spiffworkflow_backend.services.user_service import UserService
 
 """
@@ -309,12 +309,7 @@ def _find_token_from_request(token: str | None) -> dict[str, str | None]:
 
 
 def _get_user_model_from_api_key(api_key: str) -> UserModel | None:
-    api_key_hash = ServiceAccountModel.hash_api_key(api_key)
-    service_account = ServiceAccountModel.query.filter_by(api_key_hash=api_key_hash).first()
-    user_model = None
-    if service_account is not None:
-        user_model = UserModel.query.filter_by(id=service_account.user_id).first()
-    return user_model
+    return ServiceAccountService.user_from_api_key(api_key)
 
 
 def _get_user_model_from_token(decoded_token: dict) -> UserModel | None:
@@ -10,6 +10,7 @@ from flask.wrappers import Response
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.services.authentication_service import AuthenticationService
 from spiffworkflow_backend.services.monitoring_service import get_version_info_data
+from spiffworkflow_backend.services.worker_heartbeat_service import WorkerHeartbeatService
 
 
 def test_raise_error() -> Response:
@@ -20,6 +21,10 @@ def version_info() -> Response:
     return make_response(get_version_info_data(), 200)
 
 
+def worker_stats() -> Response:
+    return make_response(WorkerHeartbeatService.worker_stats(), 200)
+
+
 # this is just to see what the protocol is, primarily. if the site is running on https in the browser, but this says "http://something.example.com",
 # that might be bad, and might require some server configuration to make sure flask knows it is running on https.
 # if using path based routing, the path will probably not be returned from this endpoint.
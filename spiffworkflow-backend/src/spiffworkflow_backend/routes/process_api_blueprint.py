@@ -82,9 +82,8 @@ def permissions_check(body: dict[str, dict[str, list[str]]]) -> flask.wrappers.R
     response_dict: dict[str, dict[str, bool]] = {}
     requests_to_check = body["requests_to_check"]
 
-    user = g.user
-    permission_assignments = AuthorizationService.all_permission_assignments_for_user(user=user)
-
+    checks: list[tuple[str, str]] = []
+    permissions_and_target_uris: list[tuple[str, str]] = []
     for target_uri, http_methods in requests_to_check.items():
         if target_uri not in response_dict:
             response_dict[target_uri] = {}
@@ -92,12 +91,12 @@ def permissions_check(body: dict[str, dict[str, list[str]]]) -> flask.wrappers.R
         for http_method in http_methods:
             permission_string = AuthorizationService.get_permission_from_http_method(http_method)
             if permission_string:
-                has_permission = AuthorizationService.permission_assignments_include(
-                    permission_assignments=permission_assignments,
-                    permission=permission_string,
-                    target_uri=target_uri,
-                )
-                response_dict[target_uri][http_method] = has_permission
+                checks.append((target_uri, http_method))
+                permissions_and_target_uris.append((permission_string, target_uri))
+
+    results = AuthorizationService.user_has_permissions(g.user, permissions_and_target_uris)
+    for (target_uri, http_method), has_permission in zip(checks, results, strict=True):
+        response_dict[target_uri][http_method] = has_permission
 
     return make_response(jsonify({"results": response_dict}), 200)
 
@@ -5,6 +5,7 @@ from spiffworkflow_backend.helpers.spiff_enum import ProcessInstanceExecutionMod
 
 import json
 from typing import Any
+from typing import cast
 
 import flask.wrappers
 from flask import current_app
@@ -26,7 +27,7 @@ from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
 from spiffworkflow_backend.models.db import db
-from spiffworkflow_backend.models.json_data import JsonDataModel  # noqa: F401
+from spiffworkflow_backend.models.json_data import JsonDataModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceApiSchema
 from spiffworkflow_backend.models.process_instance import ProcessInstanceCannotBeDeletedError
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
@@ -34,6 +35,7 @@ from spiffworkflow_backend.models.process_instance import ProcessInstanceModelSc
 from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 from spiffworkflow_backend.models.process_instance_report import ProcessInstanceReportModel
 from spiffworkflow_backend.models.process_instance_report import Report
+from spiffworkflow_backend.models.process_instance_report import ReportMetadata
 from spiffworkflow_backend.models.process_model import ProcessModelInfo
 from spiffworkflow_backend.models.reference_cache import ReferenceCacheModel
 from spiffworkflow_backend.models.reference_cache import ReferenceNotFoundError
@@ -62,10 +64,11 @@ from spiffworkflow_backend.services.task_service import TaskService
 
 def process_instance_create(
     modified_process_model_identifier: str,
+    priority: int | None = None,
 ) -> flask.wrappers.Response:
     process_model_identifier = _un_modify_modified_process_model_id(modified_process_model_identifier)
 
-    process_instance = _process_instance_create(process_model_identifier)
+    process_instance = _process_instance_create(process_model_identifier, priority=priority)
     return Response(
         json.dumps(ProcessInstanceModelSchema().dump(process_instance)),
         status=201,
@@ -78,9 +81,10 @@ def process_instance_run(
     process_instance_id: int,
     force_run: bool = False,
     execution_mode: str | None = None,
+    priority: int | None = None,
 ) -> flask.wrappers.Response:
     process_instance = _find_process_instance_by_id_or_raise(process_instance_id)
-    _process_instance_run(process_instance, force_run=force_run, execution_mode=execution_mode)
+    _process_instance_run(process_instance, force_run=force_run, execution_mode=execution_mode, priority=priority)
 
     process_instance_api = ProcessInstanceService.processor_to_process_instance_api(process_instance)
     process_instance_api_dict = ProcessInstanceApiSchema().dump(process_instance_api)
@@ -202,18 +206,18 @@ def process_instance_report_show(
         )
     response_result: Report | ProcessInstanceReportModel | None = None
     if report_hash is not None:
-        json_data = JsonDataModel.query.filter_by(hash=report_hash).first()
-        if json_data is None:
+        report_metadata = JsonDataModel.find_data_dicts_by_hashes([report_hash]).get(report_hash)
+        if report_metadata is None:
             raise ApiError(
                 error_code="report_metadata_not_found",
                 message=f"Could not find report metadata for {report_hash}.",
             )
-        response_result = {
-            "id": 0,
-            "identifier": "custom",
-            "name": "custom",
-            "report_metadata": json_data.data,
-        }
+        response_result = Report(
+            id=0,
+            identifier="custom",
+            name="custom",
+            report_metadata=cast(ReportMetadata, report_metadata),
+        )
     else:
         response_result = ProcessInstanceReportService.report_with_identifier(g.user, report_id, report_identifier)
 
@@ -651,6 +655,7 @@ def _process_instance_run(
     process_instance: ProcessInstanceModel,
     force_run: bool = False,
     execution_mode: str | None = None,
+    priority: int | None = None,
 ) -> None:
     if process_instance.status != "not_started" and not force_run:
         raise ApiError(
@@ -659,6 +664,9 @@ def _process_instance_run(
             status_code=400,
         )
 
+    if priority is not None:
+        ProcessInstanceQueueService.set_priority(process_instance, priority)
+
     processor = None
     try:
         ProcessInstanceTmpService.add_event_to_process_instance(process_instance, "process_instance_force_run")
@@ -698,6 +706,7 @@ def _process_instance_run(
 
 def _process_instance_create(
     process_model_identifier: str,
+    priority: int | None = None,
 ) -> ProcessInstanceModel:
     process_model = _get_process_model_for_instantiation(process_model_identifier)
     if process_model.primary_file_name is None:
@@ -711,6 +720,6 @@ def _process_instance_create(
         )
 
     process_instance = ProcessInstanceService.create_process_instance_from_process_model_identifier(
-        process_model_identifier, g.user
+        process_model_identifier, g.user, priority=priority
     )
     return process_instance
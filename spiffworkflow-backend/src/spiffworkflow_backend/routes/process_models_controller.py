@@ -55,6 +55,7 @@ def process_model_create(
         "metadata_extraction_paths",
         "fault_or_suspend_on_exception",
         "exception_notification_addresses",
+        "priority",
     ]
     body_filtered = {include_item: body[include_item] for include_item in body_include_list if include_item in body}
 
@@ -137,6 +138,7 @@ def process_model_update(
         "metadata_extraction_paths",
         "fault_or_suspend_on_exception",
         "exception_notification_addresses",
+        "priority",
     ]
     body_filtered = {include_item: body[include_item] for include_item in body_include_list if include_item in body}
 
@@ -590,13 +590,10 @@ def _interstitial_stream(
     if spiff_task is not None and spiff_task.id not in reported_ids:
         task_data = spiff_task.data
         if task_data is None or task_data == {}:
-            json_data = (
-                JsonDataModel.query.join(TaskModel, TaskModel.json_data_hash == JsonDataModel.hash)
-                .filter(TaskModel.guid == str(spiff_task.id))
-                .first()
-            )
-            if json_data is not None:
-                task_data = json_data.data
+            task_model = TaskModel.query.filter_by(guid=str(spiff_task.id)).first()
+            if task_model is not None:
+                json_data_mappings = JsonDataModel.find_data_dicts_by_hashes([task_model.json_data_hash])
+                task_data = json_data_mappings.get(task_model.json_data_hash, task_data)
         task = ProcessInstanceService.spiff_task_to_api_task(processor, spiff_task)
         try:
             instructions = _render_instructions(spiff_task, task_data=task_data)
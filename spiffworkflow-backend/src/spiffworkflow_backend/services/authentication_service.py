@@ -2,6 +2,7 @@ import base64
 import enum
 import json
 import sys
+import threading
 import time
 from hashlib import sha256
 from hmac import HMAC
@@ -14,6 +15,7 @@ from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.x509 import load_der_x509_certificate
 from flask import url_for
 
+from spiffworkflow_backend.helpers.lru_cache import LruCache
 from spiffworkflow_backend.models.user import SPIFF_GENERATED_JWT_ALGORITHM
 from spiffworkflow_backend.models.user import SPIFF_GENERATED_JWT_AUDIENCE
 from spiffworkflow_backend.models.user import SPIFF_GENERATED_JWT_KEY_ID
@@ -27,6 +29,7 @@ else:
     from typing import NotRequired
     from typing import TypedDict
 
+import flask
 import jwt
 import requests
 from flask import current_app
@@ -46,6 +49,11 @@ from spiffworkflow_backend.models.refresh_token import RefreshTokenModel
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
 from spiffworkflow_backend.services.user_service import UserService
 
+# how long to wait before fetching the json web keyset again when a token has a key id that is not in it
+UNKNOWN_KEY_ID_REFETCH_INTERVAL_IN_SECONDS = 10
+# how long to wait before trying again to refresh an openid config or json web keyset in the background after it failed
+REFRESH_RETRY_INTERVAL_IN_SECONDS = 10
+
 
 class AuthenticationProviderTypes(enum.Enum):
     open_id = "open_id"
@@ -70,7 +78,16 @@ class AuthenticationOptionNotFoundError(Exception):
 
 class AuthenticationService:
     ENDPOINT_CACHE: dict[str, dict[str, str]] = {}  # We only need to find the openid endpoints once, then we can cache them.
-    JSON_WEB_KEYSET_CACHE: dict[str, dict[str, str]] = {}
+    JSON_WEB_KEYSET_CACHE: dict[str, dict] = {}
+    # when each openid config and json web keyset above was fetched, by url, so stale ones get refreshed in the background
+    _fetched_at_by_url: dict[str, float] = {}
+    _refresh_failed_at_by_url: dict[str, float] = {}
+    _urls_being_refreshed: set[str] = set()
+    _refresh_lock = threading.Lock()
+    # public keys parsed from json web keys by jwks uri and key id, along with the json key they were parsed from
+    _public_keys: dict[tuple[str, str], tuple[dict, Any]] = {}
+    # claims of tokens whose signatures were already verified, by a hash of the token
+    _verified_token_cache = LruCache()
 
     @classmethod
     def authentication_options_for_api(cls) -> list[AuthenticationOptionForApi]:
@@ -122,38 +139,135 @@ class AuthenticationService:
         appropriate_server_url = cls.server_url(authentication_identifier)
         openid_config_url = f"{appropriate_server_url}/.well-known/openid-configuration"
 
-        if authentication_identifier not in cls.ENDPOINT_CACHE:
-            cls.ENDPOINT_CACHE[authentication_identifier] = {}
-        if authentication_identifier not in cls.JSON_WEB_KEYSET_CACHE:
-            cls.JSON_WEB_KEYSET_CACHE[authentication_identifier] = {}
-        if name not in AuthenticationService.ENDPOINT_CACHE[authentication_identifier]:
-            try:
-                response = requests.get(openid_config_url, timeout=HTTP_REQUEST_TIMEOUT_SECONDS)
-                AuthenticationService.ENDPOINT_CACHE[authentication_identifier] = response.json()
-            except requests.exceptions.ConnectionError as ce:
-                raise OpenIdConnectionError(f"Cannot connect to given open id url: {openid_config_url}") from ce
+        if name not in cls.ENDPOINT_CACHE.get(authentication_identifier, {}):
+            cls._fetch_remote_json(
+                cls.ENDPOINT_CACHE,
+                authentication_identifier,
+                openid_config_url,
+                "jwks_uri",
+                f"Cannot connect to given open id url: {openid_config_url}",
+            )
+        else:
+            cls._refresh_remote_json_in_background_if_stale(
+                cls.ENDPOINT_CACHE, authentication_identifier, openid_config_url, "jwks_uri"
+            )
         if name not in AuthenticationService.ENDPOINT_CACHE[authentication_identifier]:
             raise Exception(f"Unknown OpenID Endpoint: {name}. Tried to get from {openid_config_url}")
         config: str = AuthenticationService.ENDPOINT_CACHE[authentication_identifier].get(name, "")
         return config
 
     @classmethod
-    def get_jwks_config_from_uri(cls, jwks_uri: str) -> dict:
-        if jwks_uri not in AuthenticationService.JSON_WEB_KEYSET_CACHE:
-            try:
-                jwt_ks_response = requests.get(jwks_uri, timeout=HTTP_REQUEST_TIMEOUT_SECONDS)
-                AuthenticationService.JSON_WEB_KEYSET_CACHE[jwks_uri] = jwt_ks_response.json()
-            except requests.exceptions.ConnectionError as ce:
-                raise OpenIdConnectionError(f"Cannot connect to given jwks url: {jwks_uri}") from ce
+    def get_jwks_config_from_uri(cls, jwks_uri: str, force_refresh: bool = False) -> dict:
+        if force_refresh or jwks_uri not in cls.JSON_WEB_KEYSET_CACHE:
+            cls._fetch_remote_json(
+                cls.JSON_WEB_KEYSET_CACHE, jwks_uri, jwks_uri, "keys", f"Cannot connect to given jwks url: {jwks_uri}"
+            )
+        else:
+            cls._refresh_remote_json_in_background_if_stale(cls.JSON_WEB_KEYSET_CACHE, jwks_uri, jwks_uri, "keys")
         return AuthenticationService.JSON_WEB_KEYSET_CACHE[jwks_uri]
 
     @classmethod
     def jwks_public_key_for_key_id(cls, authentication_identifier: str, key_id: str) -> dict:
         jwks_uri = cls.open_id_endpoint_for_name("jwks_uri", authentication_identifier)
         jwks_configs = cls.get_jwks_config_from_uri(jwks_uri)
-        json_key_configs: dict = next(jk for jk in jwks_configs["keys"] if jk["kid"] == key_id)
+        json_key_configs: dict | None = next((jk for jk in jwks_configs["keys"] if jk["kid"] == key_id), None)
+        # the provider may have rotated its keys since we fetched them
+        if (
+            json_key_configs is None
+            and time.time() - cls._fetched_at_by_url.get(jwks_uri, 0) > UNKNOWN_KEY_ID_REFETCH_INTERVAL_IN_SECONDS
+        ):
+            jwks_configs = cls.get_jwks_config_from_uri(jwks_uri, force_refresh=True)
+            json_key_configs = next((jk for jk in jwks_configs["keys"] if jk["kid"] == key_id), None)
+        if json_key_configs is None:
+            raise TokenInvalidError(f"Could not find a json web key with key id '{key_id}' at {jwks_uri}")
         return json_key_configs
 
+    @classmethod
+    def public_key_for_key_id(cls, authentication_identifier: str, key_id: str) -> Any:
+        """Returns the parsed public key so it only gets built again when the provider changes the json web key."""
+        json_key_configs = cls.jwks_public_key_for_key_id(authentication_identifier, key_id)
+        public_key_cache_key = (cls.open_id_endpoint_for_name("jwks_uri", authentication_identifier), key_id)
+        cached_public_key = cls._public_keys.get(public_key_cache_key)
+        if cached_public_key is not None and cached_public_key[0] == json_key_configs:
+            return cached_public_key[1]
+
+        if "x5c" not in json_key_configs:
+            public_key = cls.public_key_from_rsa_public_numbers(json_key_configs)
+        else:
+            public_key = cls.public_key_from_x5c(key_id, json_key_configs)
+        cls._public_keys[public_key_cache_key] = (json_key_configs, public_key)
+        return public_key
+
+    @classmethod
+    def prefetch_open_id_configs_in_background(cls, app: flask.app.Flask) -> None:
+        """Fetches the openid configs and json web keysets when the app starts so the first requests do not wait on them."""
+        auth_configs = [
+            auth_config
+            for auth_config in app.config["SPIFFWORKFLOW_BACKEND_AUTH_CONFIGS"] or []
+            # the backend cannot answer requests to its own openid server while it is still starting up
+            if not auth_config["uri"].startswith(app.config["SPIFFWORKFLOW_BACKEND_URL"])
+        ]
+        if len(auth_configs) == 0:
+            return
+
+        def prefetch() -> None:
+            with app.app_context():
+                for auth_config in auth_configs:
+                    try:
+                        cls.get_jwks_config_from_uri(cls.open_id_endpoint_for_name("jwks_uri", auth_config["identifier"]))
+                    except Exception as exception:
+                        app.logger.warning(f"Could not prefetch openid config for '{auth_config['identifier']}': {exception}")
+
+        threading.Thread(target=prefetch, name="open_id_config_prefetch", daemon=True).start()
+
+    @classmethod
+    def _fetch_remote_json(
+        cls, cache: dict[str, dict], cache_key: str, url: str, required_key: str, connection_error_message: str
+    ) -> None:
+        """Only replaces the cached json, and when it was fetched, with a successful response that has the required key."""
+        try:
+            response = requests.get(url, timeout=HTTP_REQUEST_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            remote_json = response.json()
+        except requests.exceptions.ConnectionError as ce:
+            raise OpenIdConnectionError(connection_error_message) from ce
+        except (requests.exceptions.HTTPError, ValueError) as exception:
+            raise OpenIdConnectionError(f"Received an invalid response from {url}: {exception}") from exception
+        if not isinstance(remote_json, dict) or required_key not in remote_json:
+            raise OpenIdConnectionError(f"Received a response without '{required_key}' from {url}")
+        cache[cache_key] = remote_json
+        cls._fetched_at_by_url[url] = time.time()
+
+    @classmethod
+    def _refresh_remote_json_in_background_if_stale(
+        cls, cache: dict[str, dict], cache_key: str, url: str, required_key: str
+    ) -> None:
+        """Keeps handing out the cached json while a background thread fetches a fresh copy."""
+        refresh_interval_in_seconds = int(current_app.config["SPIFFWORKFLOW_BACKEND_OPEN_ID_CONFIG_REFRESH_INTERVAL_IN_SECONDS"])
+        if time.time() - cls._fetched_at_by_url.get(url, 0) <= refresh_interval_in_seconds:
+            return
+        # do not hammer a provider that is having trouble
+        if time.time() - cls._refresh_failed_at_by_url.get(url, 0) <= REFRESH_RETRY_INTERVAL_IN_SECONDS:
+            return
+        with cls._refresh_lock:
+            if url in cls._urls_being_refreshed:
+                return
+            cls._urls_being_refreshed.add(url)
+
+        app = current_app._get_current_object()  # type: ignore
+
+        def refresh() -> None:
+            try:
+                cls._fetch_remote_json(cache, cache_key, url, required_key, f"Cannot connect to {url}")
+            except Exception as exception:
+                cls._refresh_failed_at_by_url[url] = time.time()
+                app.logger.warning(f"Could not refresh {url}, will keep using the cached copy: {exception}")
+            finally:
+                with cls._refresh_lock:
+                    cls._urls_being_refreshed.discard(url)
+
+        threading.Thread(target=refresh, name="open_id_config_refresh", daemon=True).start()
+
     @classmethod
     def public_key_from_rsa_public_numbers(cls, json_key_configs: dict) -> Any:
         modulus = base64.urlsafe_b64decode(json_key_configs["n"] + "===")
@@ -181,6 +295,30 @@ class AuthenticationService:
 
     @classmethod
     def parse_jwt_token(cls, authentication_identifier: str, token: str) -> dict:
+        """Returns the claims of the token after verifying its signature, which is only done once per token for a while."""
+        cache_key = sha256(f"{authentication_identifier}:{token}".encode()).hexdigest()
+        cached_token = cls._verified_token_cache.get(cache_key)
+        if cached_token is not None:
+            parsed_token, cached_until = cached_token
+            if time.time() < cached_until:
+                return dict(parsed_token)
+            cls._verified_token_cache.delete(cache_key)
+
+        parsed_token = cls._verify_and_parse_jwt_token(authentication_identifier, token)
+        cached_until = time.time() + int(current_app.config["SPIFFWORKFLOW_BACKEND_VERIFIED_TOKEN_CACHE_TTL_IN_SECONDS"])
+        # expired tokens still get parsed so they can be refreshed but they are not worth caching
+        if isinstance(parsed_token.get("exp"), int | float):
+            cached_until = min(cached_until, parsed_token["exp"])
+        if cached_until > time.time():
+            cls._verified_token_cache.set(
+                cache_key,
+                (dict(parsed_token), cached_until),
+                int(current_app.config["SPIFFWORKFLOW_BACKEND_VERIFIED_TOKEN_CACHE_SIZE"]),
+            )
+        return parsed_token
+
+    @classmethod
+    def _verify_and_parse_jwt_token(cls, authentication_identifier: str, token: str) -> dict:
         header = jwt.get_unverified_header(token)
         key_id = str(header.get("kid"))
         parsed_token: dict | None = None
@@ -196,8 +334,7 @@ class AuthenticationService:
             )
         else:
             algorithm = str(header.get("alg"))
-            json_key_configs = cls.jwks_public_key_for_key_id(authentication_identifier, key_id)
-            public_key: Any = None
+            public_key = cls.public_key_for_key_id(authentication_identifier, key_id)
             jwt_decode_options = {
                 "verify_exp": False,
                 "verify_aud": False,
@@ -206,11 +343,6 @@ class AuthenticationService:
                 "leeway": current_app.config["SPIFFWORKFLOW_BACKEND_OPEN_ID_LEEWAY"],
             }
 
-            if "x5c" not in json_key_configs:
-                public_key = cls.public_key_from_rsa_public_numbers(json_key_configs)
-            else:
-                public_key = cls.public_key_from_x5c(key_id, json_key_configs)
-
             # tokens generated from the cli have an aud like: [ "realm-management", "account" ]
             # while tokens generated from frontend have an aud like: "spiffworkflow-backend."
             # as such, we cannot simply pull the first valid audience out of cls.valid_audiences(authentication_identifier)
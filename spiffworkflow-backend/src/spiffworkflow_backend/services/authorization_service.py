@@ -9,8 +9,6 @@ from flask import g
 from flask import request
 from flask import scaffold
 from sqlalchemy import and_
-from sqlalchemy import func
-from sqlalchemy import literal
 from sqlalchemy import or_
 
 from spiffworkflow_backend.exceptions.error import HumanTaskAlreadyCompletedError
@@ -24,6 +22,7 @@ from spiffworkflow_backend.helpers.api_version import V1_API_PATH_PREFIX
 from spiffworkflow_backend.interfaces import AddedPermissionDict
 from spiffworkflow_backend.interfaces import GroupPermissionsDict
 from spiffworkflow_backend.interfaces import UserToGroupDict
+from spiffworkflow_backend.models.cache_generation import CacheGenerationTable
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.group import SPIFF_GUEST_GROUP
 from spiffworkflow_backend.models.group import GroupModel
@@ -39,6 +38,7 @@ from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.models.user_group_assignment import UserGroupAssignmentModel
 from spiffworkflow_backend.models.user_group_assignment_waiting import UserGroupAssignmentWaitingModel
 from spiffworkflow_backend.routes.openid_blueprint import openid_blueprint
+from spiffworkflow_backend.services.permission_matcher_cache_service import PermissionMatcherCacheService
 from spiffworkflow_backend.services.user_service import UserService
 
 
@@ -114,43 +114,25 @@ class AuthorizationService:
 
     @classmethod
     def has_permission(cls, principals: list[PrincipalModel], permission: str, target_uri: str) -> bool:
-        principal_ids = [p.id for p in principals]
         target_uri_normalized = target_uri.removeprefix(V1_API_PATH_PREFIX)
-
-        permission_assignments = (
-            PermissionAssignmentModel.query.filter(PermissionAssignmentModel.principal_id.in_(principal_ids))
-            .filter_by(permission=permission)
-            .join(PermissionTargetModel)
-            .filter(
-                or_(
-                    # found from https://stackoverflow.com/a/46783555
-                    literal(target_uri_normalized).like(PermissionTargetModel.uri),
-                    # to check for exact matches as well
-                    # see test_user_can_access_base_path_when_given_wildcard_permission unit test
-                    func.REPLACE(func.REPLACE(PermissionTargetModel.uri, "/%", ""), ":%", "") == target_uri_normalized,
-                )
-            )
-            .all()
-        )
-
-        if len(permission_assignments) == 0:
-            return False
-
-        all_permissions_permit = True
-        for permission_assignment in permission_assignments:
-            if permission_assignment.grant_type == "permit":
-                pass
-            elif permission_assignment.grant_type == "deny":
-                all_permissions_permit = False
-            else:
-                raise Exception(f"Unknown grant type: {permission_assignment.grant_type}")
-
-        return all_permissions_permit
+        return PermissionMatcherCacheService.matcher_for_principals(principals).has_permission(permission, target_uri_normalized)
 
     @classmethod
     def user_has_permission(cls, user: UserModel, permission: str, target_uri: str) -> bool:
-        principals = UserService.all_principals_for_user(user)
-        return cls.has_permission(principals, permission, target_uri)
+        target_uri_normalized = target_uri.removeprefix(V1_API_PATH_PREFIX)
+        return PermissionMatcherCacheService.matcher_for_user(user).has_permission(permission, target_uri_normalized)
+
+    @classmethod
+    def user_has_permissions(cls, user: UserModel, permissions_and_target_uris: list[tuple[str, str]]) -> list[bool]:
+        """Checks many (permission, target_uri) pairs for a user in one pass and returns the results in the same order.
+
+        Like permission_assignments_include, a * in a target uri is treated as the % wildcard.
+        """
+        permissions_and_target_uris_normalized = [
+            (permission, re.sub(r"\*", "%", target_uri).removeprefix(V1_API_PATH_PREFIX))
+            for permission, target_uri in permissions_and_target_uris
+        ]
+        return PermissionMatcherCacheService.matcher_for_user(user).has_permissions(permissions_and_target_uris_normalized)
 
     @classmethod
     def all_permission_assignments_for_user(cls, user: UserModel) -> list[PermissionAssignmentModel]:
@@ -209,6 +191,7 @@ class AuthorizationService:
         for group in GroupModel.query.all():
             db.session.delete(group)
         db.session.commit()
+        PermissionMatcherCacheService.add_new_generation(CacheGenerationTable.permission_assignment.value)
 
     # if you have access to PG:hey:%, you should be able to see PG hey, obviously.
     # if you have access to PG:hey:yo:%, you should ALSO be able to see PG hey, because that allows you to navigate to hey:yo.
@@ -252,6 +235,9 @@ class AuthorizationService:
     def import_permissions_from_yaml_file(cls, user_model: UserModel | None = None) -> AddedPermissionDict:
         group_permissions = cls.parse_permissions_yaml_into_group_info()
         result = cls.add_permissions_from_group_permissions(group_permissions, user_model)
+        # importing for a single user happens on every sign in and the orm events already cover any changes it makes
+        if user_model is None:
+            PermissionMatcherCacheService.add_new_generation(CacheGenerationTable.permission_assignment.value)
         return result
 
     @classmethod
@@ -842,7 +828,7 @@ class AuthorizationService:
                         "group_identifier": group_identifier,
                     }
                     user_to_group_identifiers.append(user_to_group_dict)
-                    (wugam, new_user_to_group_identifiers) = UserService.add_user_to_group_or_add_to_waiting(
+                    wugam, new_user_to_group_identifiers = UserService.add_user_to_group_or_add_to_waiting(
                         username, group_identifier
                     )
                     if wugam is not None:
@@ -950,3 +936,4 @@ class AuthorizationService:
             initial_waiting_group_assignments,
             group_permissions_only=group_permissions_only,
         )
+        PermissionMatcherCacheService.add_new_generation(CacheGenerationTable.permission_assignment.value)
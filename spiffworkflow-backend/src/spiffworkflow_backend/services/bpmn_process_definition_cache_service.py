@@ -0,0 +1,99 @@
+import copy
+from dataclasses import dataclass
+from typing import Any
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
+from spiffworkflow_backend.models.db import db
+
+
+@dataclass
+class BpmnProcessDefinitionCacheEntry:
+    spec: dict
+    subprocess_specs: dict
+
+    # same structure as ProcessInstanceProcessor.bpmn_definition_to_task_definitions_mappings
+    # but every model in here is a detached copy that does not belong to any session.
+    bpmn_definition_to_task_definitions_mappings: dict
+
+
+class BpmnProcessDefinitionCacheService:
+    """In-memory cache of the hydrated spec dicts for a top level bpmn_process_definition.
+
+    bpmn_process_definition and task_definition rows are content-addressed by their hashes and never change
+    once written, so everything that gets assembled from them can be cached by the id of the top level
+    definition for the life of the process.
+
+    The spec dicts handed out are shared between callers and must be treated as read only. The processor
+    deep copies the full bpmn process dict before giving it to spiff so the engine never mutates them.
+    """
+
+    _cache = LruCache()
+
+    @classmethod
+    def max_size(cls) -> int:
+        return int(current_app.config["SPIFFWORKFLOW_BACKEND_BPMN_PROCESS_DEFINITION_CACHE_SIZE"])
+
+    @classmethod
+    def get(cls, bpmn_process_definition_id: int) -> tuple[dict, dict, dict] | None:
+        if cls.max_size() <= 0:
+            return None
+
+        entry: BpmnProcessDefinitionCacheEntry | None = cls._cache.get(bpmn_process_definition_id)
+        if entry is None:
+            return None
+
+        bpmn_definition_to_task_definitions_mappings: dict = {}
+        for bpmn_identifier, definitions in entry.bpmn_definition_to_task_definitions_mappings.items():
+            bpmn_definition_to_task_definitions_mappings[bpmn_identifier] = dict(definitions)
+            if "bpmn_process_definition" in definitions:
+                # bpmn process definitions get assigned to relationships on new bpmn processes so they need
+                # to be part of the current session. load=False makes this happen without emitting sql.
+                bpmn_definition_to_task_definitions_mappings[bpmn_identifier]["bpmn_process_definition"] = db.session.merge(
+                    definitions["bpmn_process_definition"], load=False
+                )
+        return (entry.spec, entry.subprocess_specs, bpmn_definition_to_task_definitions_mappings)
+
+    @classmethod
+    def set(
+        cls,
+        bpmn_process_definition_id: int,
+        spec: dict,
+        subprocess_specs: dict,
+        bpmn_definition_to_task_definitions_mappings: dict,
+    ) -> None:
+        max_size = cls.max_size()
+        if max_size <= 0:
+            return
+
+        detached_mappings: dict = {}
+        for bpmn_identifier, definitions in bpmn_definition_to_task_definitions_mappings.items():
+            detached_mappings[bpmn_identifier] = {k: cls._detached_copy(v) for k, v in definitions.items()}
+
+        entry = BpmnProcessDefinitionCacheEntry(
+            spec=copy.deepcopy(spec),
+            subprocess_specs=copy.deepcopy(subprocess_specs),
+            bpmn_definition_to_task_definitions_mappings=detached_mappings,
+        )
+        cls._cache.set(bpmn_process_definition_id, entry, max_size)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        return cls._cache.stats()
+
+    @classmethod
+    def _detached_copy(cls, db_model: SpiffworkflowBaseDBModel) -> SpiffworkflowBaseDBModel:
+        column_values: dict[str, Any] = {}
+        for column_attr in inspect(db_model).mapper.column_attrs:
+            column_values[column_attr.key] = copy.deepcopy(getattr(db_model, column_attr.key))
+        detached_db_model = db_model.__class__(**column_values)
+        make_transient_to_detached(detached_db_model)
+        return detached_db_model
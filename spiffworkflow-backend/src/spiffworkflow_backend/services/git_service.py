@@ -11,6 +11,7 @@ from spiffworkflow_backend.config import ConfigurationError
 from spiffworkflow_backend.models.process_model import ProcessModelInfo
 from spiffworkflow_backend.services.data_setup_service import DataSetupService
 from spiffworkflow_backend.services.file_system_service import FileSystemService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
 from spiffworkflow_backend.services.spec_file_service import SpecFileService
 
 
@@ -246,6 +247,7 @@ class GitService:
             ["pull", "--rebase"], context_directory=current_app.config["SPIFFWORKFLOW_BACKEND_BPMN_SPEC_ABSOLUTE_DIR"]
         )
         DataSetupService.save_all_process_models()
+        ProcessModelSpecCacheService.clear()
         return True
 
     @classmethod
@@ -1,11 +1,14 @@
 import os
+import time
 from typing import Any
 
+from flask import current_app
 from flask import g
 from SpiffWorkflow.bpmn import BpmnEvent  # type: ignore
 from SpiffWorkflow.bpmn.specs.event_definitions.message import CorrelationProperty  # type: ignore
 from SpiffWorkflow.bpmn.specs.mixins import StartEventMixin  # type: ignore
 from SpiffWorkflow.spiff.specs.event_definitions import MessageEventDefinition  # type: ignore
+from sqlalchemy import update
 
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
     queue_process_instance_if_appropriate,
@@ -39,48 +42,46 @@ class MessageService:
         cls,
         message_instance_send: MessageInstanceModel,
         execution_mode: str | None = None,
+        additional_processing_identifier: str | None = None,
     ) -> MessageInstanceModel | None:
         """Connects the given send message to a 'receive' message if possible.
 
         :param message_instance_send:
         :return: the message instance that received this message.
         """
-        # Thread safe via db locking - don't try to progress the same send message over multiple instances
         if message_instance_send.status != MessageStatuses.ready.value:
             return None
-        message_instance_send.status = MessageStatuses.running.value
-        db.session.add(message_instance_send)
-        db.session.commit()
 
-        # Find available messages that might match
-        available_receive_messages = MessageInstanceModel.query.filter_by(
-            name=message_instance_send.name,
-            status=MessageStatuses.ready.value,
-            message_type=MessageTypes.receive.value,
-        ).all()
         message_instance_receive: MessageInstanceModel | None = None
         try:
-            for message_instance in available_receive_messages:
-                if message_instance.correlates(message_instance_send, CustomBpmnScriptEngine()):
-                    message_instance_receive = message_instance
+            message_instance_receive = cls.find_receive_message_instance(message_instance_send)
+            message_triggerable_process_model = None
             if message_instance_receive is None:
-                # Check for a message triggerable process and start that to create a new message_instance_receive
                 message_triggerable_process_model = MessageTriggerableProcessModel.query.filter_by(
                     message_name=message_instance_send.name
                 ).first()
-                if message_triggerable_process_model:
-                    user: UserModel | None = message_instance_send.user
-                    if user is None:
-                        user = UserService.find_or_create_system_user()
-                    receiving_process_instance = MessageService.start_process_with_message(
-                        message_triggerable_process_model, user
-                    )
-                    message_instance_receive = MessageInstanceModel.query.filter_by(
-                        process_instance_id=receiving_process_instance.id,
-                        message_type="receive",
-                        status="ready",
-                    ).first()
-            else:
+                if message_triggerable_process_model is None:
+                    # nothing can receive this message yet so leave it as it is without writing to the db
+                    return None
+
+            # Thread safe via db locking - don't try to progress the same send message over multiple instances
+            if not cls._claim_send_message(message_instance_send):
+                return None
+
+            if message_triggerable_process_model is not None:
+                # Start the message triggerable process to create a new message_instance_receive
+                user: UserModel | None = message_instance_send.user
+                if user is None:
+                    user = UserService.find_or_create_system_user()
+                receiving_process_instance = MessageService.start_process_with_message(
+                    message_triggerable_process_model, user, additional_processing_identifier=additional_processing_identifier
+                )
+                message_instance_receive = MessageInstanceModel.query.filter_by(
+                    process_instance_id=receiving_process_instance.id,
+                    message_type="receive",
+                    status="ready",
+                ).first()
+            elif message_instance_receive is not None:
                 receiving_process_instance = MessageService.get_process_instance_for_message_instance(message_instance_receive)
 
             # Assure we can send the message, otherwise keep going.
@@ -91,14 +92,19 @@ class MessageService:
                 return None
 
             try:
-                # currently only controllers and apscheduler call this
-                cls.raise_if_running_in_celery("correlate_send_message")
-                with ProcessInstanceQueueService.dequeued(receiving_process_instance):
+                cls.raise_if_running_in_celery("correlate_send_message", additional_processing_identifier)
+                with ProcessInstanceQueueService.dequeued(
+                    receiving_process_instance, additional_processing_identifier=additional_processing_identifier
+                ):
                     # Set the receiving message to running, so it is not altered elswhere ...
                     message_instance_receive.status = "running"
 
                     cls.process_message_receive(
-                        receiving_process_instance, message_instance_receive, message_instance_send, execution_mode=execution_mode
+                        receiving_process_instance,
+                        message_instance_receive,
+                        message_instance_send,
+                        execution_mode=execution_mode,
+                        additional_processing_identifier=additional_processing_identifier,
                     )
                     message_instance_receive.status = "completed"
                     message_instance_receive.counterpart_id = message_instance_send.id
@@ -130,27 +136,133 @@ class MessageService:
             raise exception
 
     @classmethod
-    def correlate_all_message_instances(cls) -> None:
-        """Look at ALL the Send and Receive Messages and attempt to find correlations."""
-        message_instances_send = MessageInstanceModel.query.filter_by(message_type="send", status="ready").all()
+    def find_receive_message_instance(cls, message_instance_send: MessageInstanceModel) -> MessageInstanceModel | None:
+        """Returns the oldest ready receive message that correlates with the given send message.
+
+        Receive messages with a correlation fingerprint are looked up by the fingerprints computed from the send message,
+        once per distinct correlation shape. Only receive messages without a fingerprint are checked one by one.
+        """
+        script_engine = CustomBpmnScriptEngine()
+        ready_receive_messages = MessageInstanceModel.query.filter_by(
+            name=message_instance_send.name,
+            status=MessageStatuses.ready.value,
+            message_type=MessageTypes.receive.value,
+        )
+
+        shape_hashes = [
+            row.correlation_fingerprint_shape
+            for row in ready_receive_messages.filter(MessageInstanceModel.correlation_fingerprint_shape.is_not(None))  # type: ignore
+            .with_entities(MessageInstanceModel.correlation_fingerprint_shape)
+            .distinct()
+            .all()
+        ]
+        fingerprints: set[str] = set()
+        evaluated_expressions: dict[str, Any] = {}
+        for shape_hash in shape_hashes:
+            message_instance_with_shape = ready_receive_messages.filter_by(correlation_fingerprint_shape=shape_hash).first()
+            if message_instance_with_shape is None:
+                continue
+            shape = message_instance_with_shape.correlation_shape()
+            if shape is not None:
+                fingerprints.update(
+                    message_instance_send.correlation_fingerprints_for_shape(shape, script_engine, evaluated_expressions)
+                )
+
+        message_instance_receive: MessageInstanceModel | None = None
+        if len(fingerprints) > 0:
+            fingerprint_matches = (
+                ready_receive_messages.filter(MessageInstanceModel.correlation_fingerprint.in_(fingerprints))  # type: ignore
+                .order_by(MessageInstanceModel.id)
+                .all()
+            )
+            for message_instance in fingerprint_matches:
+                if message_instance.correlates(message_instance_send, script_engine):
+                    message_instance_receive = message_instance
+                    break
+
+        # receive messages without a fingerprint, like ones that accept any message with their name or were created
+        # before fingerprints existed, still have to be checked one by one.
+        unfingerprinted_query = ready_receive_messages.filter(
+            MessageInstanceModel.correlation_fingerprint.is_(None)  # type: ignore
+        )
+        if message_instance_receive is not None:
+            unfingerprinted_query = unfingerprinted_query.filter(MessageInstanceModel.id < message_instance_receive.id)
+        for message_instance in unfingerprinted_query.order_by(MessageInstanceModel.id).all():
+            if message_instance.correlates(message_instance_send, script_engine):
+                return message_instance
+        return message_instance_receive
+
+    @classmethod
+    def _claim_send_message(cls, message_instance_send: MessageInstanceModel) -> bool:
+        """Sets the send message to running if it is still ready and returns whether this call did that."""
+        result = db.session.execute(
+            update(MessageInstanceModel)
+            .where(
+                MessageInstanceModel.id == message_instance_send.id,
+                MessageInstanceModel.status == MessageStatuses.ready.value,
+            )
+            .values(status=MessageStatuses.running.value, updated_at_in_seconds=round(time.time()))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 0:  # type: ignore
+            return False
+        db.session.refresh(message_instance_send)
+        return True
 
-        for message_instance_send in message_instances_send:
-            cls.correlate_send_message(message_instance_send)
+    @classmethod
+    def correlate_all_message_instances(
+        cls,
+        message_names: list[str] | None = None,
+        batch_size: int | None = None,
+        additional_processing_identifier: str | None = None,
+    ) -> None:
+        """Look at ALL the Send and Receive Messages and attempt to find correlations.
+
+        Pass message_names to only look at send messages with those names. Send messages are loaded batch_size at a time.
+        """
+        if batch_size is None:
+            batch_size = int(current_app.config["SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_BATCH_SIZE"])
+        last_id = 0
+        while True:
+            query = MessageInstanceModel.query.filter(
+                MessageInstanceModel.message_type == MessageTypes.send.value,
+                MessageInstanceModel.status == MessageStatuses.ready.value,
+                MessageInstanceModel.id > last_id,
+            )
+            if message_names is not None:
+                query = query.filter(MessageInstanceModel.name.in_(message_names))  # type: ignore
+            message_instances_send = query.order_by(MessageInstanceModel.id).limit(batch_size).all()
+            if len(message_instances_send) == 0:
+                return
+            last_id = message_instances_send[-1].id
+
+            for message_instance_send in message_instances_send:
+                cls.correlate_send_message(
+                    message_instance_send, additional_processing_identifier=additional_processing_identifier
+                )
+            if len(message_instances_send) < batch_size:
+                return
 
     @classmethod
     def start_process_with_message(
         cls,
         message_triggerable_process_model: MessageTriggerableProcessModel,
         user: UserModel,
+        additional_processing_identifier: str | None = None,
     ) -> ProcessInstanceModel:
         """Start up a process instance, so it is ready to catch the event."""
-        cls.raise_if_running_in_celery("start_process_with_message")
+        cls.raise_if_running_in_celery("start_process_with_message", additional_processing_identifier)
         receiving_process_instance = ProcessInstanceService.create_process_instance_from_process_model_identifier(
             message_triggerable_process_model.process_model_identifier,
             user,
         )
-        with ProcessInstanceQueueService.dequeued(receiving_process_instance):
-            processor_receive = ProcessInstanceProcessor(receiving_process_instance)
+        with ProcessInstanceQueueService.dequeued(
+            receiving_process_instance, additional_processing_identifier=additional_processing_identifier
+        ):
+            processor_receive = ProcessInstanceProcessor(
+                receiving_process_instance, additional_processing_identifier=additional_processing_identifier
+            )
             cls._cancel_non_matching_start_events(processor_receive, message_triggerable_process_model)
             processor_receive.save()
 
@@ -164,6 +276,7 @@ class MessageService:
         message_instance_receive: MessageInstanceModel,
         message_instance_send: MessageInstanceModel,
         execution_mode: str | None = None,
+        additional_processing_identifier: str | None = None,
     ) -> None:
         correlation_properties = []
         for cr in message_instance_receive.correlation_rules:
@@ -183,7 +296,9 @@ class MessageService:
             payload=message_instance_send.payload,
             correlations=message_instance_send.correlation_keys,
         )
-        processor_receive = ProcessInstanceProcessor(receiving_process_instance)
+        processor_receive = ProcessInstanceProcessor(
+            receiving_process_instance, additional_processing_identifier=additional_processing_identifier
+        )
         processor_receive.bpmn_process_instance.send_event(bpmn_event)
         execution_strategy_name = None
 
@@ -311,9 +426,16 @@ class MessageService:
         return receiving_process_instance
 
     @classmethod
-    def raise_if_running_in_celery(cls, method_name: str) -> None:
-        if os.environ.get("SPIFFWORKFLOW_BACKEND_RUNNING_IN_CELERY_WORKER") == "true":
+    def raise_if_running_in_celery(cls, method_name: str, additional_processing_identifier: str | None = None) -> None:
+        if (
+            os.environ.get("SPIFFWORKFLOW_BACKEND_RUNNING_IN_CELERY_WORKER") == "true"
+            and additional_processing_identifier is None
+        ):
             raise MessageServiceError(
                 f"Calling {method_name} in a celery worker. This is not supported! We may need to add"
                 " additional_processing_identifier to this code path."
             )
+
+
+def correlate_notified_message_names(message_names: list[str]) -> None:
+    MessageService.correlate_all_message_instances(message_names=message_names)
@@ -1,15 +1,19 @@
 import json
 import os
 import sys
+from collections.abc import Iterator
 from typing import Any
 
 import connexion  # type: ignore
 import flask.wrappers
 import sentry_sdk
+from prometheus_client.core import CounterMetricFamily
 from prometheus_flask_exporter import ConnexionPrometheusMetrics  # type: ignore
 from sentry_sdk.integrations.flask import FlaskIntegration
 from werkzeug.exceptions import NotFound
 
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import run_message_stats
+
 
 def get_version_info_data() -> dict[str, Any]:
     version_info_data_dict = {}
@@ -19,9 +23,26 @@ def get_version_info_data() -> dict[str, Any]:
     return version_info_data_dict
 
 
+class RunMessageStatsCollector:
+    """Reports the counts of process instance run messages this process sent, coalesced, and requeued on lock contention."""
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        counter = CounterMetricFamily(
+            "spiffworkflow_backend_run_messages", "Process instance run messages by outcome", labels=["outcome"]
+        )
+        for outcome, count in run_message_stats().items():
+            counter.add_metric([outcome], count)
+        yield counter
+
+
 def setup_prometheus_metrics(app: flask.app.Flask, connexion_app: connexion.apps.flask_app.FlaskApp) -> None:
     metrics = ConnexionPrometheusMetrics(connexion_app)
     app.config["PROMETHEUS_METRICS"] = metrics
+    try:
+        metrics.registry.register(RunMessageStatsCollector())
+    except ValueError:
+        # the collector is already registered if an app was created before in this process, like in tests
+        pass
     version_info_data = get_version_info_data()
     if len(version_info_data) > 0:
         # prometheus does not allow periods in key names
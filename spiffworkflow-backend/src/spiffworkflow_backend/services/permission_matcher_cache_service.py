@@ -0,0 +1,172 @@
+import threading
+import time
+from collections.abc import Hashable
+from typing import Any
+
+from flask import current_app
+from sqlalchemy import delete
+from sqlalchemy import event
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.helpers.permission_matcher import PermissionMatcher
+from spiffworkflow_backend.models.cache_generation import CacheGenerationModel
+from spiffworkflow_backend.models.cache_generation import CacheGenerationTable
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.group import GroupModel
+from spiffworkflow_backend.models.permission_assignment import PermissionAssignmentModel
+from spiffworkflow_backend.models.permission_target import PermissionTargetModel
+from spiffworkflow_backend.models.principal import PrincipalModel
+from spiffworkflow_backend.models.user import UserModel
+from spiffworkflow_backend.models.user_group_assignment import UserGroupAssignmentModel
+
+CHANGED_PERMISSION_CACHE_TABLES_SESSION_INFO_KEY = "changed_permission_cache_tables"
+
+# changes to any of these can change what a user is allowed to do
+CACHE_TABLES_BY_MODEL_THAT_AFFECTS_PERMISSIONS: dict[type, str] = {
+    GroupModel: CacheGenerationTable.user_group_assignment.value,
+    PermissionAssignmentModel: CacheGenerationTable.permission_assignment.value,
+    PermissionTargetModel: CacheGenerationTable.permission_assignment.value,
+    PrincipalModel: CacheGenerationTable.principal.value,
+    UserGroupAssignmentModel: CacheGenerationTable.user_group_assignment.value,
+}
+PERMISSION_CACHE_TABLES = sorted(set(CACHE_TABLES_BY_MODEL_THAT_AFFECTS_PERMISSIONS.values()))
+
+
+class PermissionMatcherCacheService:
+    """In-memory cache of compiled permission matchers per user so permission checks do not need to query the database.
+
+    Every matcher is stored with the local generation it was built in, which is bumped whenever this process commits
+    changes to permissions, groups, principals or group memberships. Those commits also add a cache_generation row so
+    other processes find out about them by checking the newest generation id, which is a single integer, at most once
+    per check interval.
+    """
+
+    _cache = LruCache()
+    _generation = 0
+    _generation_lock = threading.Lock()
+    _database_generation_id: int | None = None
+    _database_generation_checked_at: float = 0.0
+
+    @classmethod
+    def max_size(cls) -> int:
+        return int(current_app.config["SPIFFWORKFLOW_BACKEND_PERMISSION_MATCHER_CACHE_SIZE"])
+
+    @classmethod
+    def matcher_for_user(cls, user: UserModel) -> PermissionMatcher:
+        principal_ids_query = select(PrincipalModel.id).where(
+            or_(
+                PrincipalModel.user_id == user.id,
+                PrincipalModel.group_id.in_(  # type: ignore
+                    select(UserGroupAssignmentModel.group_id).where(UserGroupAssignmentModel.user_id == user.id)
+                ),
+            )
+        )
+        return cls._matcher(("user", user.id), principal_ids_query)
+
+    @classmethod
+    def matcher_for_principals(cls, principals: list[PrincipalModel]) -> PermissionMatcher:
+        principal_ids = sorted(principal.id for principal in principals)
+        return cls._matcher(("principals", tuple(principal_ids)), principal_ids)
+
+    @classmethod
+    def add_new_generation(cls, cache_table: str) -> None:
+        """Tells every process that permissions changed in a way the orm events do not see, like bulk updates."""
+        db.session.execute(insert(CacheGenerationModel).values(cache_table=cache_table))  # type: ignore
+        newest_generation_id = CacheGenerationModel.newest_generation_id_for_tables(PERMISSION_CACHE_TABLES)
+        # only the newest id matters so do not let the table grow with every change
+        db.session.execute(
+            delete(CacheGenerationModel).where(
+                CacheGenerationModel.cache_table.in_(PERMISSION_CACHE_TABLES),  # type: ignore
+                CacheGenerationModel.id < newest_generation_id,
+            )
+        )
+        db.session.commit()
+        cls.invalidate()
+
+    @classmethod
+    def invalidate(cls) -> None:
+        with cls._generation_lock:
+            cls._generation += 1
+            # check the database again on the next lookup instead of trusting the generation id from before this change
+            cls._database_generation_checked_at = 0.0
+        cls._cache.clear()
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.invalidate()
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        return {
+            **cls._cache.stats(),
+            "generation": cls._generation,
+            "database_generation_id": cls._database_generation_id or 0,
+        }
+
+    @classmethod
+    def _invalidate_if_database_generation_changed(cls) -> None:
+        check_interval_in_seconds = float(
+            current_app.config["SPIFFWORKFLOW_BACKEND_PERMISSION_CACHE_GENERATION_CHECK_INTERVAL_IN_SECONDS"]
+        )
+        now = time.time()
+        if now - cls._database_generation_checked_at < check_interval_in_seconds:
+            return
+
+        database_generation_id = CacheGenerationModel.newest_generation_id_for_tables(PERMISSION_CACHE_TABLES)
+        with cls._generation_lock:
+            cls._database_generation_checked_at = now
+            if database_generation_id == cls._database_generation_id:
+                return
+            cls._database_generation_id = database_generation_id
+            cls._generation += 1
+        cls._cache.clear()
+
+    @classmethod
+    def _matcher(cls, cache_key: Hashable, principal_ids: Any) -> PermissionMatcher:
+        max_size = cls.max_size()
+        if max_size > 0:
+            cls._invalidate_if_database_generation_changed()
+        generation = cls._generation
+        if max_size > 0:
+            cached = cls._cache.get(cache_key)
+            if cached is not None and cached[0] == generation:
+                return cached[1]  # type: ignore
+
+        rows = db.session.execute(
+            select(PermissionAssignmentModel.permission, PermissionTargetModel.uri, PermissionAssignmentModel.grant_type)
+            .join(PermissionTargetModel, PermissionTargetModel.id == PermissionAssignmentModel.permission_target_id)
+            .where(PermissionAssignmentModel.principal_id.in_(principal_ids))  # type: ignore
+        ).all()
+        matcher = PermissionMatcher((row.permission, row.uri, row.grant_type) for row in rows)
+        # if the generation changed while building this, the matcher may have been built from outdated data
+        if max_size > 0 and generation == cls._generation:
+            cls._cache.set(cache_key, (generation, matcher), max_size)
+        return matcher
+
+
+@event.listens_for(Session, "before_flush")
+def add_permission_cache_generations_before_flush(session: Any, flush_context: Any, instances: Any) -> None:
+    changed_cache_tables = session.info.setdefault(CHANGED_PERMISSION_CACHE_TABLES_SESSION_INFO_KEY, set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        cache_table = CACHE_TABLES_BY_MODEL_THAT_AFFECTS_PERMISSIONS.get(type(instance))
+        if cache_table is not None and cache_table not in changed_cache_tables:
+            # added to the same flush so other processes see the new generation exactly when they see the change
+            session.add(CacheGenerationModel(cache_table=cache_table))
+            changed_cache_tables.add(cache_table)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_permission_matchers_after_commit(session: Any) -> None:
+    if session.info.pop(CHANGED_PERMISSION_CACHE_TABLES_SESSION_INFO_KEY, None):
+        PermissionMatcherCacheService.invalidate()
+
+
+# after_soft_rollback also fires when the session had not started talking to the db yet
+@event.listens_for(Session, "after_soft_rollback")
+def discard_permission_changes_after_rollback(session: Any, previous_transaction: Any) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(CHANGED_PERMISSION_CACHE_TABLES_SESSION_INFO_KEY, None)
@@ -5,9 +5,12 @@ from typing import Any
 from flask import current_app
 from sqlalchemy import and_
 from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import update
 
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.services.worker_heartbeat_service import WorkerHeartbeatService
 
 
 class ExpectedLockNotFoundError(Exception):
@@ -28,6 +31,7 @@ class ProcessInstanceLockService:
             "thread_id": threading.get_ident(),
             "locks": {},
         }
+        WorkerHeartbeatService.start_heartbeat_if_needed()
 
     @classmethod
     def get_thread_local_locking_context(cls, additional_processing_identifier: str | None = None) -> dict[str, Any]:
@@ -48,6 +52,13 @@ class ProcessInstanceLockService:
         ctx = cls.get_thread_local_locking_context(additional_processing_identifier=additional_processing_identifier)
         ctx["locks"][process_instance_id] = queue_entry.id
 
+    @classmethod
+    def lock_many(
+        cls, queue_entry_ids_by_process_instance_id: dict[int, int], additional_processing_identifier: str | None = None
+    ) -> None:
+        ctx = cls.get_thread_local_locking_context(additional_processing_identifier=additional_processing_identifier)
+        ctx["locks"].update(queue_entry_ids_by_process_instance_id)
+
     @classmethod
     def unlock(cls, process_instance_id: int, additional_processing_identifier: str | None = None) -> int:
         queue_model_id = cls.try_unlock(process_instance_id, additional_processing_identifier=additional_processing_identifier)
@@ -67,7 +78,8 @@ class ProcessInstanceLockService:
         return process_instance_id in ctx["locks"]
 
     @classmethod
-    def remove_stale_locks(cls) -> None:
+    def remove_stale_locks(cls) -> list[int]:
+        """Unlocks queue entries that have been locked for too long and returns their process instance ids."""
         max_duration = current_app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"]
         current_time = round(time.time())
         five_min_ago = current_time - max_duration
@@ -75,7 +87,7 @@ class ProcessInstanceLockService:
         # TODO: remove check for NULL locked_at_in_seconds and fallback to updated_at_in_seconds
         #   once we can confirm that old entries have been taken care of on current envs.
         # New code should not allow rows where locked_by has a value but locked_at_in_seconds is null.
-        entries_with_stale_locks = ProcessInstanceQueueModel.query.filter(
+        stale_lock_filter = and_(
             ProcessInstanceQueueModel.locked_by != None,  # noqa: E711
             or_(
                 ProcessInstanceQueueModel.locked_at_in_seconds <= five_min_ago,
@@ -84,15 +96,99 @@ class ProcessInstanceLockService:
                     ProcessInstanceQueueModel.locked_at_in_seconds == None,  # noqa: E711
                 ),
             ),
-        ).all()
+        )
+        released_process_instance_ids = cls.release_locks(
+            stale_lock_filter, f"they have been locked for more than {max_duration} seconds"
+        )
+        if WorkerHeartbeatService.enabled():
+            released_process_instance_ids += cls.remove_locks_of_dead_workers()
+        return released_process_instance_ids
 
-        for entry in entries_with_stale_locks:
-            locked_duration = current_time - (entry.locked_at_in_seconds or entry.updated_at_in_seconds)
-            current_app.logger.info(
-                f"Removing stale lock for process instance: {entry.process_instance_id} with locked_by:"
-                f" '{entry.locked_by}' because it has been locked for seconds: {locked_duration}"
+    @classmethod
+    def remove_locks_of_dead_workers(cls) -> list[int]:
+        """Unlocks queue entries locked by processes that stopped recording worker heartbeats before they took the locks."""
+        dead_worker_identifiers = WorkerHeartbeatService.dead_worker_identifiers()
+        if len(dead_worker_identifiers) == 0:
+            return []
+        dead_worker_lock_filter = and_(
+            or_(
+                *[
+                    ProcessInstanceQueueModel.locked_by.like(f"%:{worker_identifier}:%")  # type: ignore
+                    for worker_identifier in dead_worker_identifiers
+                ]
+            ),
+            # a lock taken within the heartbeat timeout shows the process was alive recently even if its heartbeat stalled
+            or_(
+                ProcessInstanceQueueModel.locked_at_in_seconds == None,  # noqa: E711
+                ProcessInstanceQueueModel.locked_at_in_seconds < WorkerHeartbeatService.dead_if_last_heartbeat_before(),  # type: ignore
+            ),
+        )
+        released_process_instance_ids = cls.release_locks(
+            dead_worker_lock_filter, "the workers holding them stopped recording heartbeats"
+        )
+        WorkerHeartbeatService.forget_dead_workers(dead_worker_identifiers)
+        return released_process_instance_ids
+
+    @classmethod
+    def release_locks(cls, lock_filter: Any, reason: str) -> list[int]:
+        """Unlocks the queue entries matching the filter with one update per batch and returns their process instance ids.
+
+        The filter is applied again in the update so a lock that was taken in the meantime is left alone and is not
+        returned or logged. Mysql has no RETURNING so the entries that were reset are selected again before the commit.
+        """
+        batch_size = int(current_app.config["SPIFFWORKFLOW_BACKEND_STALE_LOCK_RELEASE_BATCH_SIZE"])
+        released_process_instance_ids: list[int] = []
+        last_queue_entry_id = 0
+        while True:
+            queue_entries = (
+                db.session.query(
+                    ProcessInstanceQueueModel.id,
+                    ProcessInstanceQueueModel.process_instance_id,
+                    ProcessInstanceQueueModel.locked_by,
+                )
+                .filter(lock_filter, ProcessInstanceQueueModel.id > last_queue_entry_id)
+                .order_by(ProcessInstanceQueueModel.id)
+                .limit(batch_size)
+                .all()
+            )
+            if len(queue_entries) == 0:
+                break
+            last_queue_entry_id = queue_entries[-1].id
+
+            queue_entry_ids = [entry.id for entry in queue_entries]
+            current_time = round(time.time())
+            release_statement = (
+                update(ProcessInstanceQueueModel)
+                .where(ProcessInstanceQueueModel.id.in_(queue_entry_ids), lock_filter)  # type: ignore
+                .values(locked_by=None, locked_at_in_seconds=None, updated_at_in_seconds=current_time)
             )
-            entry.locked_by = None
-            entry.locked_at_in_seconds = None
-            db.session.add(entry)
+            if current_app.config["SPIFFWORKFLOW_BACKEND_DATABASE_TYPE"] == "mysql":
+                db.session.execute(release_statement)
+                # the updated rows stay locked until the commit so the ones that were reset are exactly the released ones
+                released_queue_entry_ids = set(
+                    db.session.scalars(
+                        select(ProcessInstanceQueueModel.id).where(
+                            ProcessInstanceQueueModel.id.in_(queue_entry_ids),  # type: ignore
+                            ProcessInstanceQueueModel.locked_by.is_(None),  # type: ignore
+                            ProcessInstanceQueueModel.updated_at_in_seconds == current_time,
+                        )
+                    ).all()
+                )
+            else:
+                released_queue_entry_ids = set(
+                    db.session.scalars(release_statement.returning(ProcessInstanceQueueModel.id)).all()
+                )
             db.session.commit()
+
+            released_entries = [entry for entry in queue_entries if entry.id in released_queue_entry_ids]
+            if len(released_entries) > 0:
+                process_instance_ids_by_locked_by: dict[str, list[int]] = {}
+                for entry in released_entries:
+                    process_instance_ids_by_locked_by.setdefault(entry.locked_by, []).append(entry.process_instance_id)
+                current_app.logger.info(
+                    f"Removed locks because {reason}. Process instance ids by locked_by: {process_instance_ids_by_locked_by}"
+                )
+            released_process_instance_ids += [entry.process_instance_id for entry in released_entries]
+            if len(queue_entries) < batch_size:
+                break
+        return released_process_instance_ids
@@ -2,6 +2,7 @@
 #   where this points to the pi service
 import copy
 import decimal
+import glob
 import json
 import logging
 import os
@@ -89,15 +90,18 @@ from spiffworkflow_backend.models.task import TaskNotFoundError
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.scripts.script import Script
+from spiffworkflow_backend.services.bpmn_process_definition_cache_service import BpmnProcessDefinitionCacheService
 from spiffworkflow_backend.services.custom_parser import MyCustomParser
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.jinja_service import JinjaHelpers
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
 from spiffworkflow_backend.services.service_task_service import CustomServiceTask
 from spiffworkflow_backend.services.service_task_service import ServiceTaskDelegate
 from spiffworkflow_backend.services.spec_file_service import SpecFileService
+from spiffworkflow_backend.services.task_service import SpiffTaskChangeTracker
 from spiffworkflow_backend.services.task_service import StartAndEndTimes
 from spiffworkflow_backend.services.task_service import TaskService
 from spiffworkflow_backend.services.user_service import UserService
@@ -488,6 +492,11 @@ class ProcessInstanceProcessor:
             )
             self.set_script_engine(self.bpmn_process_instance, self._script_engine)
 
+            # remember what the tasks looked like when they were loaded so we only save the ones that change
+            self.task_change_tracker: SpiffTaskChangeTracker | None = None
+            if current_app.config["SPIFFWORKFLOW_BACKEND_TASK_CHANGE_TRACKING_ENABLED"]:
+                self.task_change_tracker = SpiffTaskChangeTracker(self.bpmn_process_instance)
+
         except MissingSpecError as ke:
             raise ApiError(
                 error_code="unexpected_process_instance_structure",
@@ -521,7 +530,9 @@ class ProcessInstanceProcessor:
         process_copy = copy.deepcopy(bpmn_process_dict)
         bpmn_process_instance = cls._serializer.from_dict(process_copy)
         bpmn_process_instance.script_engine = cls._default_script_engine
-        for spiff_task in bpmn_process_instance.get_tasks():
+        spiff_tasks = bpmn_process_instance.get_tasks()
+        task_service.prefetch_task_models(str(t.id) for t in spiff_tasks)
+        for spiff_task in spiff_tasks:
             start_and_end_times: StartAndEndTimes | None = None
             if spiff_task.has_state(TaskState.COMPLETED | TaskState.ERROR):
                 start_and_end_times = {
@@ -667,8 +678,7 @@ class ProcessInstanceProcessor:
         get_tasks: bool = False,
         include_task_data_for_completed_tasks: bool = False,
     ) -> dict:
-        json_data = JsonDataModel.query.filter_by(hash=bpmn_process.json_data_hash).first()
-        bpmn_process_dict = {"data": json_data.data, "tasks": {}}
+        bpmn_process_dict = {"data": JsonDataModel.find_data_dict_by_hash(bpmn_process.json_data_hash), "tasks": {}}
         bpmn_process_dict.update(bpmn_process.properties_json)
         if get_tasks:
             tasks = TaskModel.query.filter_by(bpmn_process_id=bpmn_process.id).all()
@@ -716,10 +726,7 @@ class ProcessInstanceProcessor:
                 json_data_hashes.add(task.json_data_hash)
                 task_guids_to_add.add(task.guid)
 
-        json_data_records = JsonDataModel.query.filter(JsonDataModel.hash.in_(json_data_hashes)).all()  # type: ignore
-        json_data_mappings = {}
-        for json_data_record in json_data_records:
-            json_data_mappings[json_data_record.hash] = json_data_record.data
+        json_data_mappings = JsonDataModel.find_data_dicts_by_hashes(json_data_hashes)
         for task in tasks:
             tasks_dict = spiff_bpmn_process_dict["tasks"]
             if bpmn_subprocess_id_to_guid_mappings:
@@ -748,8 +755,18 @@ class ProcessInstanceProcessor:
             "subprocess_specs": {},
             "subprocesses": {},
         }
-        bpmn_process_definition = process_instance_model.bpmn_process_definition
-        if bpmn_process_definition is not None:
+        cached_definitions = BpmnProcessDefinitionCacheService.get(process_instance_model.bpmn_process_definition_id)
+        if cached_definitions is not None:
+            (
+                spiff_bpmn_process_dict["spec"],
+                spiff_bpmn_process_dict["subprocess_specs"],
+                cached_mappings,
+            ) = cached_definitions
+            bpmn_definition_to_task_definitions_mappings.update(cached_mappings)
+        else:
+            bpmn_process_definition = process_instance_model.bpmn_process_definition
+            if bpmn_process_definition is None:
+                return spiff_bpmn_process_dict
             spiff_bpmn_process_dict["spec"] = cls._get_definition_dict_for_bpmn_process_definition(
                 bpmn_process_definition,
                 bpmn_definition_to_task_definitions_mappings,
@@ -759,41 +776,56 @@ class ProcessInstanceProcessor:
                 spiff_bpmn_process_dict,
                 bpmn_definition_to_task_definitions_mappings,
             )
+            BpmnProcessDefinitionCacheService.set(
+                bpmn_process_definition.id,
+                spiff_bpmn_process_dict["spec"],
+                spiff_bpmn_process_dict["subprocess_specs"],
+                bpmn_definition_to_task_definitions_mappings,
+            )
 
-            bpmn_process = process_instance_model.bpmn_process
-            if bpmn_process is not None:
-                single_bpmn_process_dict = cls._get_bpmn_process_dict(
-                    bpmn_process, get_tasks=True, include_task_data_for_completed_tasks=include_task_data_for_completed_tasks
+        # avoid lazy loading each subprocess definition just to get its identifier
+        bpmn_identifiers_by_definition_id = {
+            definitions["bpmn_process_definition"].id: bpmn_identifier
+            for bpmn_identifier, definitions in bpmn_definition_to_task_definitions_mappings.items()
+            if "bpmn_process_definition" in definitions
+        }
+
+        bpmn_process = process_instance_model.bpmn_process
+        if bpmn_process is not None:
+            single_bpmn_process_dict = cls._get_bpmn_process_dict(
+                bpmn_process, get_tasks=True, include_task_data_for_completed_tasks=include_task_data_for_completed_tasks
+            )
+            spiff_bpmn_process_dict.update(single_bpmn_process_dict)
+
+            bpmn_subprocesses_query = BpmnProcessModel.query.filter_by(top_level_process_id=bpmn_process.id)
+            if not include_completed_subprocesses:
+                bpmn_subprocesses_query = bpmn_subprocesses_query.join(
+                    TaskModel, TaskModel.guid == BpmnProcessModel.guid
+                ).filter(
+                    TaskModel.state.not_in(["COMPLETED", "ERROR", "CANCELLED"])  # type: ignore
                 )
-                spiff_bpmn_process_dict.update(single_bpmn_process_dict)
-
-                bpmn_subprocesses_query = BpmnProcessModel.query.filter_by(top_level_process_id=bpmn_process.id)
-                if not include_completed_subprocesses:
-                    bpmn_subprocesses_query = bpmn_subprocesses_query.join(
-                        TaskModel, TaskModel.guid == BpmnProcessModel.guid
-                    ).filter(
-                        TaskModel.state.not_in(["COMPLETED", "ERROR", "CANCELLED"])  # type: ignore
-                    )
-                bpmn_subprocesses = bpmn_subprocesses_query.all()
-                bpmn_subprocess_id_to_guid_mappings = {}
-                for bpmn_subprocess in bpmn_subprocesses:
+            bpmn_subprocesses = bpmn_subprocesses_query.all()
+            bpmn_subprocess_id_to_guid_mappings = {}
+            for bpmn_subprocess in bpmn_subprocesses:
+                subprocess_identifier = bpmn_identifiers_by_definition_id.get(bpmn_subprocess.bpmn_process_definition_id)
+                if subprocess_identifier is None:
                     subprocess_identifier = bpmn_subprocess.bpmn_process_definition.bpmn_identifier
-                    if subprocess_identifier not in spiff_bpmn_process_dict["subprocess_specs"]:
-                        current_app.logger.info(f"Deferring subprocess spec: '{subprocess_identifier}'")
-                        continue
-                    bpmn_subprocess_id_to_guid_mappings[bpmn_subprocess.id] = bpmn_subprocess.guid
-                    single_bpmn_process_dict = cls._get_bpmn_process_dict(bpmn_subprocess)
-                    spiff_bpmn_process_dict["subprocesses"][bpmn_subprocess.guid] = single_bpmn_process_dict
-
-                tasks = TaskModel.query.filter(
-                    TaskModel.bpmn_process_id.in_(bpmn_subprocess_id_to_guid_mappings.keys())  # type: ignore
-                ).all()
-                cls._get_tasks_dict(
-                    tasks,
-                    spiff_bpmn_process_dict,
-                    bpmn_subprocess_id_to_guid_mappings,
-                    include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
-                )
+                if subprocess_identifier not in spiff_bpmn_process_dict["subprocess_specs"]:
+                    current_app.logger.info(f"Deferring subprocess spec: '{subprocess_identifier}'")
+                    continue
+                bpmn_subprocess_id_to_guid_mappings[bpmn_subprocess.id] = bpmn_subprocess.guid
+                single_bpmn_process_dict = cls._get_bpmn_process_dict(bpmn_subprocess)
+                spiff_bpmn_process_dict["subprocesses"][bpmn_subprocess.guid] = single_bpmn_process_dict
+
+            tasks = TaskModel.query.filter(
+                TaskModel.bpmn_process_id.in_(bpmn_subprocess_id_to_guid_mappings.keys())  # type: ignore
+            ).all()
+            cls._get_tasks_dict(
+                tasks,
+                spiff_bpmn_process_dict,
+                bpmn_subprocess_id_to_guid_mappings,
+                include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
+            )
 
         return spiff_bpmn_process_dict
 
@@ -1208,6 +1240,7 @@ class ProcessInstanceProcessor:
                 serializer=self._serializer,
                 process_instance=self.process_instance_model,
                 bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
+                task_change_tracker=self.task_change_tracker,
             )
             execution_strategy = SkipOneExecutionStrategy(task_model_delegate, {"spiff_task": spiff_task})
             self.do_engine_steps(save=True, execution_strategy=execution_strategy)
@@ -1301,9 +1334,12 @@ class ProcessInstanceProcessor:
     def update_spiff_parser_with_all_process_dependency_files(
         parser: SpiffBpmnParser,
         processed_identifiers: set[str] | None = None,
+        dependency_file_globs: set[str] | None = None,
     ) -> None:
         if processed_identifiers is None:
             processed_identifiers = set()
+        if dependency_file_globs is None:
+            dependency_file_globs = set()
         processor_dependencies = parser.get_process_dependencies()
 
         # since get_process_dependencies() returns a set with None sometimes, we need to remove it
@@ -1325,10 +1361,14 @@ class ProcessInstanceProcessor:
             dmn_file_glob = os.path.join(os.path.dirname(new_bpmn_file_full_path), "*.dmn")
             parser.add_dmn_files_by_glob(dmn_file_glob)
             processed_identifiers.add(bpmn_process_identifier)
+            dependency_file_globs.add(glob.escape(new_bpmn_file_full_path))
+            dependency_file_globs.add(os.path.join(glob.escape(os.path.dirname(new_bpmn_file_full_path)), "*.dmn"))
 
         if new_bpmn_files:
             parser.add_bpmn_files(new_bpmn_files)
-            ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(parser, processed_identifiers)
+            ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(
+                parser, processed_identifiers, dependency_file_globs
+            )
 
     @staticmethod
     def get_spec(
@@ -1336,13 +1376,43 @@ class ProcessInstanceProcessor:
         process_model_info: ProcessModelInfo,
         process_id_to_run: str | None = None,
     ) -> tuple[BpmnProcessSpec, IdToBpmnProcessSpecMapping]:
-        """Returns a SpiffWorkflow specification for the given process_instance spec, using the files provided."""
+        """Returns a SpiffWorkflow specification for the given process_instance spec, using the files provided.
+
+        Parsed specs are cached per process by the content digest of every file involved, so
+        instantiating the same process model repeatedly does not re-parse its xml.
+        """
         parser = ProcessInstanceProcessor.get_parser()
 
         process_id = process_id_to_run or process_model_info.primary_process_id
 
+        process_model_file_paths: dict[str, str] = {}
         for file in files:
-            data = SpecFileService.get_data(process_model_info, file.name)
+            if file.type in [FileType.bpmn.value, FileType.dmn.value]:
+                process_model_file_paths[file.name] = SpecFileService.full_file_path(process_model_info, file.name)
+        # stat before reading so a file that changes while it is parsed is compared by digest on the next get
+        process_model_files_stat_signature = ProcessModelSpecCacheService.stat_signature(list(process_model_file_paths.values()))
+
+        if process_id:
+            cached_spec = ProcessModelSpecCacheService.get(
+                process_model_info.id,
+                process_id,
+                list(process_model_file_paths.values()),
+                process_model_files_stat_signature,
+            )
+            if cached_spec is not None:
+                return (cached_spec[0], IdToBpmnProcessSpecMapping(cached_spec[1]))
+
+        file_contents: dict[str, bytes] = {}
+        for file_name in process_model_file_paths.keys():
+            file_contents[file_name] = SpecFileService.get_data(process_model_info, file_name)
+        process_model_files_digest = ProcessModelSpecCacheService.digest_for_file_contents(
+            {process_model_file_paths[file_name]: data for file_name, data in file_contents.items()}
+        )
+
+        for file in files:
+            if file.name not in file_contents:
+                continue
+            data = file_contents[file.name]
             try:
                 if file.type == FileType.bpmn.value:
                     bpmn: etree.Element = SpecFileService.get_etree_from_xml_bytes(data)
@@ -1362,7 +1432,10 @@ class ProcessInstanceProcessor:
                     message=f"There is no primary BPMN process id defined for process_model {process_model_info.id}",
                 )
             )
-        ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(parser)
+        dependency_file_globs: set[str] = set()
+        ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(
+            parser, dependency_file_globs=dependency_file_globs
+        )
 
         try:
             bpmn_process_spec = parser.get_spec(process_id)
@@ -1378,6 +1451,16 @@ class ProcessInstanceProcessor:
                 task_id=ve.id,
                 tag=ve.tag,
             ) from ve
+
+        ProcessModelSpecCacheService.set(
+            process_model_info.id,
+            process_id,
+            process_model_files_digest,
+            process_model_files_stat_signature,
+            dependency_file_globs,
+            bpmn_process_spec,
+            subprocesses,
+        )
         return (bpmn_process_spec, subprocesses)
 
     @staticmethod
@@ -1441,16 +1524,20 @@ class ProcessInstanceProcessor:
         execution_strategy_name: str | None = None,
         execution_strategy: ExecutionStrategy | None = None,
     ) -> TaskRunnability:
-        self._add_bpmn_process_definitions(
-            self.serialize(),
-            bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
-            process_instance_model=self.process_instance_model,
-        )
+        self.preserve_script_engine_state()
+        # definitions are only stored the first time an instance runs so avoid serializing them otherwise
+        if not self.process_instance_model.spiffworkflow_fully_initialized():
+            self._add_bpmn_process_definitions(
+                self.serialize_bpmn_process_definitions(),
+                bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
+                process_instance_model=self.process_instance_model,
+            )
 
         task_model_delegate = TaskModelSavingDelegate(
             serializer=self._serializer,
             process_instance=self.process_instance_model,
             bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
+            task_change_tracker=self.task_change_tracker,
         )
 
         if execution_strategy is None:
@@ -1497,26 +1584,19 @@ class ProcessInstanceProcessor:
         except Exception:
             return 0
 
-    def check_task_data_size(self) -> None:
-        task_data_len = self.get_task_data_size(self.bpmn_process_instance)
-
-        # Not sure what the number here should be but this now matches the mysql
-        # max_allowed_packet variable on dev - 1073741824
-        task_data_limit = 1024**3
-
-        if task_data_len > task_data_limit:
-            raise (
-                ApiError(
-                    error_code="task_data_size_exceeded",
-                    message=f"Maximum task data size of {task_data_limit} exceeded.",
-                )
-            )
-
     def serialize(self) -> dict:
-        self.check_task_data_size()
         self.preserve_script_engine_state()
         return self._serializer.to_dict(self.bpmn_process_instance)  # type: ignore
 
+    def serialize_bpmn_process_definitions(self) -> dict:
+        """Returns the same spec and subprocess_specs as serialize without converting any tasks or task data."""
+        return {
+            "spec": self._serializer.to_dict(self.bpmn_process_instance.spec),
+            "subprocess_specs": {
+                str(name): self._serializer.to_dict(spec) for name, spec in self.bpmn_process_instance.subprocess_specs.items()
+            },
+        }
+
     def next_user_tasks(self) -> list[SpiffTask]:
         return self.bpmn_process_instance.get_tasks(state=TaskState.READY, manual=True)  # type: ignore
 
@@ -1641,7 +1721,9 @@ class ProcessInstanceProcessor:
             run_started_at=run_started_at,
         )
         task_service.update_task_model(task_model, spiff_task)
-        JsonDataModel.insert_or_update_json_data_records(task_service.json_data_dicts)
+        JsonDataModel.insert_or_update_json_data_records(
+            task_service.json_data_dicts, task_service.json_data_encodings, task_service.json_data_delta_base_hashes
+        )
 
         ProcessInstanceTmpService.add_event_to_process_instance(
             self.process_instance_model,
@@ -2,6 +2,10 @@ import contextlib
 import time
 from collections.abc import Generator
 
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy import update
+
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventType
@@ -10,6 +14,7 @@ from spiffworkflow_backend.services.error_handling_service import ErrorHandlingS
 from spiffworkflow_backend.services.process_instance_lock_service import ExpectedLockNotFoundError
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
+from spiffworkflow_backend.services.worker_heartbeat_service import WorkerHeartbeatService
 from spiffworkflow_backend.services.workflow_execution_service import WorkflowExecutionServiceError
 
 
@@ -26,7 +31,7 @@ class ProcessInstanceQueueService:
     def _configure_and_save_queue_entry(
         cls, process_instance: ProcessInstanceModel, queue_entry: ProcessInstanceQueueModel
     ) -> None:
-        queue_entry.priority = 2
+        queue_entry.priority = ProcessInstanceQueueModel.normalize_priority(queue_entry.priority)
         queue_entry.status = process_instance.status
         queue_entry.locked_by = None
         queue_entry.locked_at_in_seconds = None
@@ -35,10 +40,23 @@ class ProcessInstanceQueueService:
         db.session.commit()
 
     @classmethod
-    def enqueue_new_process_instance(cls, process_instance: ProcessInstanceModel, run_at_in_seconds: int) -> None:
-        queue_entry = ProcessInstanceQueueModel(process_instance_id=process_instance.id, run_at_in_seconds=run_at_in_seconds)
+    def enqueue_new_process_instance(
+        cls, process_instance: ProcessInstanceModel, run_at_in_seconds: int, priority: int | None = None
+    ) -> None:
+        queue_entry = ProcessInstanceQueueModel(
+            process_instance_id=process_instance.id,
+            run_at_in_seconds=run_at_in_seconds,
+            priority=ProcessInstanceQueueModel.normalize_priority(priority),
+        )
         cls._configure_and_save_queue_entry(process_instance, queue_entry)
 
+    @classmethod
+    def set_priority(cls, process_instance: ProcessInstanceModel, priority: int) -> None:
+        db.session.query(ProcessInstanceQueueModel).filter(
+            ProcessInstanceQueueModel.process_instance_id == process_instance.id
+        ).update({"priority": ProcessInstanceQueueModel.normalize_priority(priority)})
+        db.session.commit()
+
     @classmethod
     def _enqueue(cls, process_instance: ProcessInstanceModel, additional_processing_identifier: str | None = None) -> None:
         queue_entry_id = ProcessInstanceLockService.unlock(
@@ -81,6 +99,9 @@ class ProcessInstanceQueueService:
                 f"{locked_by} cannot lock process instance {process_instance.id}. It has not been enqueued."
             )
 
+        if queue_entry.locked_by is not None and queue_entry.locked_by != locked_by:
+            queue_entry = cls._reclaim_lock_of_dead_worker(queue_entry, locked_by, current_time)
+
         if queue_entry.locked_by != locked_by:
             message = f"It has already been locked by {queue_entry.locked_by}."
             if queue_entry.locked_by is None:
@@ -93,6 +114,124 @@ class ProcessInstanceQueueService:
             process_instance.id, queue_entry, additional_processing_identifier=additional_processing_identifier
         )
 
+    @classmethod
+    def _reclaim_lock_of_dead_worker(
+        cls, queue_entry: ProcessInstanceQueueModel, locked_by: str, current_time: int
+    ) -> ProcessInstanceQueueModel:
+        """Takes over the lock if the process holding it stopped recording worker heartbeats before it took the lock."""
+        dead_locked_by = queue_entry.locked_by
+        dead_locked_at_in_seconds = queue_entry.locked_at_in_seconds
+        if dead_locked_by is None or not WorkerHeartbeatService.is_dead(dead_locked_by, dead_locked_at_in_seconds):
+            return queue_entry
+
+        db.session.query(ProcessInstanceQueueModel).filter(
+            ProcessInstanceQueueModel.id == queue_entry.id,
+            ProcessInstanceQueueModel.locked_by == dead_locked_by,
+            ProcessInstanceQueueModel.locked_at_in_seconds == dead_locked_at_in_seconds,
+        ).update({"locked_by": locked_by, "locked_at_in_seconds": current_time, "updated_at_in_seconds": current_time})
+        db.session.commit()
+        db.session.refresh(queue_entry)
+        if queue_entry.locked_by == locked_by:
+            current_app.logger.info(
+                f"{locked_by} reclaimed the lock on process instance {queue_entry.process_instance_id} from {dead_locked_by}"
+                " because it stopped recording worker heartbeats"
+            )
+        return queue_entry
+
+    @classmethod
+    def claim_batch(
+        cls,
+        status_value: str,
+        limit: int,
+        locked_by: str | None = None,
+        run_at_in_seconds_threshold: int | None = None,
+        min_age_in_seconds: int = 0,
+        additional_processing_identifier: str | None = None,
+    ) -> dict[int, int]:
+        """Locks up to limit unlocked queue entries with the given status that are due, in order of their priority_rank.
+
+        Returns the queue entry ids by process instance id. The locks are registered in the current thread so the
+        instances can be run with dequeued and claimed without locking them again.
+        On mysql and postgres the entries are picked with SKIP LOCKED so concurrent claims never pick the same entries
+        and never wait for each other. Other databases fall back to a conditional update.
+        """
+        if locked_by is None:
+            locked_by = ProcessInstanceLockService.locked_by(additional_processing_identifier=additional_processing_identifier)
+        current_time = round(time.time())
+        if run_at_in_seconds_threshold is None:
+            run_at_in_seconds_threshold = current_time
+        candidates_query = (
+            select(ProcessInstanceQueueModel.id, ProcessInstanceQueueModel.process_instance_id)
+            .where(
+                ProcessInstanceQueueModel.status == status_value,
+                ProcessInstanceQueueModel.locked_by.is_(None),  # type: ignore
+                ProcessInstanceQueueModel.run_at_in_seconds <= run_at_in_seconds_threshold,
+                ProcessInstanceQueueModel.updated_at_in_seconds <= current_time - min_age_in_seconds,
+            )
+            .order_by(ProcessInstanceQueueModel.priority_rank(), ProcessInstanceQueueModel.id)
+            .limit(limit)
+        )
+
+        skip_locked = current_app.config["SPIFFWORKFLOW_BACKEND_DATABASE_TYPE"] in ["mysql", "postgres"]
+        if skip_locked:
+            candidates_query = candidates_query.with_for_update(skip_locked=True)
+        candidates = db.session.execute(candidates_query).all()
+        if len(candidates) == 0:
+            db.session.commit()
+            return {}
+
+        candidate_ids = [c.id for c in candidates]
+        db.session.execute(
+            update(ProcessInstanceQueueModel)
+            .where(
+                ProcessInstanceQueueModel.id.in_(candidate_ids),  # type: ignore
+                ProcessInstanceQueueModel.locked_by.is_(None),  # type: ignore
+            )
+            .values(locked_by=locked_by, locked_at_in_seconds=current_time)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        if skip_locked:
+            # the selected rows stayed locked until the commit so the update got all of them
+            claimed_ids = set(candidate_ids)
+        else:
+            claimed_ids = set(
+                db.session.scalars(
+                    select(ProcessInstanceQueueModel.id).where(
+                        ProcessInstanceQueueModel.id.in_(candidate_ids),  # type: ignore
+                        ProcessInstanceQueueModel.locked_by == locked_by,
+                    )
+                ).all()
+            )
+
+        queue_entry_ids_by_process_instance_id = {c.process_instance_id: c.id for c in candidates if c.id in claimed_ids}
+        ProcessInstanceLockService.lock_many(
+            queue_entry_ids_by_process_instance_id, additional_processing_identifier=additional_processing_identifier
+        )
+        return queue_entry_ids_by_process_instance_id
+
+    @classmethod
+    @contextlib.contextmanager
+    def claimed(
+        cls,
+        process_instance: ProcessInstanceModel,
+        queue_entry_id: int | None = None,
+        additional_processing_identifier: str | None = None,
+    ) -> Generator[None, None, None]:
+        """Holds the lock on a process instance claimed with claim_batch and puts it back in the queue afterwards.
+
+        Pass the queue_entry_id when the instance was claimed in another thread to take over the lock in this one.
+        """
+        if queue_entry_id is not None:
+            ProcessInstanceLockService.lock_many(
+                {process_instance.id: queue_entry_id}, additional_processing_identifier=additional_processing_identifier
+            )
+        try:
+            yield
+        finally:
+            cls._enqueue(process_instance, additional_processing_identifier=additional_processing_identifier)
+
     @classmethod
     def _dequeue_with_retries(
         cls,
@@ -161,6 +300,7 @@ class ProcessInstanceQueueService:
                 ProcessInstanceQueueModel.locked_by == locked_by,
                 ProcessInstanceQueueModel.run_at_in_seconds <= run_at_in_seconds_threshold,
             )
+            .order_by(ProcessInstanceQueueModel.priority_rank(), ProcessInstanceQueueModel.id)
             .all()
         )
 
@@ -171,6 +311,11 @@ class ProcessInstanceQueueService:
         run_at_in_seconds_threshold: int,
         min_age_in_seconds: int = 0,
     ) -> list[int]:
+        """Returns the ids of the unlocked instances with the given status, most urgent first.
+
+        Urgency is the priority_rank of the queue entry, so a low priority instance that has been waiting long enough
+        comes before higher priority instances that only just became due.
+        """
         queue_entries = cls.entries_with_status(status_value, None, run_at_in_seconds_threshold, min_age_in_seconds)
         ids_with_status = [entry.process_instance_id for entry in queue_entries]
         return ids_with_status
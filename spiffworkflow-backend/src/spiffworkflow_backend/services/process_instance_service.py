@@ -5,6 +5,7 @@ from collections.abc import Generator
 from contextlib import suppress
 from datetime import datetime
 from datetime import timezone
+from functools import partial
 from typing import Any
 from urllib.parse import unquote
 
@@ -20,6 +21,7 @@ from SpiffWorkflow.util.deep_merge import DeepMerge  # type: ignore
 from SpiffWorkflow.util.task import TaskState  # type: ignore
 
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import should_queue_process_instance
+from spiffworkflow_backend.background_processing.process_instance_worker_pool import ProcessInstanceWorkerPool
 from spiffworkflow_backend.data_migrations.process_instance_migrator import ProcessInstanceMigrator
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.exceptions.error import HumanTaskAlreadyCompletedError
@@ -44,6 +46,7 @@ from spiffworkflow_backend.services.authorization_service import AuthorizationSe
 from spiffworkflow_backend.services.error_handling_service import ErrorHandlingService
 from spiffworkflow_backend.services.git_service import GitCommandError
 from spiffworkflow_backend.services.git_service import GitService
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_processor import CustomBpmnScriptEngine
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
@@ -106,6 +109,7 @@ class ProcessInstanceService:
         process_model: ProcessModelInfo,
         user: UserModel,
         start_configuration: StartConfiguration | None = None,
+        priority: int | None = None,
     ) -> tuple[ProcessInstanceModel, StartConfiguration]:
         db.session.commit()
         try:
@@ -128,7 +132,9 @@ class ProcessInstanceService:
             start_configuration = cls.next_start_event_configuration(process_instance_model)
         _, delay_in_seconds, _ = start_configuration
         run_at_in_seconds = round(time.time()) + delay_in_seconds
-        ProcessInstanceQueueService.enqueue_new_process_instance(process_instance_model, run_at_in_seconds)
+        if priority is None:
+            priority = process_model.priority
+        ProcessInstanceQueueService.enqueue_new_process_instance(process_instance_model, run_at_in_seconds, priority=priority)
         return (process_instance_model, start_configuration)
 
     @classmethod
@@ -136,9 +142,12 @@ class ProcessInstanceService:
         cls,
         process_model_identifier: str,
         user: UserModel,
+        priority: int | None = None,
     ) -> ProcessInstanceModel:
         process_model = ProcessModelService.get_process_model(process_model_identifier)
-        process_instance_model, (cycle_count, _, duration_in_seconds) = cls.create_process_instance(process_model, user)
+        process_instance_model, (cycle_count, _, duration_in_seconds) = cls.create_process_instance(
+            process_model, user, priority=priority
+        )
         cls.register_process_model_cycles(process_model_identifier, cycle_count, duration_in_seconds)
         return process_instance_model
 
@@ -244,33 +253,89 @@ class ProcessInstanceService:
     def do_waiting(cls, status_value: str) -> None:
         run_at_in_seconds_threshold = round(time.time())
         min_age_in_seconds = 60  # to avoid conflicts with the interstitial page, we wait 60 seconds before processing
-        process_instance_ids_to_check = ProcessInstanceQueueService.peek_many(
-            status_value, run_at_in_seconds_threshold, min_age_in_seconds
-        )
-        if len(process_instance_ids_to_check) == 0:
+        if int(current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_SIZE"]) > 1:
+            cls._submit_waiting_to_worker_pool(status_value, run_at_in_seconds_threshold, min_age_in_seconds)
             return
 
-        records = (
-            db.session.query(ProcessInstanceModel)
-            .filter(ProcessInstanceModel.id.in_(process_instance_ids_to_check))  # type: ignore
-            .all()
+        # claim one at a time so instances are not locked while they wait for the ones before them to run.
+        # instances that were run get re-enqueued with a new updated_at_in_seconds so they are not claimed again here.
+        while True:
+            claimed = ProcessInstanceQueueService.claim_batch(
+                status_value,
+                1,
+                run_at_in_seconds_threshold=run_at_in_seconds_threshold,
+                min_age_in_seconds=min_age_in_seconds,
+            )
+            if len(claimed) == 0:
+                return
+            for process_instance_id in claimed.keys():
+                cls._run_claimed_waiting_process_instance(process_instance_id, status_value)
+
+    @classmethod
+    def _submit_waiting_to_worker_pool(cls, status_value: str, run_at_in_seconds_threshold: int, min_age_in_seconds: int) -> None:
+        """Claims as many instances as the worker pool for this status has room for and hands them to it.
+
+        The rest stay in the queue and get picked up by a later polling interval.
+        """
+        worker_pool = ProcessInstanceWorkerPool.for_name(status_value)
+        available_slots = worker_pool.available_slots()
+        if available_slots == 0:
+            current_app.logger.info(f"Processor {status_value}: Worker pool is saturated. Leaving the queue for the next run")
+            return
+
+        claimed = ProcessInstanceQueueService.claim_batch(
+            status_value,
+            available_slots,
+            run_at_in_seconds_threshold=run_at_in_seconds_threshold,
+            min_age_in_seconds=min_age_in_seconds,
         )
+        locking_domain = ProcessInstanceLockService.get_thread_local_locking_context()["domain"]
+        app = current_app._get_current_object()  # type: ignore
+        for process_instance_id, queue_entry_id in claimed.items():
+            # the worker thread takes over the lock
+            ProcessInstanceLockService.try_unlock(process_instance_id)
+            submitted = not worker_pool.is_in_flight(process_instance_id) and worker_pool.try_submit(
+                app,
+                process_instance_id,
+                locking_domain,
+                partial(cls._run_claimed_waiting_process_instance, status_value=status_value, queue_entry_id=queue_entry_id),
+            )
+            if not submitted:
+                process_instance = ProcessInstanceModel.query.filter_by(id=process_instance_id).first()
+                if process_instance is not None:
+                    # nothing to run here. this only puts it back in the queue.
+                    with ProcessInstanceQueueService.claimed(process_instance, queue_entry_id=queue_entry_id):
+                        pass
+
+    @classmethod
+    def _run_claimed_waiting_process_instance(
+        cls, process_instance_id: int, status_value: str, queue_entry_id: int | None = None
+    ) -> None:
+        """Runs a process instance claimed with claim_batch and puts it back in the queue afterwards."""
+        process_instance = ProcessInstanceModel.query.filter_by(id=process_instance_id).first()
+        if process_instance is None:
+            ProcessInstanceLockService.try_unlock(process_instance_id)
+            return
+        with ProcessInstanceQueueService.claimed(process_instance, queue_entry_id=queue_entry_id):
+            cls._run_waiting_process_instance(process_instance, status_value)
+
+    @classmethod
+    def _run_waiting_process_instance(cls, process_instance: ProcessInstanceModel, status_value: str) -> None:
         execution_strategy_name = current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_DEFAULT_STRATEGY_BACKGROUND"]
-        for process_instance in records:
-            current_app.logger.info(f"Processor {status_value}: Processing process_instance {process_instance.id}")
-            try:
-                cls.run_process_instance_with_processor(
-                    process_instance, status_value=status_value, execution_strategy_name=execution_strategy_name
-                )
-            except ProcessInstanceIsAlreadyLockedError:
-                continue
-            except Exception as e:
-                db.session.rollback()  # in case the above left the database with a bad transaction
-                error_message = (
-                    f"Error running {status_value} task for process_instance {process_instance.id}"
-                    + f"({process_instance.process_model_identifier}). {str(e)}"
-                )
-                current_app.logger.error(error_message)
+        current_app.logger.info(f"Processor {status_value}: Processing process_instance {process_instance.id}")
+        try:
+            cls.run_process_instance_with_processor(
+                process_instance, status_value=status_value, execution_strategy_name=execution_strategy_name
+            )
+        except ProcessInstanceIsAlreadyLockedError:
+            return
+        except Exception as e:
+            db.session.rollback()  # in case the above left the database with a bad transaction
+            error_message = (
+                f"Error running {status_value} task for process_instance {process_instance.id}"
+                + f"({process_instance.process_model_identifier}). {str(e)}"
+            )
+            current_app.logger.error(error_message)
 
     @classmethod
     def run_process_instance_with_processor(
@@ -134,6 +134,9 @@ class ProcessModelService(FileSystemService):
         for key in list(json_data.keys()):
             if key not in PROCESS_MODEL_SUPPORTED_KEYS_FOR_DISK_SERIALIZATION:
                 del json_data[key]
+        # only write the priority for models that set one so existing process_model.json files do not change
+        if json_data.get("priority") is None:
+            json_data.pop("priority", None)
         cls.write_json_file(json_path, json_data)
 
     @classmethod
@@ -337,21 +340,19 @@ class ProcessModelService(FileSystemService):
         if has_permission:
             return process_model_identifiers
 
-        permission_assignments = AuthorizationService.all_permission_assignments_for_user(user=user)
-
-        permitted_process_model_identifiers = []
-        for process_model_identifier in process_model_identifiers:
-            modified_process_model_id = ProcessModelInfo.modify_process_identifier_for_path_param(process_model_identifier)
-            uri = f"{permission_base_uri}/{modified_process_model_id}"
-            has_permission = AuthorizationService.permission_assignments_include(
-                permission_assignments=permission_assignments,
-                permission=permission_to_check,
-                target_uri=uri,
+        permissions_and_target_uris = [
+            (
+                permission_to_check,
+                f"{permission_base_uri}/{ProcessModelInfo.modify_process_identifier_for_path_param(process_model_identifier)}",
             )
-            if has_permission:
-                permitted_process_model_identifiers.append(process_model_identifier)
-
-        return permitted_process_model_identifiers
+            for process_model_identifier in process_model_identifiers
+        ]
+        results = AuthorizationService.user_has_permissions(user, permissions_and_target_uris)
+        return [
+            process_model_identifier
+            for process_model_identifier, has_permission in zip(process_model_identifiers, results, strict=True)
+            if has_permission
+        ]
 
     @classmethod
     def get_parent_group_array_and_cache_it(
@@ -0,0 +1,158 @@
+import glob
+import os
+from dataclasses import dataclass
+from dataclasses import field
+from hashlib import sha256
+from typing import Any
+
+from flask import current_app
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+
+
+@dataclass
+class ProcessModelSpecCacheEntry:
+    process_model_files_digest: str
+
+    # glob patterns (escaped file paths or "dir/*.dmn") for every file pulled in while resolving
+    # called elements. we store patterns rather than files so a new dmn file in a dependency directory
+    # also invalidates the entry.
+    dependency_file_globs: set[str]
+    dependency_files_digest: str
+    dependency_file_paths: list[str]
+
+    # mtimes and sizes of the files the digests were computed from. while these match, the files are
+    # not read again to compare the digests.
+    process_model_files_stat_signature: tuple
+    dependency_files_stat_signature: tuple
+
+    bpmn_process_spec: Any
+    subprocesses: dict = field(default_factory=dict)
+
+
+class ProcessModelSpecCacheService:
+    """Per-process LRU cache of parsed BpmnProcessSpecs.
+
+    Entries are keyed by (process_model_identifier, process_id_to_run) and are only used when the
+    content digest of the process model files and of every called element dependency file still
+    matches what was parsed, so a stale entry can never be returned even if files change underneath
+    us through git or another web worker. The digests are only compared again when the mtime or size
+    of one of the files, or of the directories they are in, changed.
+    """
+
+    _cache = LruCache()
+
+    @classmethod
+    def max_size(cls) -> int:
+        return int(current_app.config["SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_SPEC_CACHE_SIZE"])
+
+    @classmethod
+    def digest_for_file_contents(cls, file_contents: dict[str, bytes]) -> str:
+        digest = sha256()
+        for file_name in sorted(file_contents.keys()):
+            digest.update(file_name.encode("utf8"))
+            digest.update(sha256(file_contents[file_name]).digest())
+        return digest.hexdigest()
+
+    @classmethod
+    def digest_for_file_paths(cls, file_paths: list[str]) -> str:
+        file_contents = {}
+        for file_path in file_paths:
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    file_contents[file_path] = f.read()
+        return cls.digest_for_file_contents(file_contents)
+
+    @classmethod
+    def file_paths_for_globs(cls, file_globs: set[str]) -> list[str]:
+        return sorted({file_path for file_glob in file_globs for file_path in glob.glob(file_glob) if os.path.isfile(file_path)})
+
+    @classmethod
+    def stat_signature(cls, file_paths: list[str]) -> tuple:
+        """Returns the mtimes and sizes of the files and of their directories, which change when files are added."""
+        signature: list[tuple[str, int | None, int | None]] = []
+        for path in sorted(set(file_paths) | {os.path.dirname(file_path) for file_path in file_paths}):
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                signature.append((path, None, None))
+                continue
+            signature.append((path, stat_result.st_mtime_ns, stat_result.st_size))
+        return tuple(signature)
+
+    @classmethod
+    def get(
+        cls,
+        process_model_identifier: str,
+        process_id: str,
+        process_model_file_paths: list[str],
+        process_model_files_stat_signature: tuple,
+    ) -> tuple[Any, dict] | None:
+        if cls.max_size() <= 0:
+            return None
+
+        entry: ProcessModelSpecCacheEntry | None = cls._cache.get((process_model_identifier, process_id), record_stats=False)
+        if entry is not None and cls._files_are_unchanged(entry, process_model_file_paths, process_model_files_stat_signature):
+            cls._cache.record_hit()
+            # the spec itself is treated as immutable by spiff but the subprocess mapping is a plain dict
+            return (entry.bpmn_process_spec, dict(entry.subprocesses))
+
+        cls._cache.record_miss()
+        return None
+
+    @classmethod
+    def set(
+        cls,
+        process_model_identifier: str,
+        process_id: str,
+        process_model_files_digest: str,
+        process_model_files_stat_signature: tuple,
+        dependency_file_globs: set[str],
+        bpmn_process_spec: Any,
+        subprocesses: dict,
+    ) -> None:
+        max_size = cls.max_size()
+        if max_size <= 0:
+            return
+
+        dependency_file_paths = cls.file_paths_for_globs(dependency_file_globs)
+        # stat before reading so a file that changes in between is compared by digest on the next get
+        dependency_files_stat_signature = cls.stat_signature(dependency_file_paths)
+        entry = ProcessModelSpecCacheEntry(
+            process_model_files_digest=process_model_files_digest,
+            dependency_file_globs=dependency_file_globs,
+            dependency_files_digest=cls.digest_for_file_paths(dependency_file_paths),
+            dependency_file_paths=dependency_file_paths,
+            process_model_files_stat_signature=process_model_files_stat_signature,
+            dependency_files_stat_signature=dependency_files_stat_signature,
+            bpmn_process_spec=bpmn_process_spec,
+            subprocesses=dict(subprocesses),
+        )
+        cls._cache.set((process_model_identifier, process_id), entry, max_size)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        return cls._cache.stats()
+
+    @classmethod
+    def _files_are_unchanged(
+        cls, entry: ProcessModelSpecCacheEntry, process_model_file_paths: list[str], process_model_files_stat_signature: tuple
+    ) -> bool:
+        # a file can be touched without changing it, like by a git checkout, so compare the contents before giving up
+        if process_model_files_stat_signature != entry.process_model_files_stat_signature:
+            if cls.digest_for_file_paths(process_model_file_paths) != entry.process_model_files_digest:
+                return False
+            entry.process_model_files_stat_signature = process_model_files_stat_signature
+
+        if cls.stat_signature(entry.dependency_file_paths) != entry.dependency_files_stat_signature:
+            dependency_file_paths = cls.file_paths_for_globs(entry.dependency_file_globs)
+            dependency_files_stat_signature = cls.stat_signature(dependency_file_paths)
+            if cls.digest_for_file_paths(dependency_file_paths) != entry.dependency_files_digest:
+                return False
+            entry.dependency_file_paths = dependency_file_paths
+            entry.dependency_files_stat_signature = dependency_files_stat_signature
+        return True
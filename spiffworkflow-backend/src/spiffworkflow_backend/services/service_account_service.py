@@ -1,13 +1,77 @@
+import time
+from typing import Any
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import make_transient_to_detached
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.models.cache_generation import CacheGenerationTable
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.permission_assignment import PermissionAssignmentModel
 from spiffworkflow_backend.models.service_account import SPIFF_SERVICE_ACCOUNT_AUTH_SERVICE
 from spiffworkflow_backend.models.service_account import SPIFF_SERVICE_ACCOUNT_AUTH_SERVICE_ID_PREFIX
 from spiffworkflow_backend.models.service_account import ServiceAccountModel
 from spiffworkflow_backend.models.user import UserModel
+from spiffworkflow_backend.services.permission_matcher_cache_service import PermissionMatcherCacheService
 from spiffworkflow_backend.services.user_service import UserService
 
+SERVICE_ACCOUNTS_CHANGED_SESSION_INFO_KEY = "service_accounts_changed"
+
 
 class ServiceAccountService:
+    # detached copies of the users of service accounts by the hash of their api keys along with when they expire
+    _users_by_api_key_hash = LruCache()
+
+    @classmethod
+    def user_from_api_key(cls, api_key: str) -> UserModel | None:
+        """Finds the user of the service account with the given api key.
+
+        Integrations tend to use the same few keys over and over so the users are cached for a while. A cached user is
+        merged into the session without loading it again so it can be used like any other user in the request.
+        """
+        api_key_hash = ServiceAccountModel.hash_api_key(api_key)
+        max_size = int(current_app.config["SPIFFWORKFLOW_BACKEND_API_KEY_CACHE_SIZE"])
+        if max_size > 0:
+            cached_user = cls._users_by_api_key_hash.get(api_key_hash)
+            if cached_user is not None:
+                user_snapshot, cached_until = cached_user
+                if time.time() < cached_until:
+                    cached_user_model: UserModel = db.session.merge(user_snapshot, load=False)
+                    return cached_user_model
+                cls._users_by_api_key_hash.delete(api_key_hash)
+
+        user_model = db.session.execute(
+            select(UserModel)
+            .join(ServiceAccountModel, ServiceAccountModel.user_id == UserModel.id)
+            .where(ServiceAccountModel.api_key_hash == api_key_hash)
+        ).scalar_one_or_none()
+        # unknown keys are not cached so requests with made up keys cannot push the real ones out
+        if user_model is not None and max_size > 0:
+            cached_until = time.time() + int(current_app.config["SPIFFWORKFLOW_BACKEND_API_KEY_CACHE_TTL_IN_SECONDS"])
+            cls._users_by_api_key_hash.set(api_key_hash, (cls._detached_copy_of_user(user_model), cached_until), max_size)
+        return user_model
+
+    @classmethod
+    def clear_api_key_cache(cls) -> None:
+        cls._users_by_api_key_hash.clear()
+
+    @classmethod
+    def delete_service_account(cls, service_account: ServiceAccountModel) -> None:
+        # the related user is kept so anything it did can still be attributed to it
+        db.session.delete(service_account)
+        ServiceAccountModel.commit_with_rollback_on_exception()
+        cls.clear_api_key_cache()
+
+    @classmethod
+    def _detached_copy_of_user(cls, user_model: UserModel) -> UserModel:
+        user_snapshot = UserModel(**{column.key: getattr(user_model, column.key) for column in inspect(UserModel).column_attrs})
+        make_transient_to_detached(user_snapshot)
+        return user_snapshot
+
     @classmethod
     def create_service_account(cls, name: str, service_account_creator: UserModel) -> ServiceAccountModel:
         api_key = ServiceAccountModel.generate_api_key()
@@ -28,6 +92,7 @@ class ServiceAccountService:
         )
         db.session.add(service_account)
         ServiceAccountModel.commit_with_rollback_on_exception()
+        cls.clear_api_key_cache()
         cls.associated_service_account_with_permissions(service_account_user, service_account_creator)
         service_account.api_key = api_key
         return service_account
@@ -52,3 +117,26 @@ class ServiceAccountService:
 
         db.session.bulk_save_objects(permission_objects)
         ServiceAccountModel.commit_with_rollback_on_exception()
+        # bulk saves skip the orm events that normally invalidate cached permissions
+        PermissionMatcherCacheService.add_new_generation(CacheGenerationTable.permission_assignment.value)
+
+
+@event.listens_for(Session, "before_flush")
+def note_service_account_changes_before_flush(session: Any, flush_context: Any, instances: Any) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, ServiceAccountModel) or (isinstance(instance, UserModel) and instance in session.deleted):
+            session.info[SERVICE_ACCOUNTS_CHANGED_SESSION_INFO_KEY] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def clear_api_key_cache_after_commit(session: Any) -> None:
+    if session.info.pop(SERVICE_ACCOUNTS_CHANGED_SESSION_INFO_KEY, None):
+        ServiceAccountService.clear_api_key_cache()
+
+
+# after_soft_rollback also fires when the session had not started talking to the db yet
+@event.listens_for(Session, "after_soft_rollback")
+def discard_service_account_changes_after_rollback(session: Any, previous_transaction: Any) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(SERVICE_ACCOUNTS_CHANGED_SESSION_INFO_KEY, None)
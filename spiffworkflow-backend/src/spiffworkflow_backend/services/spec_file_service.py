@@ -21,6 +21,7 @@ from spiffworkflow_backend.services.custom_parser import MyCustomParser
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.process_caller_service import ProcessCallerService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
 
 if TYPE_CHECKING:
     from spiffworkflow_backend.models.process_model import ProcessModelInfo
@@ -220,6 +221,9 @@ class SpecFileService(FileSystemService):
         # make sure we save the file as the last thing we do to ensure validations have run
         full_file_path = SpecFileService.full_file_path(process_model_info, file_name)
         SpecFileService.write_file_data_to_system(full_file_path, binary_data)
+
+        # the file may be a called element of other process models so clear everything
+        ProcessModelSpecCacheService.clear()
         return (SpecFileService.to_file_object(file_name, full_file_path), references)
 
     @staticmethod
@@ -237,6 +241,7 @@ class SpecFileService(FileSystemService):
         cls.clear_caches_for_file(file_name, process_model)
         full_file_path = SpecFileService.full_file_path(process_model, file_name)
         os.remove(full_file_path)
+        ProcessModelSpecCacheService.clear()
 
     @staticmethod
     def delete_all_files(process_model: ProcessModelInfo) -> None:
@@ -1,7 +1,7 @@
 import copy
-import json
 import time
-from hashlib import sha256
+from collections.abc import Iterable
+from dataclasses import dataclass
 from typing import TypedDict
 from uuid import UUID
 
@@ -11,7 +11,9 @@ from SpiffWorkflow.exceptions import WorkflowException  # type: ignore
 from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
 from SpiffWorkflow.util.task import TaskState  # type: ignore
 from sqlalchemy import asc
+from sqlalchemy import or_
 
+from spiffworkflow_backend.exceptions.error import TaskDataSizeExceededError
 from spiffworkflow_backend.exceptions.error import TaskMismatchError
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessNotFoundError
@@ -39,6 +41,55 @@ class StartAndEndTimes(TypedDict):
     end_in_seconds: float | None
 
 
+@dataclass
+class SpiffTaskSnapshot:
+    state: int
+    last_state_change: float
+    child_ids: list[UUID]
+
+    @classmethod
+    def from_spiff_task(cls, spiff_task: SpiffTask) -> "SpiffTaskSnapshot":
+        return cls(
+            state=spiff_task.state,
+            last_state_change=spiff_task.last_state_change,
+            child_ids=[c.id for c in spiff_task.children],
+        )
+
+    def matches(self, spiff_task: SpiffTask) -> bool:
+        return (
+            self.state == spiff_task.state
+            and self.last_state_change == spiff_task.last_state_change
+            and self.child_ids == [c.id for c in spiff_task.children]
+        )
+
+
+class SpiffTaskChangeTracker:
+    """Remembers what each spiff task looked like when it was last loaded from or saved to the database.
+
+    This lets us skip serializing and saving tasks that have not changed. Spiff modifies data and internal_data
+    in place on started, waiting and errored tasks (multi instance parents, joins and catching events for instance)
+    without changing their state, so tasks in those states are always considered changed. Data can be changed in place
+    on other tasks too, so the task service compares it by content with the saved task model before skipping a task.
+    """
+
+    ALWAYS_CHANGED_STATES = TaskState.STARTED | TaskState.WAITING | TaskState.ERROR
+
+    def __init__(self, bpmn_process_instance: BpmnWorkflow | None = None) -> None:
+        self.snapshots: dict[UUID, SpiffTaskSnapshot] = {}
+        if bpmn_process_instance is not None:
+            for spiff_task in bpmn_process_instance.get_tasks():
+                self.snapshot(spiff_task)
+
+    def snapshot(self, spiff_task: SpiffTask) -> None:
+        self.snapshots[spiff_task.id] = SpiffTaskSnapshot.from_spiff_task(spiff_task)
+
+    def has_changed(self, spiff_task: SpiffTask) -> bool:
+        if spiff_task.has_state(self.__class__.ALWAYS_CHANGED_STATES):
+            return True
+        snapshot = self.snapshots.get(spiff_task.id)
+        return snapshot is None or not snapshot.matches(spiff_task)
+
+
 class TaskModelError(Exception):
     """Copied from SpiffWorkflow.exceptions.WorkflowTaskException.
 
@@ -105,6 +156,13 @@ class TaskModelError(Exception):
 class TaskService:
     PYTHON_ENVIRONMENT_STATE_KEY = "spiff__python_env_state"
 
+    # max number of guids to put in a single IN clause when looking up task models
+    TASK_MODEL_LOOKUP_BATCH_SIZE = 500
+
+    # Not sure what the number here should be but this now matches the mysql
+    # max_allowed_packet variable on dev - 1073741824
+    TASK_DATA_SIZE_LIMIT = 1024**3
+
     def __init__(
         self,
         process_instance: ProcessInstanceModel,
@@ -112,6 +170,7 @@ class TaskService:
         bpmn_definition_to_task_definitions_mappings: dict,
         run_started_at: float | None = None,
         force_update_definitions: bool = False,
+        task_change_tracker: SpiffTaskChangeTracker | None = None,
     ) -> None:
         self.process_instance = process_instance
         self.bpmn_definition_to_task_definitions_mappings = bpmn_definition_to_task_definitions_mappings
@@ -125,16 +184,210 @@ class TaskService:
         self.bpmn_processes: dict[str, BpmnProcessModel] = {}
         self.task_models: dict[str, TaskModel] = {}
         self.json_data_dicts: dict[str, JsonDataDict] = {}
+        # the canonical json encoding of each entry in json_data_dicts so it does not get encoded again when saving
+        self.json_data_encodings: dict[str, bytes] = {}
+        # hashes of data that entries in json_data_dicts are likely similar to. used if delta encoding is enabled.
+        self.json_data_delta_base_hashes: dict[str, list[str]] = {}
         self.process_instance_events: dict[str, ProcessInstanceEventModel] = {}
 
+        # bytes of json data in json_data_dicts that still needs to be written.
+        # it gets counted as tasks are updated so checking the size limit does not require encoding anything again.
+        self.task_data_bytes = 0
+
+        # identity maps of rows that already exist in the database so we do not have to query for each task.
+        # they get filled the first time they are needed. see prefetch_task_models and prefetch_bpmn_processes.
+        # a guid that maps to None does not have a task model in the database.
+        self.existing_task_models: dict[str, TaskModel | None] = {}
+        self.existing_bpmn_processes_by_id: dict[int, BpmnProcessModel] = {}
+        self.existing_bpmn_processes_by_guid: dict[str, BpmnProcessModel] = {}
+        self.task_models_prefetched = False
+        self.bpmn_processes_prefetched = False
+
+        # when given, update_changed_task_models skips tasks that have not changed since they were loaded or saved
+        self.task_change_tracker = task_change_tracker
+        self.spiff_tasks_to_snapshot: dict[str, SpiffTask] = {}
+
         self.run_started_at: float | None = run_started_at
 
     def save_objects_to_database(self, save_process_instance_events: bool = True) -> None:
+        self.check_task_data_size()
         db.session.bulk_save_objects(self.bpmn_processes.values())
         db.session.bulk_save_objects(self.task_models.values())
         if save_process_instance_events:
             db.session.bulk_save_objects(self.process_instance_events.values())
-        JsonDataModel.insert_or_update_json_data_records(self.json_data_dicts)
+        JsonDataModel.insert_or_update_json_data_records(
+            self.json_data_dicts, self.json_data_encodings, self.json_data_delta_base_hashes
+        )
+        self.task_data_bytes = 0
+
+        if self.task_change_tracker is not None:
+            for spiff_task in self.spiff_tasks_to_snapshot.values():
+                self.task_change_tracker.snapshot(spiff_task)
+            self.spiff_tasks_to_snapshot = {}
+
+        # new task models were just inserted by the bulk save but are not attached to the session,
+        # so make sure they get loaded from the database if they are asked for again.
+        for task_guid in self.task_models.keys():
+            if task_guid in self.existing_task_models and self.existing_task_models[task_guid] is None:
+                del self.existing_task_models[task_guid]
+
+    def check_task_data_size(self) -> None:
+        if self.task_data_bytes > self.TASK_DATA_SIZE_LIMIT:
+            raise TaskDataSizeExceededError(f"Maximum task data size of {self.TASK_DATA_SIZE_LIMIT} exceeded.")
+
+    def prefetch_task_models(self, task_guids: Iterable[str]) -> None:
+        """Load task models for this process instance into the identity map with as few queries as possible.
+
+        The first call loads every unfinished task model of the process instance since those are the ones that keep
+        getting saved. Any of the given guids that are still unknown after that, like finished tasks, are loaded in batches.
+        """
+        task_guids = [g for g in task_guids if g not in self.existing_task_models]
+        if len(task_guids) == 0:
+            return
+
+        process_instance_id: int | None = self.process_instance.id
+        if process_instance_id is None:
+            # nothing has been saved for the process instance yet
+            for task_guid in task_guids:
+                self.existing_task_models[task_guid] = None
+            return
+
+        if not self.task_models_prefetched:
+            self.task_models_prefetched = True
+            unfinished_task_models = TaskModel.query.filter(
+                TaskModel.process_instance_id == process_instance_id,
+                TaskModel.state.not_in(["COMPLETED", "CANCELLED"]),  # type: ignore
+            ).all()
+            for task_model in unfinished_task_models:
+                self.existing_task_models[task_model.guid] = task_model
+
+        guids_to_load = [g for g in task_guids if g not in self.existing_task_models]
+        batch_size = self.__class__.TASK_MODEL_LOOKUP_BATCH_SIZE
+        for index in range(0, len(guids_to_load), batch_size):
+            guid_batch = guids_to_load[index : index + batch_size]
+            task_models = TaskModel.query.filter(TaskModel.guid.in_(guid_batch)).all()  # type: ignore
+            task_models_by_guid = {t.guid: t for t in task_models}
+            for task_guid in guid_batch:
+                self.existing_task_models[task_guid] = task_models_by_guid.get(task_guid)
+
+    def update_changed_task_models(self, spiff_tasks: list[SpiffTask]) -> None:
+        """Updates the task models for the given spiff tasks.
+
+        If there is a task_change_tracker, tasks that have not changed since they were loaded or last saved are skipped.
+        Their bpmn processes are still brought up to date once per workflow.
+        """
+        self.prefetch_task_models(str(t.id) for t in spiff_tasks)
+        if self.task_change_tracker is None:
+            for spiff_task in spiff_tasks:
+                self.update_task_model_with_spiff_task(spiff_task)
+            return
+
+        python_env_data_hashes: dict[int, str] = {}
+        changed_workflows: set[int] = set()
+        unchanged_workflows: dict[int, BpmnWorkflow] = {}
+        for spiff_task in spiff_tasks:
+            if self._spiff_task_has_changed(spiff_task, python_env_data_hashes):
+                self.update_task_model_with_spiff_task(spiff_task)
+                changed_workflows.add(id(spiff_task.workflow))
+            else:
+                unchanged_workflows[id(spiff_task.workflow)] = spiff_task.workflow
+
+        for workflow_id, spiff_workflow in unchanged_workflows.items():
+            if workflow_id not in changed_workflows:
+                bpmn_process = self._bpmn_process_for_spiff_workflow(spiff_workflow)
+                if bpmn_process is not None:
+                    self.update_bpmn_process(spiff_workflow, bpmn_process)
+
+    def _spiff_task_has_changed(self, spiff_task: SpiffTask, python_env_data_hashes: dict[int, str]) -> bool:
+        if self.task_change_tracker is None or self.task_change_tracker.has_changed(spiff_task):
+            return True
+        task_model = self.task_models.get(str(spiff_task.id)) or self.find_existing_task_model(str(spiff_task.id))
+        if task_model is None:
+            return True
+
+        # the snapshots are taken from the workflow after spiff loaded it, which may already have different predicted
+        # children than the saved row. the children of the parent are checked as well since spiff syncs them together.
+        if self._saved_children_differ(task_model, spiff_task):
+            return True
+        if spiff_task.parent is not None:
+            parent_task_model = self.task_models.get(str(spiff_task.parent.id)) or self.find_existing_task_model(
+                str(spiff_task.parent.id)
+            )
+            if parent_task_model is not None and self._saved_children_differ(parent_task_model, spiff_task.parent):
+                return True
+
+        # data can be changed in place without anything else about the task changing so compare it by content.
+        # the hash of the data is cheaper to compare than the data itself since the saved data is in another table.
+        if task_model.properties_json.get("internal_data") != self.serializer.registry.convert(spiff_task.internal_data):
+            return True
+        spiff_task_data = self.serializer.registry.convert(self.serializer.registry.clean(spiff_task.data))
+        if task_model.json_data_hash != JsonDataModel.json_data_dict_from_dict(spiff_task_data)["hash"]:
+            return True
+
+        # the python environment state is saved with every task so make sure it has not changed either
+        script_engine = spiff_task.workflow.script_engine
+        if id(script_engine) not in python_env_data_hashes:
+            python_env_data_dict = self.__class__._get_python_env_data_dict_from_spiff_task(spiff_task, self.serializer)
+            python_env_data_hashes[id(script_engine)] = JsonDataModel.json_data_dict_from_dict(python_env_data_dict)["hash"]
+        return bool(task_model.python_env_data_hash != python_env_data_hashes[id(script_engine)])
+
+    def _saved_children_differ(self, task_model: TaskModel, spiff_task: SpiffTask) -> bool:
+        return bool(task_model.properties_json.get("children") != [str(child.id) for child in spiff_task.children])
+
+    def _bpmn_process_for_spiff_workflow(self, spiff_workflow: BpmnWorkflow) -> BpmnProcessModel | None:
+        if spiff_workflow.parent_task_id is None:
+            return self.process_instance.bpmn_process
+        return self.find_bpmn_process_by_guid(str(spiff_workflow.parent_task_id))
+
+    def find_existing_task_model(self, task_guid: str) -> TaskModel | None:
+        if task_guid not in self.existing_task_models:
+            self.prefetch_task_models([task_guid])
+        return self.existing_task_models[task_guid]
+
+    def prefetch_bpmn_processes(self) -> None:
+        """Load every bpmn process for this process instance into the identity map with a single query."""
+        if self.bpmn_processes_prefetched:
+            return
+        self.bpmn_processes_prefetched = True
+        top_level_process_id = self.process_instance.bpmn_process_id
+        if top_level_process_id is None:
+            return
+        bpmn_processes = BpmnProcessModel.query.filter(
+            or_(
+                BpmnProcessModel.id == top_level_process_id,
+                BpmnProcessModel.top_level_process_id == top_level_process_id,
+            )
+        ).all()
+        for bpmn_process in bpmn_processes:
+            self._add_bpmn_process_to_identity_map(bpmn_process)
+
+    def find_bpmn_process_by_id(self, bpmn_process_id: int | None) -> BpmnProcessModel | None:
+        if bpmn_process_id is None:
+            return None
+        self.prefetch_bpmn_processes()
+        if bpmn_process_id not in self.existing_bpmn_processes_by_id:
+            bpmn_process = BpmnProcessModel.query.filter_by(id=bpmn_process_id).first()
+            if bpmn_process is None:
+                return None
+            self._add_bpmn_process_to_identity_map(bpmn_process)
+        return self.existing_bpmn_processes_by_id[bpmn_process_id]
+
+    def find_bpmn_process_by_guid(self, bpmn_process_guid: str) -> BpmnProcessModel | None:
+        # every bpmn process of the process instance is either prefetched or was created by this service
+        self.prefetch_bpmn_processes()
+        return self.existing_bpmn_processes_by_guid.get(bpmn_process_guid)
+
+    def _add_bpmn_process_to_identity_map(self, bpmn_process: BpmnProcessModel) -> None:
+        self.existing_bpmn_processes_by_id[bpmn_process.id] = bpmn_process
+        if bpmn_process.guid is not None:
+            self.existing_bpmn_processes_by_guid[bpmn_process.guid] = bpmn_process
+
+    def _remove_from_identity_maps(self, guids: list[str]) -> None:
+        for guid in guids:
+            self.existing_task_models.pop(guid, None)
+            bpmn_process = self.existing_bpmn_processes_by_guid.pop(guid, None)
+            if bpmn_process is not None:
+                self.existing_bpmn_processes_by_id.pop(bpmn_process.id, None)
 
     def process_parents_and_children_and_save_to_database(
         self,
@@ -201,15 +454,13 @@ class TaskService:
             )
 
         # we are not sure why task_model.bpmn_process can be None while task_model.bpmn_process_id actually has a valid value
-        bpmn_process = (
-            new_bpmn_process or task_model.bpmn_process or BpmnProcessModel.query.filter_by(id=task_model.bpmn_process_id).first()
-        )
+        bpmn_process = new_bpmn_process or self.find_bpmn_process_by_id(task_model.bpmn_process_id) or task_model.bpmn_process
 
         self.update_task_model(task_model, spiff_task)
-        bpmn_process_json_data = self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_task.workflow)
-        if bpmn_process_json_data is not None:
-            self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
+        self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_task.workflow)
         self.task_models[task_model.guid] = task_model
+        if self.task_change_tracker is not None:
+            self.spiff_tasks_to_snapshot[task_model.guid] = spiff_task
 
         if start_and_end_times:
             task_model.start_in_seconds = start_and_end_times["start_in_seconds"]
@@ -253,19 +504,30 @@ class TaskService:
         spiff_workflow: BpmnWorkflow,
         bpmn_process: BpmnProcessModel,
     ) -> None:
-        new_properties_json = copy.copy(bpmn_process.properties_json)
-        new_properties_json["last_task"] = str(spiff_workflow.last_task.id) if spiff_workflow.last_task else None
-        new_properties_json["success"] = spiff_workflow.success
-        bpmn_process.properties_json = new_properties_json
+        last_task = str(spiff_workflow.last_task.id) if spiff_workflow.last_task else None
+        # only assign when something changed since assigning the column at all will cause it to be saved
+        if (
+            "last_task" not in bpmn_process.properties_json
+            or bpmn_process.properties_json["last_task"] != last_task
+            or "success" not in bpmn_process.properties_json
+            or bpmn_process.properties_json["success"] != spiff_workflow.success
+        ):
+            new_properties_json = copy.copy(bpmn_process.properties_json)
+            new_properties_json["last_task"] = last_task
+            new_properties_json["success"] = spiff_workflow.success
+            bpmn_process.properties_json = new_properties_json
 
-        bpmn_process_json_data = self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_workflow)
-        if bpmn_process_json_data is not None:
-            self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
+        self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_workflow)
 
         self.bpmn_processes[bpmn_process.guid or "top_level"] = bpmn_process
 
         if spiff_workflow.parent_task_id:
-            direct_parent_bpmn_process = BpmnProcessModel.query.filter_by(id=bpmn_process.direct_parent_process_id).first()
+            direct_parent_bpmn_process = self.find_bpmn_process_by_id(bpmn_process.direct_parent_process_id)
+            if direct_parent_bpmn_process is None:
+                raise BpmnProcessNotFoundError(
+                    f"Could not find bpmn process with id: {bpmn_process.direct_parent_process_id} "
+                    f"while searching for direct parent process of {bpmn_process.guid}."
+                )
             self.update_bpmn_process(spiff_workflow.parent_workflow, direct_parent_bpmn_process)
 
         if self.force_update_definitions is True:
@@ -297,16 +559,22 @@ class TaskService:
         python_env_data_dict = self.__class__._get_python_env_data_dict_from_spiff_task(spiff_task, self.serializer)
         task_model.properties_json = new_properties_json
         task_model.state = TaskState.get_name(new_properties_json["state"])
-        json_data_dict = self.__class__.update_json_data_on_db_model_and_return_dict_if_updated(
-            task_model, spiff_task_data, "json_data_hash"
-        )
-        python_env_dict = self.__class__.update_json_data_on_db_model_and_return_dict_if_updated(
-            task_model, python_env_data_dict, "python_env_data_hash"
-        )
-        if json_data_dict is not None:
-            self.json_data_dicts[json_data_dict["hash"]] = json_data_dict
-        if python_env_dict is not None:
-            self.json_data_dicts[python_env_dict["hash"]] = python_env_dict
+        json_data_dict, json_data_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict(spiff_task_data)
+        if task_model.json_data_hash != json_data_dict["hash"]:
+            # task data usually only differs a little from what the task had before or from what its parent has
+            delta_base_hashes: list[str | None] = [task_model.json_data_hash]
+            if spiff_task.parent is not None:
+                parent_task_model = self.task_models.get(str(spiff_task.parent.id)) or self.existing_task_models.get(
+                    str(spiff_task.parent.id)
+                )
+                if parent_task_model is not None:
+                    delta_base_hashes.append(parent_task_model.json_data_hash)
+            task_model.json_data_hash = json_data_dict["hash"]
+            self.add_json_data_dict(json_data_dict, json_data_encoding, delta_base_hashes)
+        python_env_dict, python_env_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict(python_env_data_dict)
+        if task_model.python_env_data_hash != python_env_dict["hash"]:
+            task_model.python_env_data_hash = python_env_dict["hash"]
+            self.add_json_data_dict(python_env_dict, python_env_encoding)
         task_model.runtime_info = spiff_task.task_spec.task_info(spiff_task)
 
     def find_or_create_task_model_from_spiff_task(
@@ -314,7 +582,7 @@ class TaskService:
         spiff_task: SpiffTask,
     ) -> tuple[BpmnProcessModel | None, TaskModel]:
         spiff_task_guid = str(spiff_task.id)
-        task_model: TaskModel | None = TaskModel.query.filter_by(guid=spiff_task_guid).first()
+        task_model: TaskModel | None = self.find_existing_task_model(spiff_task_guid)
         bpmn_process = None
         if task_model is None:
             bpmn_process = self.task_bpmn_process(
@@ -338,7 +606,7 @@ class TaskService:
     ) -> BpmnProcessModel:
         subprocess_guid, subprocess = self.__class__._task_subprocess(spiff_task)
         bpmn_process: BpmnProcessModel | None = None
-        if subprocess is None:
+        if subprocess is None or subprocess_guid is None:
             bpmn_process = self.process_instance.bpmn_process
             # This is the top level workflow, which has no guid
             # check for bpmn_process_id because mypy doesn't realize bpmn_process can be None
@@ -349,7 +617,7 @@ class TaskService:
                     spiff_workflow=spiff_workflow,
                 )
         else:
-            bpmn_process = BpmnProcessModel.query.filter_by(guid=subprocess_guid).first()
+            bpmn_process = self.find_bpmn_process_by_guid(subprocess_guid)
             if bpmn_process is None:
                 spiff_workflow = spiff_task.workflow
                 bpmn_process = self.add_bpmn_process(
@@ -383,10 +651,10 @@ class TaskService:
             bpmn_process_dict.pop("subprocess_specs")
 
         bpmn_process = None
-        if top_level_process is not None:
-            bpmn_process = BpmnProcessModel.query.filter_by(
-                top_level_process_id=top_level_process.id, guid=bpmn_process_guid
-            ).first()
+        if top_level_process is not None and bpmn_process_guid is not None:
+            bpmn_process = self.find_bpmn_process_by_guid(bpmn_process_guid)
+            if bpmn_process is not None and bpmn_process.top_level_process_id != top_level_process.id:
+                bpmn_process = None
         elif self.process_instance.bpmn_process_id is not None:
             bpmn_process = self.process_instance.bpmn_process
 
@@ -411,25 +679,19 @@ class TaskService:
                 for subprocess_guid in list(subprocesses):
                     subprocess = subprocesses[subprocess_guid]
                     if subprocess == spiff_workflow.parent_workflow:
-                        direct_bpmn_process_parent = BpmnProcessModel.query.filter_by(guid=str(subprocess_guid)).first()
-                        if direct_bpmn_process_parent is None:
+                        parent_bpmn_process = self.find_bpmn_process_by_guid(str(subprocess_guid))
+                        if parent_bpmn_process is None:
                             raise BpmnProcessNotFoundError(
                                 f"Could not find bpmn process with guid: {str(subprocess_guid)} "
                                 f"while searching for direct parent process of {bpmn_process_guid}."
                             )
-
-                if direct_bpmn_process_parent is None:
-                    raise BpmnProcessNotFoundError(f"Could not find a direct bpmn process parent for guid: {bpmn_process_guid}")
+                        direct_bpmn_process_parent = parent_bpmn_process
 
                 bpmn_process.direct_parent_process_id = direct_bpmn_process_parent.id
 
         bpmn_process.properties_json = bpmn_process_dict
 
-        bpmn_process_json_data = self.update_task_data_on_bpmn_process(
-            bpmn_process, bpmn_process_data_dict=bpmn_process_data_dict
-        )
-        if bpmn_process_json_data is not None:
-            self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
+        self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_data_dict=bpmn_process_data_dict)
 
         if top_level_process is None:
             self.process_instance.bpmn_process = bpmn_process
@@ -439,6 +701,10 @@ class TaskService:
         # Since we bulk insert tasks later we need to add the bpmn_process to the session
         # to ensure we have an id.
         db.session.add(bpmn_process)
+        bpmn_process_id: int | None = bpmn_process.id
+        if bpmn_process_id is None:
+            db.session.flush()
+        self._add_bpmn_process_to_identity_map(bpmn_process)
 
         if bpmn_process_is_new:
             self.add_tasks_to_bpmn_process(
@@ -454,6 +720,7 @@ class TaskService:
         spiff_workflow: BpmnWorkflow,
         bpmn_process: BpmnProcessModel,
     ) -> None:
+        self.prefetch_task_models(tasks.keys())
         for task_id, _task_properties in tasks.items():
             # we are going to avoid saving likely and maybe tasks to the db.
             # that means we need to remove them from their parents' lists of children as well.
@@ -461,7 +728,7 @@ class TaskService:
             if spiff_task.has_state(TaskState.PREDICTED_MASK):
                 self.__class__.remove_spiff_task_from_parent(spiff_task, self.task_models)
                 continue
-            task_model = TaskModel.query.filter_by(guid=task_id).first()
+            task_model = self.find_existing_task_model(task_id)
             if task_model is None:
                 task_model = self.__class__._create_task(
                     bpmn_process,
@@ -505,6 +772,7 @@ class TaskService:
         )
         for bpmn_process in bpmn_processes_to_delete:
             db.session.delete(bpmn_process)
+        self._remove_from_identity_maps(deleted_task_guids)
 
         # Note: Can't restrict this to definite, because some things are updated and are now CANCELLED
         # and other things may have been COMPLETED and are now MAYBE
@@ -512,6 +780,7 @@ class TaskService:
         for spiff_task in spiff_tasks:
             if spiff_task.last_state_change > start_time:
                 spiff_tasks_updated[str(spiff_task.id)] = spiff_task
+        self.prefetch_task_models(spiff_tasks_updated.keys())
         for _id, spiff_task in spiff_tasks_updated.items():
             self.update_task_model_with_spiff_task(spiff_task)
 
@@ -541,13 +810,25 @@ class TaskService:
             data_dict_to_use = self.serializer.to_dict(bpmn_process_instance.data)
         if data_dict_to_use is None:
             data_dict_to_use = {}
-        bpmn_process_data_json = json.dumps(data_dict_to_use, sort_keys=True)
-        bpmn_process_data_hash: str = sha256(bpmn_process_data_json.encode("utf8")).hexdigest()
-        json_data_dict: JsonDataDict | None = None
-        if bpmn_process.json_data_hash != bpmn_process_data_hash:
-            json_data_dict = {"hash": bpmn_process_data_hash, "data": data_dict_to_use}
-            bpmn_process.json_data_hash = bpmn_process_data_hash
-        return json_data_dict
+        json_data_dict, json_data_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict(data_dict_to_use)
+        if bpmn_process.json_data_hash != json_data_dict["hash"]:
+            delta_base_hashes: list[str | None] = [bpmn_process.json_data_hash]
+            bpmn_process.json_data_hash = json_data_dict["hash"]
+            self.add_json_data_dict(json_data_dict, json_data_encoding, delta_base_hashes)
+            return json_data_dict
+        return None
+
+    def add_json_data_dict(
+        self, json_data_dict: JsonDataDict, json_data_encoding: bytes, delta_base_hashes: list[str | None] | None = None
+    ) -> None:
+        if json_data_dict["hash"] not in self.json_data_dicts:
+            self.json_data_dicts[json_data_dict["hash"]] = json_data_dict
+            self.json_data_encodings[json_data_dict["hash"]] = json_data_encoding
+            self.task_data_bytes += len(json_data_encoding)
+        for delta_base_hash in delta_base_hashes or []:
+            existing_base_hashes = self.json_data_delta_base_hashes.setdefault(json_data_dict["hash"], [])
+            if delta_base_hash is not None and delta_base_hash not in existing_base_hashes:
+                existing_base_hashes.append(delta_base_hash)
 
     @classmethod
     def update_json_data_on_db_model_and_return_dict_if_updated(
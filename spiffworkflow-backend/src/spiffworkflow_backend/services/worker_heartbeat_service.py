@@ -0,0 +1,180 @@
+import os
+import socket
+import threading
+import time
+from typing import Any
+
+import flask
+from flask import current_app
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import update
+
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.models.worker_heartbeat import WorkerHeartbeatModel
+
+
+class WorkerHeartbeatService:
+    """Keeps a heartbeat row for each backend process that locks process instances so locks of dead processes can be found.
+
+    Each process, including every celery prefork child and web worker, has its own PROCESS_UUID which is part of the
+    locked_by value of every lock it takes. A daemon thread in the process refreshes its row, so a row that stopped
+    being refreshed means none of the locks with that uuid will ever be released by their owner.
+    """
+
+    _heartbeat_lock = threading.Lock()
+    _heartbeat_pid: int | None = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return current_app.config["SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED"] is True
+
+    @classmethod
+    def worker_identifier(cls) -> str:
+        return str(current_app.config["PROCESS_UUID"])
+
+    @classmethod
+    def worker_identifier_from_locked_by(cls, locked_by: str) -> str | None:
+        # locked_by is domain:uuid:thread_id:additional_processing_identifier and the domain can contain colons as well
+        parts = locked_by.rsplit(":", 3)
+        if len(parts) != 4:
+            return None
+        return parts[1]
+
+    @classmethod
+    def start_heartbeat_if_needed(cls) -> None:
+        """Starts the heartbeat thread of the current process unless it is already running.
+
+        This checks the pid since threads do not survive a fork, so forked processes start their own.
+        """
+        if cls._heartbeat_pid == os.getpid() or not cls.enabled():
+            return
+        app = current_app._get_current_object()  # type: ignore
+        with cls._heartbeat_lock:
+            if cls._heartbeat_pid == os.getpid():
+                return
+            try:
+                cls.beat()
+            except Exception as exception:
+                # the thread tries again so this should not keep the process from doing its work
+                current_app.logger.warning(f"Could not record worker heartbeat: {exception}")
+            threading.Thread(target=cls._beat_until_exit, args=(app,), name="worker_heartbeat", daemon=True).start()
+            cls._heartbeat_pid = os.getpid()
+
+    @classmethod
+    def beat(cls) -> None:
+        """Refreshes the heartbeat row of the current process with its own connection so it never touches db.session."""
+        current_time = round(time.time())
+        worker_identifier = cls.worker_identifier()
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(WorkerHeartbeatModel)
+                .where(WorkerHeartbeatModel.worker_identifier == worker_identifier)
+                .values(last_heartbeat_at_in_seconds=current_time, updated_at_in_seconds=current_time)
+            )
+            if result.rowcount == 0:
+                connection.execute(
+                    insert(WorkerHeartbeatModel).values(
+                        worker_identifier=worker_identifier,
+                        hostname=socket.gethostname(),
+                        pid=os.getpid(),
+                        started_at_in_seconds=current_time,
+                        last_heartbeat_at_in_seconds=current_time,
+                        updated_at_in_seconds=current_time,
+                        created_at_in_seconds=current_time,
+                    )
+                )
+
+    @classmethod
+    def dead_worker_identifiers(cls) -> list[str]:
+        rows = (
+            db.session.query(WorkerHeartbeatModel.worker_identifier)
+            .filter(WorkerHeartbeatModel.last_heartbeat_at_in_seconds < cls.dead_if_last_heartbeat_before())
+            .order_by(WorkerHeartbeatModel.id)
+            .all()
+        )
+        return [row.worker_identifier for row in rows]
+
+    @classmethod
+    def is_dead(cls, locked_by: str, locked_at_in_seconds: int | None) -> bool:
+        """Only locks of processes that registered a heartbeat and then stopped sending it are considered dead.
+
+        A lock taken within the heartbeat timeout shows its process was alive recently even if its heartbeat stalled.
+        """
+        if not cls.enabled():
+            return False
+        if locked_at_in_seconds is not None and locked_at_in_seconds >= cls.dead_if_last_heartbeat_before():
+            return False
+        worker_identifier = cls.worker_identifier_from_locked_by(locked_by)
+        if worker_identifier is None:
+            return False
+        last_heartbeat_at_in_seconds = (
+            db.session.query(WorkerHeartbeatModel.last_heartbeat_at_in_seconds)
+            .filter(WorkerHeartbeatModel.worker_identifier == worker_identifier)
+            .scalar()
+        )
+        return last_heartbeat_at_in_seconds is not None and last_heartbeat_at_in_seconds < cls.dead_if_last_heartbeat_before()
+
+    @classmethod
+    def forget_dead_workers(cls, worker_identifiers: list[str]) -> None:
+        if len(worker_identifiers) == 0:
+            return
+        db.session.execute(
+            delete(WorkerHeartbeatModel).where(
+                WorkerHeartbeatModel.worker_identifier.in_(worker_identifiers),  # type: ignore
+                # it may have come back to life in the meantime
+                WorkerHeartbeatModel.last_heartbeat_at_in_seconds < cls.dead_if_last_heartbeat_before(),
+            )
+        )
+        db.session.commit()
+
+    @classmethod
+    def worker_stats(cls) -> dict[str, Any]:
+        """Returns how many workers are alive and how many locks each worker holds."""
+        dead_if_last_heartbeat_before = cls.dead_if_last_heartbeat_before()
+        held_lock_counts: dict[str | None, int] = {}
+        lock_counts_by_locked_by = (
+            db.session.query(ProcessInstanceQueueModel.locked_by, func.count(ProcessInstanceQueueModel.id))
+            .filter(ProcessInstanceQueueModel.locked_by.is_not(None))  # type: ignore
+            .group_by(ProcessInstanceQueueModel.locked_by)
+            .all()
+        )
+        for locked_by, lock_count in lock_counts_by_locked_by:
+            worker_identifier = cls.worker_identifier_from_locked_by(locked_by)
+            held_lock_counts[worker_identifier] = held_lock_counts.get(worker_identifier, 0) + lock_count
+
+        workers = []
+        for heartbeat in WorkerHeartbeatModel.query.order_by(WorkerHeartbeatModel.id).all():
+            workers.append(
+                {
+                    "worker_identifier": heartbeat.worker_identifier,
+                    "hostname": heartbeat.hostname,
+                    "pid": heartbeat.pid,
+                    "started_at_in_seconds": heartbeat.started_at_in_seconds,
+                    "last_heartbeat_at_in_seconds": heartbeat.last_heartbeat_at_in_seconds,
+                    "alive": heartbeat.last_heartbeat_at_in_seconds >= dead_if_last_heartbeat_before,
+                    "held_lock_count": held_lock_counts.pop(heartbeat.worker_identifier, 0),
+                }
+            )
+        return {
+            "live_worker_count": len([worker for worker in workers if worker["alive"]]),
+            "workers": workers,
+            "locks_held_by_unregistered_workers": sum(held_lock_counts.values()),
+        }
+
+    @classmethod
+    def dead_if_last_heartbeat_before(cls) -> int:
+        return round(time.time()) - int(current_app.config["SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_TIMEOUT_IN_SECONDS"])
+
+    @classmethod
+    def _beat_until_exit(cls, app: flask.app.Flask) -> None:
+        with app.app_context():
+            interval_in_seconds = int(app.config["SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_INTERVAL_IN_SECONDS"])
+            while True:
+                time.sleep(interval_in_seconds)
+                try:
+                    cls.beat()
+                except Exception as exception:
+                    app.logger.warning(f"Could not record worker heartbeat: {exception}")
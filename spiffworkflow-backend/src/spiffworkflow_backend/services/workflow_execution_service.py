@@ -24,6 +24,7 @@ from SpiffWorkflow.util.task import TaskState  # type: ignore
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
     queue_future_task_if_appropriate,
 )
+from spiffworkflow_backend.background_processing.message_correlation_notifier import MessageCorrelationNotifier
 from spiffworkflow_backend.data_stores.kkv import KKVDataStore
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.helpers.spiff_enum import SpiffEnum
@@ -39,6 +40,7 @@ from spiffworkflow_backend.services.assertion_service import safe_assertion
 from spiffworkflow_backend.services.jinja_service import JinjaService
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
+from spiffworkflow_backend.services.task_service import SpiffTaskChangeTracker
 from spiffworkflow_backend.services.task_service import StartAndEndTimes
 from spiffworkflow_backend.services.task_service import TaskService
 
@@ -234,6 +236,7 @@ class TaskModelSavingDelegate(EngineStepDelegate):
         process_instance: ProcessInstanceModel,
         bpmn_definition_to_task_definitions_mappings: dict,
         secondary_engine_step_delegate: EngineStepDelegate | None = None,
+        task_change_tracker: SpiffTaskChangeTracker | None = None,
     ) -> None:
         self.secondary_engine_step_delegate = secondary_engine_step_delegate
         self.process_instance = process_instance
@@ -251,6 +254,7 @@ class TaskModelSavingDelegate(EngineStepDelegate):
             serializer=self.serializer,
             bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
             run_started_at=time.time(),
+            task_change_tracker=task_change_tracker,
         )
 
     def will_complete_task(self, spiff_task: SpiffTask) -> None:
@@ -296,7 +300,7 @@ class TaskModelSavingDelegate(EngineStepDelegate):
         # ANOTHER NOTE: at one point we attempted to be smarter about what tasks we considered for persistence,
         # but it didn't quite work in all cases, so we deleted it. you can find it in commit
         # 1ead87b4b496525df8cc0e27836c3e987d593dc0 if you are curious.
-        for waiting_spiff_task in bpmn_process_instance.get_tasks(
+        waiting_spiff_tasks = bpmn_process_instance.get_tasks(
             state=TaskState.WAITING
             | TaskState.CANCELLED
             | TaskState.READY
@@ -305,8 +309,9 @@ class TaskModelSavingDelegate(EngineStepDelegate):
             | TaskState.FUTURE
             | TaskState.STARTED
             | TaskState.ERROR,
-        ):
-            self.task_service.update_task_model_with_spiff_task(waiting_spiff_task)
+        )
+        # only tasks that changed since they were loaded get saved if the task service has a change tracker
+        self.task_service.update_changed_task_models(waiting_spiff_tasks)
 
         self.task_service.save_objects_to_database()
 
@@ -518,17 +523,23 @@ class WorkflowExecutionService:
                 if "Time" in event.event_type:
                     time_string = event.value
                     run_at_in_seconds = round(datetime.fromisoformat(time_string).timestamp())
-                    FutureTaskModel.insert_or_update(guid=str(spiff_task.id), run_at_in_seconds=run_at_in_seconds)
-                    if self.is_happening_soon(run_at_in_seconds):
-                        queue_future_task_if_appropriate(
-                            self.process_instance_model, eta_in_seconds=run_at_in_seconds, task_guid=str(spiff_task.id)
-                        )
+                    queued_at_in_seconds = None
+                    if self.is_happening_soon(run_at_in_seconds) and queue_future_task_if_appropriate(
+                        self.process_instance_model, eta_in_seconds=run_at_in_seconds, task_guid=str(spiff_task.id)
+                    ):
+                        queued_at_in_seconds = round(time.time())
+                    FutureTaskModel.insert_or_update(
+                        guid=str(spiff_task.id),
+                        run_at_in_seconds=run_at_in_seconds,
+                        queued_at_in_seconds=queued_at_in_seconds,
+                    )
 
     def process_bpmn_messages(self) -> None:
         # FIXE: get_events clears out the events so if we have other events we care about
         #   this will clear them out as well.
         # Right now we only care about messages though.
         bpmn_events = self.bpmn_process_instance.get_events()
+        message_names = set()
         for bpmn_event in bpmn_events:
             if not isinstance(bpmn_event.event_definition, MessageEventDefinition):
                 continue
@@ -543,6 +554,7 @@ class WorkflowExecutionService:
                 correlation_keys=self.bpmn_process_instance.correlations,
             )
             db.session.add(message_instance)
+            message_names.add(bpmn_message.name)
 
             bpmn_process = self.process_instance_model.bpmn_process
             if bpmn_process is not None:
@@ -551,10 +563,12 @@ class WorkflowExecutionService:
                 # update correlations correctly but always null out bpmn_messages since they get cleared out later
                 bpmn_process.properties_json["bpmn_events"] = []
                 db.session.add(bpmn_process)
+        MessageCorrelationNotifier.notify_after_commit(message_names)
 
     def queue_waiting_receive_messages(self) -> None:
         waiting_events = self.bpmn_process_instance.waiting_events()
         waiting_message_events = filter(lambda e: e.event_type == "MessageEventDefinition", waiting_events)
+        message_names = set()
         for event in waiting_message_events:
             # Ensure we are only creating one active message instance for each waiting message
             if (
@@ -584,7 +598,9 @@ class WorkflowExecutionService:
                     correlation_key_names=correlation_property.correlation_keys,
                 )
                 db.session.add(message_correlation)
+            message_instance.set_correlation_fingerprint()
             db.session.add(message_instance)
+            message_names.add(event.name)
 
             bpmn_process = self.process_instance_model.bpmn_process
 
@@ -592,6 +608,7 @@ class WorkflowExecutionService:
                 bpmn_process_correlations = self.bpmn_process_instance.correlations
                 bpmn_process.properties_json["correlations"] = bpmn_process_correlations
                 db.session.add(bpmn_process)
+        MessageCorrelationNotifier.notify_after_commit(message_names)
 
 
 class ProfiledWorkflowExecutionService(WorkflowExecutionService):
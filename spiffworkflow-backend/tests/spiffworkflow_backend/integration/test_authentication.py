@@ -1,10 +1,14 @@
 import ast
 import base64
 import re
+import time
 
+import pytest
+import requests
 from flask.app import Flask
 from flask.testing import FlaskClient
 from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.exceptions.error import OpenIdConnectionError
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.services.authentication_service import AuthenticationService
@@ -201,3 +205,65 @@ class TestAuthentication(BaseTest):
             headers={"Authorization": "Bearer " + access_token.split("=")[1]},
         )
         assert response.status_code == 403
+
+    def test_only_verifies_the_signature_of_a_token_once(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        user = self.find_or_create_user()
+        access_token = user.encode_auth_token({"authentication_identifier": "default"})
+        verify_mock = mocker.patch.object(
+            AuthenticationService, "_verify_and_parse_jwt_token", wraps=AuthenticationService._verify_and_parse_jwt_token
+        )
+
+        first_claims = AuthenticationService.parse_jwt_token("default", access_token)
+        first_claims["email"] = "changed_by_the_caller@example.com"
+        second_claims = AuthenticationService.parse_jwt_token("default", access_token)
+
+        assert verify_mock.call_count == 1
+        assert second_claims["email"] == user.email
+
+    def test_refetches_the_json_web_keyset_when_a_key_id_is_unknown(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+    ) -> None:
+        jwks_uri = "http://example.com/jwks"
+        mocker.patch.dict(AuthenticationService.ENDPOINT_CACHE, {"default": {"jwks_uri": jwks_uri}})
+        mocker.patch.dict(AuthenticationService.JSON_WEB_KEYSET_CACHE, {jwks_uri: {"keys": [{"kid": "old_key"}]}})
+        openid_config_url = f"{app.config['SPIFFWORKFLOW_BACKEND_AUTH_CONFIGS'][0]['uri']}/.well-known/openid-configuration"
+        # neither is stale but the keyset is old enough to be fetched again for an unknown key id
+        mocker.patch.dict(AuthenticationService._fetched_at_by_url, {openid_config_url: time.time(), jwks_uri: time.time() - 60})
+        requests_mock = mocker.patch("spiffworkflow_backend.services.authentication_service.requests.get")
+        requests_mock.return_value.json.return_value = {"keys": [{"kid": "new_key"}]}
+
+        json_key_configs = AuthenticationService.jwks_public_key_for_key_id("default", "new_key")
+
+        assert json_key_configs == {"kid": "new_key"}
+        requests_mock.assert_called_once()
+        assert requests_mock.call_args.args[0] == jwks_uri
+
+    def test_keeps_the_cached_json_web_keyset_when_the_refetch_fails(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+    ) -> None:
+        jwks_uri = "http://example.com/jwks"
+        fetched_at = time.time() - 60
+        mocker.patch.dict(AuthenticationService.JSON_WEB_KEYSET_CACHE, {jwks_uri: {"keys": [{"kid": "old_key"}]}})
+        mocker.patch.dict(AuthenticationService._fetched_at_by_url, {jwks_uri: fetched_at})
+        requests_mock = mocker.patch("spiffworkflow_backend.services.authentication_service.requests.get")
+
+        requests_mock.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError("503 Server Error")
+        with pytest.raises(OpenIdConnectionError):
+            AuthenticationService.get_jwks_config_from_uri(jwks_uri, force_refresh=True)
+
+        requests_mock.return_value.raise_for_status.side_effect = None
+        requests_mock.return_value.json.return_value = {"error": "temporarily_unavailable"}
+        with pytest.raises(OpenIdConnectionError):
+            AuthenticationService.get_jwks_config_from_uri(jwks_uri, force_refresh=True)
+
+        assert AuthenticationService.JSON_WEB_KEYSET_CACHE[jwks_uri] == {"keys": [{"kid": "old_key"}]}
+        assert AuthenticationService._fetched_at_by_url[jwks_uri] == fetched_at
@@ -0,0 +1,200 @@
+"""Benchmarks how fast messages are correlated and delivered to process instances waiting on them.
+
+The benchmark only runs when SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_RECEIVERS is set. The query count test runs
+on every test run as a regression gate. The reports are logged at the info level. To run the benchmark use for example:
+
+    SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_RECEIVERS=2000 SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_SENDS=200 \
+        poet test -k test_message_delivery_benchmark -o log_cli=true --log-cli-level=INFO
+"""
+
+import json
+import os
+import time
+from collections.abc import Callable
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dataclasses import field
+from functools import partial
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.message_instance import MessageInstanceModel
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_model import ProcessModelInfo
+from spiffworkflow_backend.models.user import UserModel
+from spiffworkflow_backend.services.message_service import MessageService
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from sqlalchemy import event
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+CUSTOMER_ID = "Sartography"
+
+
+@dataclass
+class MessageDeliveryBenchmarkResult:
+    receiver_count: int
+    send_count: int
+    send_path: str
+    latencies_in_seconds: list[float] = field(default_factory=list)
+    query_count: int = 0
+    delivered_count: int = 0
+
+    def percentile(self, percent: int) -> float:
+        ordered_latencies = sorted(self.latencies_in_seconds)
+        index = min(len(ordered_latencies) - 1, round(percent / 100 * (len(ordered_latencies) - 1)))
+        return ordered_latencies[index]
+
+    def queries_per_delivery(self) -> float:
+        return self.query_count / max(1, self.delivered_count)
+
+    def report(self) -> str:
+        total_seconds = sum(self.latencies_in_seconds)
+        return (
+            f"message delivery via {self.send_path}: {self.send_count} sends to {self.receiver_count} waiting receivers,"
+            f" {self.delivered_count} delivered, {self.delivered_count / max(total_seconds, 1e-9):.1f} messages/s,"
+            f" p50 {self.percentile(50) * 1000:.1f}ms p90 {self.percentile(90) * 1000:.1f}ms"
+            f" p99 {self.percentile(99) * 1000:.1f}ms, {self.queries_per_delivery():.1f} queries per delivery"
+        )
+
+
+class TestMessageDeliveryBenchmark(BaseTest):
+    @pytest.mark.skipif(
+        "SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_RECEIVERS" not in os.environ,
+        reason="benchmark only runs when SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_RECEIVERS is set",
+    )
+    def test_message_delivery_benchmark(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+        with_super_admin_user: UserModel,
+    ) -> None:
+        receiver_count = int(os.environ["SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_RECEIVERS"])
+        send_count = int(os.environ.get("SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_SENDS", "4"))
+        process_model = self._load_waiting_process_model()
+
+        results = []
+        send_with_controller = partial(self._send_with_controller, client, with_super_admin_user)
+        send_functions: list[tuple[str, Callable[[ProcessInstanceModel, dict], bool]]] = [
+            ("service", self._send_with_service),
+            ("controller", send_with_controller),
+        ]
+        for send_path, send_function in send_functions:
+            process_instances = self._create_waiting_process_instances(process_model, receiver_count)
+            results.append(self._run_benchmark(process_instances, send_count, send_path, send_function))
+        for result in results:
+            app.logger.info(result.report())
+            assert result.delivered_count == send_count
+
+        max_queries_per_delivery = os.environ.get("SPIFFWORKFLOW_BACKEND_MESSAGE_BENCHMARK_MAX_QUERIES_PER_DELIVERY")
+        if max_queries_per_delivery is not None:
+            for result in results:
+                assert result.queries_per_delivery() <= float(max_queries_per_delivery)
+
+    def test_message_delivery_queries_do_not_grow_with_waiting_receivers(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        send_count = 3
+        process_model = self._load_waiting_process_model()
+
+        small_result = self._run_benchmark(
+            self._create_waiting_process_instances(process_model, send_count), send_count, "service", self._send_with_service
+        )
+        large_result = self._run_benchmark(
+            self._create_waiting_process_instances(process_model, send_count * 5), send_count, "service", self._send_with_service
+        )
+        app.logger.info(small_result.report())
+        app.logger.info(large_result.report())
+        assert large_result.delivered_count == send_count
+        assert large_result.queries_per_delivery() <= small_result.queries_per_delivery() + 1
+
+    def _load_waiting_process_model(self) -> ProcessModelInfo:
+        # sends a "Request Approval" message and then waits for an "Approval Result" with the same po_number and customer_id
+        return load_test_spec(
+            "test_group/message",
+            process_model_source_directory="message_send_one_conversation",
+            bpmn_file_name="message_sender.bpmn",
+        )
+
+    def _create_waiting_process_instances(self, process_model: ProcessModelInfo, count: int) -> list[ProcessInstanceModel]:
+        process_instances = []
+        for _ in range(count):
+            process_instance = self.create_process_instance_from_process_model(process_model)
+            processor = ProcessInstanceProcessor(process_instance)
+            processor.do_engine_steps(save=True)
+            ProcessInstanceService.complete_form_task(
+                processor,
+                processor.get_all_user_tasks()[0],
+                # the id makes the correlation keys of every process instance unique
+                {"customer_id": CUSTOMER_ID, "po_number": process_instance.id, "description": "benchmark", "amount": "1.00"},
+                process_instance.process_initiator,
+                process_instance.active_human_tasks[0],
+            )
+            processor.save()
+            process_instances.append(process_instance)
+        return process_instances
+
+    def _run_benchmark(
+        self,
+        process_instances: list[ProcessInstanceModel],
+        send_count: int,
+        send_path: str,
+        send_function: Callable[[ProcessInstanceModel, dict], bool],
+    ) -> MessageDeliveryBenchmarkResult:
+        result = MessageDeliveryBenchmarkResult(receiver_count=len(process_instances), send_count=send_count, send_path=send_path)
+        # deliver to receivers spread over the whole set rather than only the oldest ones
+        step = max(1, len(process_instances) // send_count)
+        for process_instance in process_instances[::step][:send_count]:
+            payload = {"customer_id": CUSTOMER_ID, "po_number": process_instance.id}
+            with self._counting_queries() as query_counter:
+                start = time.perf_counter()
+                delivered = send_function(process_instance, payload)
+                result.latencies_in_seconds.append(time.perf_counter() - start)
+            result.query_count += query_counter()
+            if delivered:
+                result.delivered_count += 1
+        return result
+
+    def _send_with_service(self, process_instance: ProcessInstanceModel, payload: dict) -> bool:
+        message_instance_send = MessageInstanceModel(
+            message_type="send",
+            name="Approval Result",
+            payload=payload,
+            user_id=process_instance.process_initiator_id,
+        )
+        db.session.add(message_instance_send)
+        db.session.commit()
+        return MessageService.correlate_send_message(message_instance_send) is not None
+
+    def _send_with_controller(
+        self, client: FlaskClient, user: UserModel, process_instance: ProcessInstanceModel, payload: dict
+    ) -> bool:
+        response = client.post(
+            "/v1.0/messages/Approval Result",
+            content_type="application/json",
+            headers=self.logged_in_headers(user),
+            data=json.dumps(payload),
+        )
+        return response.status_code == 200
+
+    @contextmanager
+    def _counting_queries(self) -> Generator[Callable[[], int], None, None]:
+        query_count = 0
+
+        def count_query(*_args: object) -> None:
+            nonlocal query_count
+            query_count += 1
+
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        try:
+            yield lambda: query_count
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_query)
@@ -1,4 +1,5 @@
 import json
+from typing import Any
 
 from flask.app import Flask
 from flask.testing import FlaskClient
@@ -6,6 +7,7 @@ from spiffworkflow_backend import db
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.services.service_account_service import ServiceAccountService
 from spiffworkflow_backend.services.user_service import UserService
+from sqlalchemy import event
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 
@@ -93,3 +95,34 @@ class TestServiceAccounts(BaseTest):
         # It should be possible to delete the service account after starting a process.
         db.session.delete(service_account)
         db.session.commit()
+
+    def test_caches_api_keys_until_the_service_account_is_deleted(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+        with_super_admin_user: UserModel,
+    ) -> None:
+        service_account = ServiceAccountService.create_service_account("cached_key", with_super_admin_user)
+        api_key = str(service_account.api_key)
+        service_account_user_id = service_account.user_id
+        assert ServiceAccountService.user_from_api_key(api_key) is not None
+
+        query_count = 0
+
+        def count_query(*args: Any) -> None:
+            nonlocal query_count
+            query_count += 1
+
+        db.session.expunge_all()
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        try:
+            user = ServiceAccountService.user_from_api_key(api_key)
+            assert query_count == 0
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_query)
+        assert user is not None
+        assert user.id == service_account_user_id
+        assert user in db.session
+
+        ServiceAccountService.delete_service_account(service_account)
+        assert ServiceAccountService.user_from_api_key(api_key) is None
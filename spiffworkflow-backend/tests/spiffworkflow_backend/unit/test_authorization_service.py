@@ -2,13 +2,21 @@ import pytest
 from flask import Flask
 from flask.testing import FlaskClient
 from spiffworkflow_backend.exceptions.error import InvalidPermissionError
+from spiffworkflow_backend.models.cache_generation import CacheGenerationModel
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.group import GroupModel
+from spiffworkflow_backend.models.permission_assignment import PermissionAssignmentModel
 from spiffworkflow_backend.models.user_group_assignment_waiting import UserGroupAssignmentWaitingModel
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
 from spiffworkflow_backend.services.authorization_service import GroupPermissionsDict
+from spiffworkflow_backend.services.permission_matcher_cache_service import PERMISSION_CACHE_TABLES
+from spiffworkflow_backend.services.permission_matcher_cache_service import PermissionMatcherCacheService
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
 from spiffworkflow_backend.services.user_service import UserService
+from sqlalchemy import event
+from sqlalchemy import insert
+from sqlalchemy import update
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -661,3 +669,57 @@ class TestAuthorizationService(BaseTest):
         # test it can be permitted again
         AuthorizationService.add_permission_from_uri_or_macro(user_group.identifier, "read", "PG:hey:yo")
         self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey:yo", expected_result=True)
+
+    def test_checks_permissions_without_queries_until_permissions_change(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        user = self.find_or_create_user(username="user_one")
+        user_group = UserService.find_or_create_group("group_one")
+        UserService.add_user_to_group(user, user_group)
+        AuthorizationService.add_permission_from_uri_or_macro(user_group.identifier, "read", "PG:hey")
+        self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey:yo")
+
+        query_count = 0
+
+        def count_query(*_args: object) -> None:
+            nonlocal query_count
+            query_count += 1
+
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        try:
+            self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey")
+            self.assert_user_has_permission(user, "read", "/v1.0/process-groups/other", expected_result=False)
+            assert query_count == 0
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_query)
+
+        AuthorizationService.add_permission_from_uri_or_macro(user_group.identifier, "DENY:read", "PG:hey:yo")
+        self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey:yo", expected_result=False)
+        UserService.remove_user_from_group(user, user_group.identifier)
+        self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey", expected_result=False)
+
+    def test_sees_permission_changes_from_other_processes_through_cache_generations(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        user = self.find_or_create_user(username="user_one")
+        user_group = UserService.find_or_create_group("group_one")
+        UserService.add_user_to_group(user, user_group)
+        AuthorizationService.add_permission_from_uri_or_macro(user_group.identifier, "read", "PG:hey")
+        assert CacheGenerationModel.newest_generation_id_for_tables(PERMISSION_CACHE_TABLES) is not None
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_PERMISSION_CACHE_GENERATION_CHECK_INTERVAL_IN_SECONDS", 0):
+            self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey")
+
+            # another process denies the permission with a bulk update so no orm events fire in this one
+            db.session.execute(update(PermissionAssignmentModel).values(grant_type="deny"))
+            db.session.execute(insert(CacheGenerationModel).values(cache_table="permission_assignment"))
+            db.session.commit()
+            self.assert_user_has_permission(user, "read", "/v1.0/process-groups/hey", expected_result=False)
+
+        PermissionMatcherCacheService.add_new_generation("permission_assignment")
+        generations = CacheGenerationModel.query.filter(CacheGenerationModel.cache_table.in_(PERMISSION_CACHE_TABLES)).all()
+        assert len(generations) == 1
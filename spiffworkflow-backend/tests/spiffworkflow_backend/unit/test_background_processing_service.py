@@ -1,7 +1,9 @@
 import time
 
+import pytest
 from flask import Flask
 from pytest_mock.plugin import MockerFixture
+from sqlalchemy import update
 from spiffworkflow_backend.background_processing.background_processing_service import BackgroundProcessingService
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.future_task import FutureTaskModel
@@ -40,6 +42,40 @@ class TestBackgroundProcessingService(BaseTest):
             assert len(future_tasks) == 1
             assert future_tasks[0].archived_for_process_instance_status is False
 
+    def test_do_process_future_tasks_queues_each_future_task_once_per_run_at(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mock = mocker.patch("celery.current_app.send_task")
+            self._load_up_a_future_task_and_return_instance()
+            BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            assert mock.call_count == 1
+            assert BackgroundProcessingService.imminent_future_tasks(99999999999999999) == []
+
+            # rescheduling the timer to a different time queues it again
+            future_task = FutureTaskModel.query.one()
+            FutureTaskModel.insert_or_update(guid=future_task.guid, run_at_in_seconds=future_task.run_at_in_seconds + 60)
+            db.session.commit()
+            BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            assert mock.call_count == 2
+
+            # a task that is still not completed long after it was queued gets queued again
+            db.session.refresh(future_task)
+            assert future_task.queued_at_in_seconds is not None
+            BackgroundProcessingService.do_process_future_tasks(3600)
+            assert mock.call_count == 2
+            future_task.queued_at_in_seconds -= (
+                3600 + app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_REQUEUE_AFTER_IN_SECONDS"] + 60
+            )
+            db.session.add(future_task)
+            db.session.commit()
+            BackgroundProcessingService.do_process_future_tasks(3600)
+            assert mock.call_count == 3
+
     def test_do_process_future_tasks_with_unprocessable_future_task(
         self,
         app: Flask,
@@ -70,11 +106,13 @@ class TestBackgroundProcessingService(BaseTest):
             future_tasks = BackgroundProcessingService.imminent_future_tasks(99999999999999999)
             assert len(future_tasks) == 1
 
+    @pytest.mark.parametrize("worker_pool_size", [1, 2])
     def test_do_waiting_errors_gracefully_when_instance_already_locked(
         self,
         app: Flask,
         mocker: MockerFixture,
         with_db_and_bpmn_file_cleanup: None,
+        worker_pool_size: int,
     ) -> None:
         process_model = load_test_spec(
             process_model_id="test_group/model_with_lanes",
@@ -85,13 +123,31 @@ class TestBackgroundProcessingService(BaseTest):
         assert process_instance.status == ProcessInstanceStatus.waiting.value
         queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
         assert queue_entry is not None
-        queue_entry.locked_by = "test:test_waiting"
-        queue_entry.locked_at_seconds = round(time.time())
-        db.session.add(queue_entry)
+        # old enough and due so claim_batch would pick it up if it were not locked
+        old_time_in_seconds = round(time.time()) - 3600
+        db.session.execute(
+            update(ProcessInstanceQueueModel)
+            .where(ProcessInstanceQueueModel.id == queue_entry.id)
+            .values(
+                locked_by="test:test_waiting",
+                locked_at_in_seconds=round(time.time()),
+                run_at_in_seconds=old_time_in_seconds,
+                updated_at_in_seconds=old_time_in_seconds,
+            )
+        )
         db.session.commit()
 
-        mocker.patch.object(ProcessInstanceQueueService, "peek_many", return_value=[process_instance.id])
-        ProcessInstanceService.do_waiting(ProcessInstanceStatus.waiting.value)
+        claim_batch_spy = mocker.spy(ProcessInstanceQueueService, "claim_batch")
+        run_spy = mocker.spy(ProcessInstanceService, "_run_claimed_waiting_process_instance")
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WORKER_POOL_SIZE", worker_pool_size):
+            ProcessInstanceService.do_waiting(ProcessInstanceStatus.waiting.value)
+        assert claim_batch_spy.call_count >= 1
+        assert run_spy.call_count == 0
+
+        db.session.expire_all()
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.locked_by == "test:test_waiting"
         assert process_instance.status == ProcessInstanceStatus.waiting.value
 
     def _load_up_a_future_task_and_return_instance(self) -> ProcessInstanceModel:
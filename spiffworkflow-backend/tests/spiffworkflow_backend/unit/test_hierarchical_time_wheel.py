@@ -0,0 +1,55 @@
+import random
+
+from spiffworkflow_backend.helpers.hierarchical_time_wheel import HierarchicalTimeWheel
+
+START_TIME = 1_700_000_000.5
+
+
+class TestHierarchicalTimeWheel:
+    def test_fires_timers_in_the_tick_they_are_due(self) -> None:
+        time_wheel = HierarchicalTimeWheel(tick_in_seconds=1, slot_count=4, level_count=2)
+        time_wheel.schedule("past", START_TIME - 30, "past", START_TIME)
+        time_wheel.schedule("soon", START_TIME + 2, "soon", START_TIME)
+        time_wheel.schedule("cascades", START_TIME + 9, "cascades", START_TIME)
+        time_wheel.schedule("overflows", START_TIME + 40, "overflows", START_TIME)
+        assert len(time_wheel) == 4
+
+        assert time_wheel.advance(START_TIME) == [("past", "past")]
+        assert time_wheel.advance(START_TIME + 1) == []
+        assert time_wheel.advance(START_TIME + 2) == [("soon", "soon")]
+        assert time_wheel.advance(START_TIME + 8) == []
+        assert time_wheel.advance(START_TIME + 9) == [("cascades", "cascades")]
+        assert time_wheel.advance(START_TIME + 39) == []
+        assert time_wheel.advance(START_TIME + 41) == [("overflows", "overflows")]
+        assert len(time_wheel) == 0
+
+    def test_rescheduling_a_key_moves_the_timer(self) -> None:
+        time_wheel = HierarchicalTimeWheel(tick_in_seconds=1, slot_count=4, level_count=2)
+        time_wheel.schedule("timer", START_TIME + 3, 1, START_TIME)
+        time_wheel.schedule("timer", START_TIME + 20, 2, START_TIME)
+        time_wheel.schedule("cancelled", START_TIME + 3, 3, START_TIME)
+        time_wheel.cancel("cancelled")
+        assert len(time_wheel) == 1
+        assert "timer" in time_wheel
+
+        assert time_wheel.advance(START_TIME + 19) == []
+        assert time_wheel.advance(START_TIME + 20) == [("timer", 2)]
+
+    def test_fires_every_timer_once_and_never_early(self) -> None:
+        random_generator = random.Random(42)  # noqa: S311
+        time_wheel = HierarchicalTimeWheel(tick_in_seconds=1, slot_count=8, level_count=3)
+        due_times = {key: START_TIME + random_generator.uniform(-5, 10000) for key in range(500)}
+        for key, due_at_in_seconds in due_times.items():
+            time_wheel.schedule(key, due_at_in_seconds, key, START_TIME)
+
+        fired_times: dict = {}
+        now_in_seconds = START_TIME
+        while now_in_seconds < START_TIME + 10001:
+            now_in_seconds += random_generator.choice([1, 1, 1, 7, 60])
+            for fired_key, _value in time_wheel.advance(now_in_seconds):
+                assert fired_key not in fired_times
+                fired_times[fired_key] = now_in_seconds
+
+        assert fired_times.keys() == due_times.keys()
+        for key, fired_at_in_seconds in fired_times.items():
+            assert int(fired_at_in_seconds) >= int(due_times[key])
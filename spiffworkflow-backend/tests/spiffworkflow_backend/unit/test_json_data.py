@@ -0,0 +1,197 @@
+import json
+from collections.abc import Generator
+from contextlib import contextmanager
+from hashlib import sha256
+from typing import Any
+
+from flask import Flask
+from spiffworkflow_backend.helpers.canonical_json import canonical_json_encoder
+from spiffworkflow_backend.helpers.canonical_json import encode_canonical_json
+from spiffworkflow_backend.helpers.json_delta import apply_delta
+from spiffworkflow_backend.helpers.json_delta import compute_delta
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
+from sqlalchemy import event
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+
+
+class TestJsonData(BaseTest):
+    def test_does_not_send_data_for_hashes_known_to_exist(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        json_data_dict, json_data_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict({"hey": "there"})
+        json_data_dicts = {json_data_dict["hash"]: json_data_dict}
+        json_data_encodings = {json_data_dict["hash"]: json_data_encoding}
+
+        with self._json_data_inserts() as inserts:
+            JsonDataModel.insert_or_update_json_data_records(json_data_dicts, json_data_encodings)
+            # hashes written earlier in the same transaction do not get sent again either
+            JsonDataModel.insert_or_update_json_data_records(json_data_dicts, json_data_encodings)
+            db.session.commit()
+        assert len(inserts) == 1
+
+        stats_before = JsonDataModel.write_stats()
+        with self._json_data_inserts() as inserts:
+            JsonDataModel.insert_or_update_json_data_records(json_data_dicts, json_data_encodings)
+            db.session.commit()
+        assert len(inserts) == 0
+        stats_after = JsonDataModel.write_stats()
+        assert stats_after["records_skipped"] == stats_before["records_skipped"] + 1
+        assert stats_after["bytes_avoided"] == stats_before["bytes_avoided"] + len(json_data_encoding)
+        assert JsonDataModel.find_data_dict_by_hash(json_data_dict["hash"]) == {"hey": "there"}
+
+    def test_forgets_hashes_written_in_a_rolled_back_transaction(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        json_data_dict = JsonDataModel.json_data_dict_from_dict({"hey": "there"})
+        json_data_dicts = {json_data_dict["hash"]: json_data_dict}
+
+        with self._json_data_inserts() as inserts:
+            JsonDataModel.insert_or_update_json_data_records(json_data_dicts)
+            db.session.rollback()
+            JsonDataModel.insert_or_update_json_data_records(json_data_dicts)
+            db.session.commit()
+        assert len(inserts) == 2
+        assert JsonDataModel.find_data_dict_by_hash(json_data_dict["hash"]) == {"hey": "there"}
+
+    def test_can_probe_for_existing_hashes_before_inserting(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        json_data_dict = JsonDataModel.json_data_dict_from_dict({"hey": "there"})
+        json_data_dicts = {json_data_dict["hash"]: json_data_dict}
+        JsonDataModel.insert_or_update_json_data_records(json_data_dicts)
+        db.session.commit()
+
+        # pretend this row was written by another process
+        JsonDataModel.clear_known_hashes()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_EXISTENCE_PROBE_ENABLED", True):
+            with self._json_data_inserts() as inserts:
+                JsonDataModel.insert_or_update_json_data_records(json_data_dicts)
+                db.session.commit()
+        assert len(inserts) == 0
+
+    def test_hashes_the_same_canonical_json_that_gets_written(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        json_data_dict, json_data_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict({"b": [1, 2], "a": "\u00e9"})
+        assert json_data_encoding == json.dumps({"a": "\u00e9", "b": [1, 2]}).encode("utf8")
+        assert json_data_dict["hash"] == sha256(json_data_encoding).hexdigest()
+
+        JsonDataModel.insert_or_update_json_data_records(
+            {json_data_dict["hash"]: json_data_dict}, {json_data_dict["hash"]: json_data_encoding}
+        )
+        db.session.commit()
+        db.session.expire_all()
+        assert JsonDataModel.find_data_dict_by_hash(json_data_dict["hash"]) == {"a": "\u00e9", "b": [1, 2]}
+
+    def test_canonical_json_falls_back_to_stdlib_encoder(
+        self,
+        app: Flask,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_ENCODER", "orjson"):
+            # orjson cannot handle integers this large
+            assert encode_canonical_json({"big": 2**70}) == json.dumps({"big": 2**70}).encode("utf8")
+            if canonical_json_encoder() == "orjson":
+                assert encode_canonical_json({"b": 1, "a": 2}) == b'{"a":2,"b":1}'
+
+    def test_can_store_data_as_deltas_with_a_max_chain_length(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        data = {f"key_{i}": "value" * 20 for i in range(20)}
+        versions = []
+        for i in range(4):
+            data = {**data, "counter": i}
+            versions.append(JsonDataModel.json_data_dict_and_encoding_from_dict(data))
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_ENCODING_ENABLED", True):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MIN_SIZE_IN_BYTES", "0"):
+                with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_DELTA_MAX_CHAIN_LENGTH", "2"):
+                    first_dict, first_encoding = versions[0]
+                    JsonDataModel.insert_or_update_json_data_records(
+                        {first_dict["hash"]: first_dict}, {first_dict["hash"]: first_encoding}
+                    )
+                    db.session.commit()
+                    # the first base gets loaded from the database and the rest are written in the same batch
+                    JsonDataModel.insert_or_update_json_data_records(
+                        {d["hash"]: d for d, _ in versions[1:]},
+                        {d["hash"]: e for d, e in versions[1:]},
+                        {versions[i][0]["hash"]: [versions[i - 1][0]["hash"]] for i in range(1, 4)},
+                    )
+                    db.session.commit()
+
+        hashes = [d["hash"] for d, _ in versions]
+        rows = {r.hash: r for r in JsonDataModel.query.filter(JsonDataModel.hash.in_(hashes)).all()}  # type: ignore
+        assert [rows[h].delta_parent_hash for h in hashes] == [None, hashes[0], hashes[1], None]
+        assert [rows[h].delta_chain_length for h in hashes] == [0, 1, 2, 0]
+        assert rows[hashes[1]].data == {"set": {"counter": 1}, "unset": []}
+
+        db.session.expire_all()
+        data_dicts = JsonDataModel.find_data_dicts_by_hashes([hashes[0], hashes[2], "does-not-exist"])
+        assert data_dicts == {hashes[0]: versions[0][0]["data"], hashes[2]: versions[2][0]["data"]}
+        # resolving a delta must not modify the data of its base
+        assert data_dicts[hashes[0]]["counter"] == 0
+        assert JsonDataModel.find_data_dict_by_hash(hashes[3]) == versions[3][0]["data"]
+
+    def test_deltas_only_skip_values_that_encode_identically(
+        self,
+        app: Flask,
+    ) -> None:
+        base = {"int": 1, "float": 1.0, "bool": True, "same": [1, {"a": 2}], "removed": None}
+        data = {"int": 1.0, "float": 1, "bool": 1, "same": [1, {"a": 2}], "added": "hey"}
+        delta = compute_delta(base, data)
+        assert delta == {"set": {"int": 1.0, "float": 1, "bool": 1, "added": "hey"}, "unset": ["removed"]}
+        assert json.dumps(apply_delta(dict(base), delta), sort_keys=True) == json.dumps(data, sort_keys=True)
+
+    def test_can_store_compressed_data_and_decode_it(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        large_dict, large_encoding = JsonDataModel.json_data_dict_and_encoding_from_dict({"hey": "there" * 100})
+        small_dict = JsonDataModel.json_data_dict_from_dict({"hey": "you"})
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION", "zlib"):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_SIZE_IN_BYTES", "100"):
+                JsonDataModel.insert_or_update_json_data_records(
+                    {large_dict["hash"]: large_dict, small_dict["hash"]: small_dict}, {large_dict["hash"]: large_encoding}
+                )
+                db.session.commit()
+
+        large_row = JsonDataModel.find_object_by_hash(large_dict["hash"])
+        assert large_row.data_format == "zlib"
+        assert large_row.data is None
+        assert large_row.compressed_data is not None
+        assert len(large_row.compressed_data) < len(large_encoding)
+        small_row = JsonDataModel.find_object_by_hash(small_dict["hash"])
+        assert small_row.data_format == "json"
+        assert small_row.data == {"hey": "you"}
+
+        # decoding does not depend on compression still being turned on
+        assert JsonDataModel.find_data_dicts_by_hashes([large_dict["hash"], small_dict["hash"]]) == {
+            large_dict["hash"]: {"hey": "there" * 100},
+            small_dict["hash"]: {"hey": "you"},
+        }
+
+    @contextmanager
+    def _json_data_inserts(self) -> Generator:
+        inserts: list[str] = []
+
+        def record_statement(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            if statement.startswith("INSERT INTO json_data"):
+                inserts.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record_statement)
+        try:
+            yield inserts
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record_statement)
@@ -0,0 +1,33 @@
+from flask.app import Flask
+from spiffworkflow_backend.data_migrations.json_data_compression_migrator import JsonDataCompressionMigrator
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+
+
+class TestJsonDataCompressionMigrator(BaseTest):
+    def test_can_compress_existing_records_in_batches(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        data_dicts = [{"hey": f"there{i}" * 100} for i in range(3)] + [{"hey": "you"}]
+        json_data_dicts = [JsonDataModel.json_data_dict_from_dict(d) for d in data_dicts]
+        JsonDataModel.insert_or_update_json_data_records({d["hash"]: d for d in json_data_dicts})
+        db.session.commit()
+
+        # nothing to do while compression is turned off
+        assert JsonDataCompressionMigrator.compress_existing_records(batch_size=2) == 0
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION", "zlib"):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_SIZE_IN_BYTES", "100"):
+                assert JsonDataCompressionMigrator.compress_existing_records(batch_size=2) == 3
+                assert JsonDataCompressionMigrator.compress_existing_records(batch_size=2) == 0
+
+        db.session.expire_all()
+        data_formats = {r.hash: r.data_format for r in JsonDataModel.query.all()}
+        assert data_formats == {d["hash"]: "json" if d["data"] == {"hey": "you"} else "zlib" for d in json_data_dicts}
+        assert JsonDataModel.find_data_dicts_by_hashes([d["hash"] for d in json_data_dicts]) == {
+            d["hash"]: d["data"] for d in json_data_dicts
+        }
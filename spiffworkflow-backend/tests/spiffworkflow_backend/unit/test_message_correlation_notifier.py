@@ -0,0 +1,49 @@
+from flask.app import Flask
+from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.background_processing.message_correlation_notifier import MessageCorrelationNotifier
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.message_instance import MessageInstanceModel
+from spiffworkflow_backend.services.message_service import MessageService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+
+
+class TestMessageCorrelationNotifier(BaseTest):
+    def test_notifies_with_message_names_after_commit(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        notify_mock = mocker.patch.object(MessageCorrelationNotifier, "notify")
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_MESSAGE_CORRELATION_EVENT_DRIVEN_ENABLED", True):
+            MessageCorrelationNotifier.notify_after_commit(["invoice"])
+            MessageCorrelationNotifier.notify_after_commit(["invoice", "payment"])
+            assert notify_mock.call_count == 0
+            db.session.commit()
+            notify_mock.assert_called_once_with({"invoice", "payment"})
+
+            # names from a transaction that was rolled back are dropped
+            db.session.add(MessageInstanceModel(message_type="send", name="refund", payload={}))
+            MessageCorrelationNotifier.notify_after_commit(["refund"])
+            db.session.rollback()
+            db.session.commit()
+            assert notify_mock.call_count == 1
+
+        MessageCorrelationNotifier.notify_after_commit(["invoice"])
+        db.session.commit()
+        assert notify_mock.call_count == 1
+
+    def test_correlates_notified_message_names_in_a_thread(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        correlate_mock = mocker.patch.object(MessageService, "correlate_all_message_instances")
+        MessageCorrelationNotifier.notify({"invoice"})
+        correlation_thread = MessageCorrelationNotifier._correlation_thread
+        if correlation_thread is not None:
+            correlation_thread.join(timeout=10)
+        correlate_mock.assert_called_once_with(message_names=["invoice"])
+        assert MessageCorrelationNotifier._correlation_thread is None
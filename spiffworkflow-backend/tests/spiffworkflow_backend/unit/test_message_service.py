@@ -4,6 +4,7 @@ from flask import Flask
 from flask.testing import FlaskClient
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.message_instance import MessageInstanceModel
+from spiffworkflow_backend.models.message_instance_correlation import MessageInstanceCorrelationRuleModel
 from spiffworkflow_backend.models.message_triggerable_process_model import MessageTriggerableProcessModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
@@ -360,3 +361,53 @@ class TestMessageService(BaseTest):
         message_receive_instance = message_receive_instances[0]
         assert message_receive_instance.status == "ready"
         assert message_receive_instance.failure_cause is None
+
+    def test_finds_receive_message_by_correlation_fingerprint(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            "test_group/hello_world",
+            process_model_source_directory="hello_world",
+            bpmn_file_name="hello_world.bpmn",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model, "waiting")
+
+        def create_receive_message(correlation_keys: dict) -> MessageInstanceModel:
+            message_instance = MessageInstanceModel(
+                process_instance_id=process_instance.id,
+                message_type="receive",
+                name="invoice",
+                correlation_keys=correlation_keys,
+            )
+            for name in ["po_number", "customer_id"]:
+                db.session.add(
+                    MessageInstanceCorrelationRuleModel(
+                        message_instance=message_instance, name=name, retrieval_expression=name, correlation_key_names=["invoice"]
+                    )
+                )
+            message_instance.set_correlation_fingerprint()
+            db.session.add(message_instance)
+            db.session.commit()
+            return message_instance
+
+        receive_1001 = create_receive_message({"invoice": {"po_number": 1001, "customer_id": "Sartography"}})
+        receive_1002 = create_receive_message({"invoice": {"po_number": 1002, "customer_id": "Sartography"}})
+        # accepts any invoice so it cannot have a fingerprint
+        receive_any = create_receive_message({})
+        assert receive_1001.correlation_fingerprint is not None
+        assert receive_1001.correlation_fingerprint_shape == receive_1002.correlation_fingerprint_shape
+        assert receive_any.correlation_fingerprint is None
+
+        def find_receiver(payload: dict, correlation_keys: dict | None = None) -> MessageInstanceModel | None:
+            message_instance_send = MessageInstanceModel(
+                message_type="send", name="invoice", payload=payload, correlation_keys=correlation_keys
+            )
+            return MessageService.find_receive_message_instance(message_instance_send)
+
+        assert find_receiver({"po_number": 1002, "customer_id": "Sartography"}) == receive_1002
+        assert find_receiver({"po_number": 1001.0, "customer_id": "Sartography"}) == receive_1001
+        assert find_receiver({"po_number": 1003, "customer_id": "Sartography"}) == receive_any
+        # identical correlation keys match even if the payload does not
+        assert find_receiver({}, correlation_keys=receive_1001.correlation_keys) == receive_1001
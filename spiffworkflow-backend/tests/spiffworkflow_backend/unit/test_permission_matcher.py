@@ -0,0 +1,105 @@
+import pytest
+from spiffworkflow_backend.helpers.permission_matcher import PermissionMatcher
+from spiffworkflow_backend.services.authorization_service import AuthorizationService
+
+
+def _permission_assignments(count: int) -> list[tuple[str, str, str]]:
+    permission_assignments = [("read", "/process-groups/shared:%", "permit"), ("read", "/process-groups/shared:denied:%", "deny")]
+    for index in range(count - len(permission_assignments)):
+        permission = ["create", "read", "update", "delete"][index % 4]
+        target_uri = f"/process-models/group-{index % 50}:model-{index}" + (":%" if index % 3 else "")
+        permission_assignments.append((permission, target_uri, "deny" if index % 7 == 0 else "permit"))
+    return permission_assignments
+
+
+def _permissions_and_uris(count: int) -> list[tuple[str, str]]:
+    permissions_and_uris = []
+    for index in range(count):
+        permission = ["create", "read", "update", "delete"][index % 4]
+        uri = [
+            f"/process-models/group-{index % 50}:model-{index}:sub",
+            f"/process-groups/shared:{index}",
+            f"/process-groups/shared:denied:{index}",
+            f"/process-instances/{index}",
+        ][index % 4]
+        permissions_and_uris.append((permission, uri))
+    return permissions_and_uris
+
+
+def _legacy_has_permission(permission_assignments: list[tuple[str, str, str]], permission: str, uri: str) -> bool:
+    # the way permissions_check evaluated every uri against every assignment before the matcher existed
+    grant_types = [
+        grant_type
+        for assignment_permission, target_uri, grant_type in permission_assignments
+        if assignment_permission == permission and AuthorizationService.target_uri_matches_actual_uri(target_uri, uri)
+    ]
+    return len(grant_types) > 0 and "deny" not in grant_types
+
+
+class TestPermissionMatcher:
+    def test_matches_wildcard_and_exact_targets(self) -> None:
+        matcher = PermissionMatcher(
+            [
+                ("read", "/process-groups/hey:%", "permit"),
+                ("read", "/process-models/%", "permit"),
+                ("update", "/process-groups/hey:yo", "permit"),
+            ]
+        )
+        assert matcher.has_permission("read", "/process-groups/hey:yo:me")
+        assert matcher.has_permission("read", "/process-groups/hey")
+        assert not matcher.has_permission("read", "/process-groups/hey2")
+        assert matcher.has_permission("read", "/process-models/")
+        assert matcher.has_permission("read", "/process-models")
+        assert not matcher.has_permission("read", "/process-modelshey")
+        assert matcher.has_permission("update", "/process-groups/hey:yo")
+        assert not matcher.has_permission("update", "/process-groups/hey:yo:me")
+        assert not matcher.has_permission("delete", "/process-groups/hey:yo")
+
+    def test_any_matching_deny_wins(self) -> None:
+        matcher = PermissionMatcher(
+            [
+                ("read", "/%", "permit"),
+                ("read", "/process-groups/hey:yo:%", "deny"),
+                ("read", "/process-groups/hey:new", "deny"),
+                ("read", "/process-instances/%/logs", "deny"),
+            ]
+        )
+        assert matcher.has_permission("read", "/process-groups/hey")
+        assert not matcher.has_permission("read", "/process-groups/hey:yo")
+        assert not matcher.has_permission("read", "/process-groups/hey:yo:me")
+        assert not matcher.has_permission("read", "/process-groups/hey:new")
+        assert matcher.has_permission("read", "/process-groups/hey:new:group")
+        assert not matcher.has_permission("read", "/process-instances/hey:yo/12/logs")
+        assert matcher.has_permission("read", "/process-instances/hey:yo/12")
+
+    def test_raises_on_unknown_grant_types(self) -> None:
+        with pytest.raises(Exception, match="Unknown grant type"):
+            PermissionMatcher([("read", "/%", "maybe")])
+
+    def test_batch_checks_match_single_checks(self) -> None:
+        permission_assignments = _permission_assignments(200) + [("update", "/process-instances/%/logs", "permit")]
+        permissions_and_uris = _permissions_and_uris(400) + [("update", "/process-instances/7/logs"), ("read", "")]
+        matcher = PermissionMatcher(permission_assignments)
+        expected_results = [matcher.has_permission(permission, uri) for permission, uri in permissions_and_uris]
+        assert matcher.has_permissions(permissions_and_uris) == expected_results
+        assert True in expected_results
+        assert False in expected_results
+        for (permission, uri), expected_result in zip(permissions_and_uris[:400], expected_results, strict=False):
+            assert _legacy_has_permission(permission_assignments, permission, uri) is expected_result
+
+    def test_batch_checks_scale_sub_linearly_in_assignments_times_uris(self) -> None:
+        small_size = 100
+        large_size = small_size * 10
+
+        def trie_nodes_visited(size: int) -> int:
+            matcher = PermissionMatcher(_permission_assignments(size))
+            matcher.has_permissions(_permissions_and_uris(size))
+            return matcher.trie_nodes_visited
+
+        small_trie_nodes_visited = trie_nodes_visited(small_size)
+        large_trie_nodes_visited = trie_nodes_visited(large_size)
+
+        # assignments x uris grew 100 times but the work per uri should not grow with the assignments
+        assert small_trie_nodes_visited > 0
+        assert large_trie_nodes_visited <= small_trie_nodes_visited * 10
+        assert large_trie_nodes_visited <= sum(len(uri) for _, uri in _permissions_and_uris(large_size))
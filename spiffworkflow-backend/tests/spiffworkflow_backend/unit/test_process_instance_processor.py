@@ -1,9 +1,11 @@
+import os
 from uuid import UUID
 
 import pytest
 from flask import g
 from flask.app import Flask
 from flask.testing import FlaskClient
+from pytest_mock.plugin import MockerFixture
 from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
 from SpiffWorkflow.util.task import TaskState  # type: ignore
 from spiffworkflow_backend.exceptions.error import TaskMismatchError
@@ -20,8 +22,11 @@ from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.models.task_instructions_for_end_user import TaskInstructionsForEndUserModel
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
+from spiffworkflow_backend.services.bpmn_process_definition_cache_service import BpmnProcessDefinitionCacheService
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
+from spiffworkflow_backend.services.spec_file_service import SpecFileService
 from spiffworkflow_backend.services.workflow_execution_service import WorkflowExecutionServiceError
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
@@ -941,6 +946,7 @@ class TestProcessInstanceProcessor(BaseTest):
         # ensure everything is removed from the sqlalchemy cache when we clear the database
         # otherwise it gets autoflush errors
         db.session.expunge_all()
+        JsonDataModel.clear_known_hashes()
 
         process_instance = self.create_process_instance_from_process_model(process_model=process_model)
         assert process_instance.bpmn_process_definition_id is None
@@ -1053,3 +1059,116 @@ class TestProcessInstanceProcessor(BaseTest):
 
         processor.do_engine_steps(save=True)
         assert process_instance.status == "complete"
+
+    def test_caches_parsed_specs_until_a_process_model_file_changes(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        ProcessModelSpecCacheService.clear()
+        stats_before = ProcessModelSpecCacheService.stats()
+
+        spec_one, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        spec_two, subprocesses = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        stats_after = ProcessModelSpecCacheService.stats()
+        assert spec_one is spec_two
+        assert len(subprocesses) > 0
+        assert stats_after["misses"] == stats_before["misses"] + 1
+        assert stats_after["hits"] == stats_before["hits"] + 1
+
+        # change a file on disk without going through SpecFileService to simulate a git pull
+        full_file_path = SpecFileService.full_file_path(process_model, "call_activity_level_3.bpmn")
+        with open(full_file_path, "ab") as f:
+            f.write(b"\n")
+        spec_three, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert spec_three is not spec_one
+        assert ProcessModelSpecCacheService.stats()["misses"] == stats_before["misses"] + 2
+
+    def test_cached_specs_are_checked_by_file_stats_before_file_contents(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        ProcessModelSpecCacheService.clear()
+        spec_one, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+
+        digest_spy = mocker.spy(ProcessModelSpecCacheService, "digest_for_file_paths")
+        get_data_spy = mocker.spy(SpecFileService, "get_data")
+        spec_two, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert spec_two is spec_one
+        assert digest_spy.call_count == 0
+        assert get_data_spy.call_count == 0
+
+        # touching a file without changing it falls back to comparing the contents once
+        full_file_path = SpecFileService.full_file_path(process_model, "call_activity_level_3.bpmn")
+        file_stat = os.stat(full_file_path)
+        os.utime(full_file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000_000))
+        spec_three, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert spec_three is spec_one
+        assert digest_spy.call_count == 1
+        spec_four, _ = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert spec_four is spec_one
+        assert digest_spy.call_count == 1
+        assert get_data_spy.call_count == 0
+
+    def test_caches_bpmn_process_definition_dicts_across_processor_loads(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        initiator_user = self.find_or_create_user("initiator_user")
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model, user=initiator_user)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+
+        BpmnProcessDefinitionCacheService.clear()
+        stats_before = BpmnProcessDefinitionCacheService.stats()
+        processor = ProcessInstanceProcessor(process_instance, include_completed_subprocesses=True)
+        processor = ProcessInstanceProcessor(process_instance, include_completed_subprocesses=True)
+        stats_after = BpmnProcessDefinitionCacheService.stats()
+        assert stats_after["misses"] == stats_before["misses"] + 1
+        assert stats_after["hits"] == stats_before["hits"] + 1
+
+        spiff_task = processor.__class__.get_task_by_bpmn_identifier("level_3_script_task", processor.bpmn_process_instance)
+        assert spiff_task is not None
+        assert spiff_task.state == TaskState.COMPLETED
+        assert {"Level1", "Level2", "Level2b", "Level3"} <= set(processor.bpmn_definition_to_task_definitions_mappings.keys())
+
+    def test_serialize_bpmn_process_definitions_matches_full_serialization(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        bpmn_process_dict = processor.serialize()
+        bpmn_process_definitions_dict = processor.serialize_bpmn_process_definitions()
+        assert bpmn_process_definitions_dict == {
+            "spec": bpmn_process_dict["spec"],
+            "subprocess_specs": bpmn_process_dict["subprocess_specs"],
+        }
+
+        processor.do_engine_steps(save=True)
+        assert process_instance.spiffworkflow_fully_initialized()
+        assert process_instance.bpmn_process_definition.bpmn_identifier == bpmn_process_dict["spec"]["name"]
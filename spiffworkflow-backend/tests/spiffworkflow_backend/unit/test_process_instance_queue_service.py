@@ -1,13 +1,18 @@
 import time
 from contextlib import suppress
+from typing import Any
 
 import pytest
 from flask.app import Flask
 from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
+from sqlalchemy import event
+from sqlalchemy import update
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -49,6 +54,142 @@ class TestProcessInstanceQueueService(BaseTest):
         queue_entry_ids = ProcessInstanceQueueService.peek_many("not_started", round(time.time()))
         assert process_instance.id in queue_entry_ids
 
+    def test_can_claim_a_batch_of_due_queue_entries(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(4)]
+        current_time = round(time.time())
+        run_at_offsets = [-10, -30, -20, 100]
+        for process_instance, offset in zip(process_instances, run_at_offsets, strict=True):
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            queue_entry.run_at_in_seconds = current_time + offset
+            db.session.add(queue_entry)
+        db.session.commit()
+
+        claimed = ProcessInstanceQueueService.claim_batch("not_started", 2)
+        assert list(claimed.keys()) == [process_instances[1].id, process_instances[2].id]
+        assert ProcessInstanceLockService.has_lock(process_instances[1].id)
+        assert ProcessInstanceLockService.has_lock(process_instances[2].id)
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[1].id).first()
+        assert queue_entry.locked_by == ProcessInstanceLockService.locked_by()
+
+        # entries that are locked or not due yet are not claimed again
+        claimed_elsewhere = ProcessInstanceQueueService.claim_batch("not_started", 10, locked_by="test:elsewhere")
+        assert list(claimed_elsewhere.keys()) == [process_instances[0].id]
+        assert ProcessInstanceQueueService.claim_batch("not_started", 10) == {}
+
+        with ProcessInstanceQueueService.claimed(process_instances[1]):
+            assert ProcessInstanceLockService.has_lock(process_instances[1].id)
+        assert not ProcessInstanceLockService.has_lock(process_instances[1].id)
+        db.session.expire_all()
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[1].id).first()
+        assert queue_entry.locked_by is None
+
+        for process_instance in [process_instances[0], process_instances[2]]:
+            with ProcessInstanceQueueService.claimed(process_instance):
+                pass
+
+    def test_removes_stale_locks_in_batches(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(4)]
+        current_time = round(time.time())
+        locked_at_offsets = [-1000, -2000, -10, None]
+        for process_instance, offset in zip(process_instances, locked_at_offsets, strict=True):
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            if offset is not None:
+                queue_entry.locked_by = f"test:stale_locks:{offset}"
+                queue_entry.locked_at_in_seconds = current_time + offset
+            db.session.add(queue_entry)
+        db.session.commit()
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_STALE_LOCK_RELEASE_BATCH_SIZE", 1):
+            released_process_instance_ids = ProcessInstanceLockService.remove_stale_locks()
+        assert released_process_instance_ids == [process_instances[0].id, process_instances[1].id]
+
+        db.session.expire_all()
+        locked_by_values = [
+            ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first().locked_by
+            for process_instance in process_instances
+        ]
+        assert locked_by_values == [None, None, "test:stale_locks:-10", None]
+        assert ProcessInstanceLockService.remove_stale_locks() == []
+
+    def test_only_returns_stale_locks_that_were_released(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(2)]
+        current_time = round(time.time())
+        for process_instance in process_instances:
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            queue_entry.locked_by = "test:stale_locks"
+            queue_entry.locked_at_in_seconds = current_time - 1000
+            db.session.add(queue_entry)
+        db.session.commit()
+
+        # another worker takes the second lock again after the stale locks were selected but before they are released
+        retaken_lock: list[bool] = []
+
+        def retake_lock_before_release(orm_execute_state: Any) -> None:
+            if orm_execute_state.is_update and len(retaken_lock) == 0:
+                retaken_lock.append(True)
+                orm_execute_state.session.execute(
+                    update(ProcessInstanceQueueModel)
+                    .where(ProcessInstanceQueueModel.process_instance_id == process_instances[1].id)
+                    .values(locked_by="test:retaken", locked_at_in_seconds=round(time.time()))
+                )
+
+        event.listen(db.session, "do_orm_execute", retake_lock_before_release)
+        try:
+            released_process_instance_ids = ProcessInstanceLockService.remove_stale_locks()
+        finally:
+            event.remove(db.session, "do_orm_execute", retake_lock_before_release)
+        assert retaken_lock == [True]
+        assert released_process_instance_ids == [process_instances[0].id]
+
+        db.session.expire_all()
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[1].id).first()
+        assert queue_entry.locked_by == "test:retaken"
+
+    def test_runs_queue_entries_in_order_of_priority_with_aging(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(4)]
+        current_time = round(time.time())
+        # the priority 5 entry has been due for long enough to age past the others
+        priorities_and_run_at_offsets = [(2, -10), (0, -5), (5, -2000), (9, -10)]
+        for process_instance, (priority, offset) in zip(process_instances, priorities_and_run_at_offsets, strict=True):
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            queue_entry.priority = priority
+            queue_entry.run_at_in_seconds = current_time + offset
+            db.session.add(queue_entry)
+        db.session.commit()
+
+        expected_ids = [process_instances[i].id for i in [2, 1, 0, 3]]
+        assert ProcessInstanceQueueService.peek_many("not_started", current_time) == expected_ids
+        assert ProcessInstanceQueueModel.effective_priority(5, current_time - 2000) == 0
+        assert ProcessInstanceQueueModel.effective_priority(9, current_time - 10) == 9
+
+        ProcessInstanceQueueService.set_priority(process_instances[3], 0)
+        expected_ids = [process_instances[i].id for i in [2, 3, 1, 0]]
+        assert ProcessInstanceQueueService.peek_many("not_started", current_time) == expected_ids
+
+        claimed = ProcessInstanceQueueService.claim_batch("not_started", 2)
+        assert list(claimed.keys()) == expected_ids[0:2]
+        for process_instance in [process_instances[2], process_instances[3]]:
+            with ProcessInstanceQueueService.claimed(process_instance):
+                pass
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[3].id).first()
+        assert queue_entry.priority == 0
+
     def test_can_run_some_code_with_a_dequeued_process_instance(
         self,
         app: Flask,
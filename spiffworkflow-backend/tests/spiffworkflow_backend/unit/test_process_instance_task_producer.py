@@ -0,0 +1,147 @@
+import pytest
+from flask.app import Flask
+from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
+    lock_contention_backoff_in_seconds,
+)
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
+    queue_process_instance_if_appropriate,
+)
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import release_run_message
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
+    requeue_process_instance_after_lock_contention,
+)
+from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import run_message_stats
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestProcessInstanceTaskProducer(BaseTest):
+    def test_keeps_one_pending_run_message_per_process_instance(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mock = mocker.patch("celery.current_app.send_task")
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).one()
+            updated_at_in_seconds = queue_entry.updated_at_in_seconds
+            assert queue_process_instance_if_appropriate(process_instance) is True
+            assert queue_process_instance_if_appropriate(process_instance) is True
+            assert mock.call_count == 1
+            db.session.refresh(queue_entry)
+            assert queue_entry.run_message_dedupe_key == mock.call_args.kwargs["task_id"]
+            # claiming a run message should not keep the process instance out of the queue sweeps
+            assert queue_entry.updated_at_in_seconds == updated_at_in_seconds
+
+            # a backoff runs later than the pending message so it is not needed either
+            requeue_process_instance_after_lock_contention(process_instance, task_guid=None, lock_contention_attempt=1)
+            assert mock.call_count == 1
+
+            # once a worker picks up the message the next request needs a new one
+            release_run_message(process_instance.id, mock.call_args.kwargs["task_id"])
+            requeue_process_instance_after_lock_contention(process_instance, task_guid=None, lock_contention_attempt=1)
+            assert mock.call_count == 2
+            assert mock.call_args.kwargs["kwargs"]["lock_contention_attempt"] == 1
+            assert 1 <= mock.call_args.kwargs["countdown"] <= 2
+
+            # running right away beats the pending backoff
+            assert queue_process_instance_if_appropriate(process_instance) is True
+            assert mock.call_count == 3
+
+    def test_commits_the_run_message_claim_even_if_the_caller_does_not(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mock = mocker.patch("celery.current_app.send_task")
+            assert queue_process_instance_if_appropriate(process_instance) is True
+            # like the end of a request that never committed
+            db.session.rollback()
+
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).one()
+            assert queue_entry.run_message_dedupe_key == mock.call_args.kwargs["task_id"]
+            assert queue_process_instance_if_appropriate(process_instance) is True
+            assert mock.call_count == 1
+
+    def test_drops_run_requests_covered_by_a_pending_message_for_the_same_task(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mock = mocker.patch("celery.current_app.send_task")
+            queue_process_instance_if_appropriate(process_instance, task_guid="task_one")
+            queue_process_instance_if_appropriate(process_instance, task_guid="task_one")
+            # a message for a task runs the process instance too so it covers requests without a task
+            queue_process_instance_if_appropriate(process_instance)
+            assert mock.call_count == 1
+
+            # the pending message would not mark a different task as completed
+            queue_process_instance_if_appropriate(process_instance, task_guid="task_two")
+            assert mock.call_count == 2
+            assert mock.call_args.kwargs["kwargs"]["task_guid"] == "task_two"
+            assert run_message_stats()["coalesced"] >= 2
+
+    def test_publishes_run_message_stats_to_prometheus(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        registry = app.config["PROMETHEUS_METRICS"].registry
+        sent_before = registry.get_sample_value("spiffworkflow_backend_run_messages_total", {"outcome": "sent"})
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mocker.patch("celery.current_app.send_task")
+            queue_process_instance_if_appropriate(process_instance)
+        sent_after = registry.get_sample_value("spiffworkflow_backend_run_messages_total", {"outcome": "sent"})
+        assert sent_after == sent_before + 1
+        assert sent_after == run_message_stats()["sent"]
+
+    @pytest.mark.parametrize(
+        "lock_contention_attempt,minimum_in_seconds,maximum_in_seconds",
+        [(1, 1, 2), (2, 2, 4), (4, 8, 16), (100, 30, 60)],
+    )
+    def test_lock_contention_backoff_doubles_with_jitter_up_to_the_max(
+        self,
+        app: Flask,
+        lock_contention_attempt: int,
+        minimum_in_seconds: float,
+        maximum_in_seconds: float,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_BASE_IN_SECONDS", 2):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_LOCK_CONTENTION_BACKOFF_MAX_IN_SECONDS", 60):
+                for _ in range(20):
+                    backoff_in_seconds = lock_contention_backoff_in_seconds(lock_contention_attempt)
+                    assert minimum_in_seconds <= backoff_in_seconds <= maximum_in_seconds
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections.abc import Callable
+
+from flask.app import Flask
+from spiffworkflow_backend.background_processing.process_instance_worker_pool import ProcessInstanceWorkerPool
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+
+
+class TestProcessInstanceWorkerPool(BaseTest):
+    def test_runs_instances_concurrently_and_applies_backpressure(
+        self,
+        app: Flask,
+    ) -> None:
+        worker_pool = ProcessInstanceWorkerPool("test", max_workers=2, max_pending=1)
+        release = threading.Event()
+        started: list[int] = []
+        locked_by: dict[int, str] = {}
+
+        def run(process_instance_id: int) -> None:
+            started.append(process_instance_id)
+            locked_by[process_instance_id] = ProcessInstanceLockService.locked_by()
+            release.wait(timeout=10)
+
+        assert worker_pool.try_submit(app, 1, "bg:test", run)
+        assert worker_pool.try_submit(app, 2, "bg:test", run)
+        assert worker_pool.try_submit(app, 3, "bg:test", run)
+        # already in flight so it is not queued again
+        assert worker_pool.try_submit(app, 1, "bg:test", run)
+        assert worker_pool.is_saturated()
+        assert not worker_pool.try_submit(app, 4, "bg:test", run)
+
+        self._wait_for(lambda: len(started) == 2)
+        # the third one waits for a thread
+        assert sorted(started) == [1, 2]
+
+        release.set()
+        self._wait_for(lambda: len(worker_pool.process_instance_ids_in_flight) == 0)
+        assert sorted(started) == [1, 2, 3]
+        assert all(lb.startswith("bg:test:") for lb in locked_by.values())
+        assert locked_by[1] != locked_by[2]
+        assert worker_pool.try_submit(app, 4, "bg:test", run)
+        self._wait_for(lambda: len(worker_pool.process_instance_ids_in_flight) == 0)
+        worker_pool.executor.shutdown()
+
+    def _wait_for(self, condition: Callable[[], bool]) -> None:
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.05)
+        raise AssertionError("Condition was not met in time")
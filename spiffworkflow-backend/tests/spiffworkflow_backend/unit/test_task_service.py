@@ -1,10 +1,19 @@
+import re
+from typing import Any
+
+import pytest
 from flask import Flask
+from SpiffWorkflow.util.task import TaskState  # type: ignore
+from spiffworkflow_backend.exceptions.api_error import handle_exception
+from spiffworkflow_backend.exceptions.error import TaskDataSizeExceededError
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.task_service import TaskService
+from sqlalchemy import event
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -176,3 +185,83 @@ class TestTaskService(BaseTest):
         assert signal_event["event"]["name"] == "eat_spam"
         assert signal_event["event"]["typename"] == "SignalEventDefinition"
         assert signal_event["label"] == "Eat Spam"
+
+    def test_update_task_models_uses_a_constant_number_of_queries(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            "test_group/manual_task_with_subprocesses",
+            process_model_source_directory="manual_task_with_subprocesses",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+
+        spiff_tasks = processor.bpmn_process_instance.get_tasks(state=TaskState.READY | TaskState.FUTURE | TaskState.WAITING)
+        assert len(spiff_tasks) > 1
+        task_service = TaskService(
+            process_instance=process_instance,
+            serializer=processor._serializer,
+            bpmn_definition_to_task_definitions_mappings=processor.bpmn_definition_to_task_definitions_mappings,
+        )
+
+        statements: list[str] = []
+
+        def record_statement(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record_statement)
+        try:
+            task_models = [task_service.update_task_model_with_spiff_task(spiff_task) for spiff_task in spiff_tasks]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record_statement)
+
+        task_selects = [s for s in statements if re.search(r"^SELECT .*\sFROM task\b", s, re.DOTALL)]
+        bpmn_process_selects = [s for s in statements if re.search(r"^SELECT .*\sFROM bpmn_process\b", s, re.DOTALL)]
+        assert len(task_selects) <= 2
+        assert len(bpmn_process_selects) <= 1
+        # the guids of every finished task of the process instance are not loaded just to save a few tasks
+        assert not any(re.search(r"^SELECT task\.guid AS task_guid\s+FROM task\b", s) for s in task_selects)
+        for task_model in task_models:
+            assert task_model is TaskModel.query.filter_by(guid=task_model.guid).first()
+
+    def test_raises_when_task_data_to_save_exceeds_the_size_limit(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            "test_group/manual_task_with_subprocesses",
+            process_model_source_directory="manual_task_with_subprocesses",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+
+        task_service = TaskService(
+            process_instance=process_instance,
+            serializer=processor._serializer,
+            bpmn_definition_to_task_definitions_mappings=processor.bpmn_definition_to_task_definitions_mappings,
+        )
+        task_service.TASK_DATA_SIZE_LIMIT = 1000
+        spiff_task = processor.get_ready_user_tasks()[0]
+        spiff_task.data = {"small": "a" * 10}
+        task_service.update_task_model_with_spiff_task(spiff_task)
+        task_service.save_objects_to_database()
+        assert task_service.task_data_bytes == 0
+
+        spiff_task.data = {"large": "a" * 1000}
+        task_service.update_task_model_with_spiff_task(spiff_task)
+        assert task_service.task_data_bytes > 1000
+        with pytest.raises(TaskDataSizeExceededError) as exception_info:
+            task_service.save_objects_to_database()
+
+        # api clients get the same error code as when the processor raised an ApiError for this
+        with app.test_request_context():
+            response = handle_exception(exception_info.value)
+        assert response.status_code == 400
+        assert response.json is not None
+        assert response.json["error_code"] == "task_data_size_exceeded"
+        assert response.json["message"] == "Maximum task data size of 1000 exceeded."
@@ -0,0 +1,116 @@
+import time
+import uuid
+
+import pytest
+from flask.app import Flask
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.models.worker_heartbeat import WorkerHeartbeatModel
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
+from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
+from spiffworkflow_backend.services.worker_heartbeat_service import WorkerHeartbeatService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestWorkerHeartbeatService(BaseTest):
+    def _create_process_instance(self) -> ProcessInstanceModel:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        return self.create_process_instance_from_process_model(process_model=process_model)
+
+    def _lock_as_worker(
+        self, process_instance: ProcessInstanceModel, worker_identifier: str, locked_at_in_seconds: int | None = None
+    ) -> None:
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        queue_entry.locked_by = f"web:with:colons:{worker_identifier}:12345:None"
+        queue_entry.locked_at_in_seconds = locked_at_in_seconds or round(time.time())
+        db.session.add(queue_entry)
+        db.session.commit()
+
+    def _record_heartbeat_of_other_worker(self, last_heartbeat_at_in_seconds: int) -> str:
+        worker_identifier = str(uuid.uuid4())
+        db.session.add(
+            WorkerHeartbeatModel(
+                worker_identifier=worker_identifier,
+                hostname="other-host",
+                pid=1,
+                started_at_in_seconds=last_heartbeat_at_in_seconds,
+                last_heartbeat_at_in_seconds=last_heartbeat_at_in_seconds,
+            )
+        )
+        db.session.commit()
+        return worker_identifier
+
+    def test_releases_locks_of_workers_that_stopped_recording_heartbeats(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(3)]
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED", True):
+            WorkerHeartbeatService.beat()
+            live_worker_identifier = WorkerHeartbeatService.worker_identifier()
+            dead_worker_identifier = self._record_heartbeat_of_other_worker(round(time.time()) - 1000)
+            self._lock_as_worker(process_instances[0], live_worker_identifier)
+            self._lock_as_worker(process_instances[1], dead_worker_identifier, round(time.time()) - 1000)
+            # locks of processes that never recorded a heartbeat are left for the stale lock cleanup
+            self._lock_as_worker(process_instances[2], str(uuid.uuid4()))
+
+            worker_stats = WorkerHeartbeatService.worker_stats()
+            assert worker_stats["live_worker_count"] == 1
+            assert worker_stats["locks_held_by_unregistered_workers"] == 1
+            held_lock_counts = {worker["worker_identifier"]: worker["held_lock_count"] for worker in worker_stats["workers"]}
+            assert held_lock_counts == {live_worker_identifier: 1, dead_worker_identifier: 1}
+
+            assert ProcessInstanceLockService.remove_locks_of_dead_workers() == [process_instances[1].id]
+            assert WorkerHeartbeatModel.query.filter_by(worker_identifier=dead_worker_identifier).first() is None
+            assert ProcessInstanceLockService.remove_locks_of_dead_workers() == []
+
+        db.session.expire_all()
+        locked_by_values = [
+            ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first().locked_by
+            for process_instance in process_instances
+        ]
+        assert locked_by_values[1] is None
+        assert live_worker_identifier in locked_by_values[0]
+        assert locked_by_values[2] is not None
+
+    def test_dequeue_takes_over_the_lock_of_a_dead_worker(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._create_process_instance()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED", True):
+            dead_worker_identifier = self._record_heartbeat_of_other_worker(round(time.time()) - 1000)
+            self._lock_as_worker(process_instance, dead_worker_identifier, round(time.time()) - 1000)
+
+            with ProcessInstanceQueueService.dequeued(process_instance):
+                assert ProcessInstanceLockService.has_lock(process_instance.id)
+
+    def test_leaves_locks_taken_after_the_heartbeat_stalled_alone(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._create_process_instance()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_WORKER_HEARTBEAT_ENABLED", True):
+            stalled_worker_identifier = self._record_heartbeat_of_other_worker(round(time.time()) - 1000)
+            # the worker took the lock just now so it is alive even though its heartbeat thread stopped
+            self._lock_as_worker(process_instance, stalled_worker_identifier)
+
+            with pytest.raises(ProcessInstanceIsAlreadyLockedError):
+                with ProcessInstanceQueueService.dequeued(process_instance):
+                    pass
+            assert ProcessInstanceLockService.remove_locks_of_dead_workers() == []
+
+        db.session.expire_all()
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert stalled_worker_identifier in queue_entry.locked_by
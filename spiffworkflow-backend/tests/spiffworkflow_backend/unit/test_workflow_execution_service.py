@@ -1,6 +1,12 @@
 from flask import Flask
+from SpiffWorkflow.util.task import TaskState  # type: ignore
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
+from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.task_service import TaskService
+from sqlalchemy import func
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -28,3 +34,105 @@ class TestWorkflowExecutionService(BaseTest):
         self.complete_next_manual_task(processor)
         assert process_instance.last_milestone_bpmn_name == "Completed"
         assert process_instance.status == "complete"
+
+    def test_change_tracking_saves_the_same_task_models_as_a_full_save(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_CHANGE_TRACKING_ENABLED", True):
+            process_model = load_test_spec(
+                "test_group/multiinstance_manual_task",
+                process_model_source_directory="multiinstance_manual_task",
+            )
+            process_instance = self.create_process_instance_from_process_model(process_model)
+            processor = ProcessInstanceProcessor(process_instance)
+            processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+
+            process_instance = ProcessInstanceModel.query.filter_by(id=process_instance.id).first()
+            processor = ProcessInstanceProcessor(process_instance)
+            assert processor.task_change_tracker is not None
+            self.complete_next_manual_task(processor)
+            tracked_task_models = self._task_model_rows(process_instance)
+
+            # save every unfinished task the way it happens when change tracking is disabled
+            task_service = TaskService(
+                process_instance,
+                processor._serializer,
+                processor.bpmn_definition_to_task_definitions_mappings,
+            )
+            task_service.update_changed_task_models(
+                processor.bpmn_process_instance.get_tasks(
+                    state=TaskState.NOT_FINISHED_MASK | TaskState.ERROR | TaskState.CANCELLED
+                )
+            )
+            task_service.save_objects_to_database()
+            assert self._task_model_rows(process_instance) == tracked_task_models
+
+    def test_change_tracking_saves_data_changed_in_place(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_CHANGE_TRACKING_ENABLED", True):
+            process_model = load_test_spec(
+                "test_group/test-last-milestone",
+                process_model_source_directory="test-last-milestone",
+            )
+            process_instance = self.create_process_instance_from_process_model(process_model)
+            processor = ProcessInstanceProcessor(process_instance)
+            processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+
+            # the manual task stays ready so nothing but its data changes
+            spiff_task = processor.next_task()
+            assert spiff_task.state == TaskState.READY
+            spiff_task.data["changed_in_place"] = 1
+            processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+            spiff_task.data["changed_in_place"] = 2
+            processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+
+            task_model = TaskModel.query.filter_by(guid=str(spiff_task.id)).first()
+            assert task_model is not None
+            assert task_model.json_data()["changed_in_place"] == 2
+
+    def test_change_tracking_leaves_the_same_task_models_as_a_full_save(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            "test_group/manual_task_with_subprocesses",
+            process_model_source_directory="manual_task_with_subprocesses",
+        )
+        task_model_counts = {}
+        for task_change_tracking_enabled in [False, True]:
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_CHANGE_TRACKING_ENABLED", task_change_tracking_enabled):
+                process_instance = self.create_process_instance_from_process_model(process_model)
+                processor = ProcessInstanceProcessor(process_instance)
+                processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+                while process_instance.status != "complete":
+                    # load it again each time so spiff predicts tasks again from what was saved
+                    process_instance = ProcessInstanceModel.query.filter_by(id=process_instance.id).first()
+                    processor = ProcessInstanceProcessor(process_instance)
+                    self.complete_next_manual_task(processor)
+
+                task_model_counts[task_change_tracking_enabled] = dict(
+                    db.session.query(TaskDefinitionModel.bpmn_identifier, func.count(TaskModel.guid))
+                    .join(TaskModel, TaskModel.task_definition_id == TaskDefinitionModel.id)
+                    .filter(TaskModel.process_instance_id == process_instance.id)
+                    .group_by(TaskDefinitionModel.bpmn_identifier)
+                    .all()
+                )
+
+        assert task_model_counts[True] == task_model_counts[False]
+
+    def _task_model_rows(self, process_instance: ProcessInstanceModel) -> dict[str, tuple]:
+        return {
+            task_model.guid: (
+                task_model.state,
+                task_model.properties_json,
+                task_model.json_data_hash,
+                task_model.python_env_data_hash,
+            )
+            for task_model in TaskModel.query.filter_by(process_instance_id=process_instance.id).all()
+        }